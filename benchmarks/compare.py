@@ -0,0 +1,53 @@
+"""
+Compare two benchmark result files of ``benchmarks/run.py`` and exit with status 1 if a benchmark got slower than the
+tolerance::
+
+    python benchmarks/compare.py baseline.json results.json --tolerance 0.2
+"""
+
+import argparse
+import json
+import sys
+from typing import Dict, Tuple
+
+
+def load(path: str) -> Dict[Tuple[str, int, int], dict]:
+    with open(path) as f:
+        results = json.load(f)["results"]
+    return {(r["name"], r["sections"], r["image_size"]): r for r in results}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline", help="Results of the reference run.")
+    parser.add_argument("results", help="Results of the run to check.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown of the median (0.2: 20%%).")
+    args = parser.parse_args(argv)
+
+    baseline = load(args.baseline)
+    results = load(args.results)
+
+    regressions = 0
+    for key in sorted(baseline.keys() & results.keys()):
+        name, sections, size = key
+        before, after = baseline[key]["median"], results[key]["median"]
+        change = after / before - 1 if before > 0 else 0.0
+
+        flag = ""
+        if change > args.tolerance:
+            flag = "  REGRESSION"
+            regressions += 1
+
+        print(
+            f"{name:<20} {sections:>4} x {size:<5} "
+            f"{before * 1e3:10.3f} ms -> {after * 1e3:10.3f} ms {change:+7.1%}{flag}",
+        )
+
+    for key in sorted(baseline.keys() - results.keys()):
+        print(f"{key[0]:<20} {key[1]:>4} x {key[2]:<5} missing from {args.results}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
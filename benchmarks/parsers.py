@@ -0,0 +1,95 @@
+"""
+Checks and times the array parsers of ``util/parsers.py`` against the reference parsers of cryoet_alignment. For every
+synthetic dataset (with and without local alignments and dark frames), the alignments of both parsers must be equal,
+field by field and as JSON::
+
+    python benchmarks/parsers.py --sections 41 300 2000 --output parsers.json
+
+Exits with status 1 if an alignment differs. Results have the format of ``benchmarks/run.py`` and can be compared with
+``benchmarks/compare.py``.
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+from typing import Callable, Dict, List, Tuple
+
+from run import import_sources, measure, metadata, result
+
+
+def variants(sections: int) -> Dict[str, dict]:
+    """Dataset options by variant name."""
+    return {
+        "plain": {},
+        "patches": {"patches": 16},
+        "dark": {"dark_frames": [0, 1, sections // 2, sections + 2]},
+    }
+
+
+def parsers(dataset: dict) -> Dict[str, Tuple[Callable, Callable]]:
+    """Per format: the reference parser and the array parser of a dataset."""
+    from cryoet_alignment.io.aretomo3 import AreTomo3ALN
+    from cryoet_alignment.io.cryoet_data_portal import Alignment
+    from inspectet.util.parsers import aretomo3_alignment, parse_aln, read_imod_alignment, read_text
+
+    return {
+        "aretomo3": (
+            lambda: Alignment.from_aretomo3(AreTomo3ALN.from_file(dataset["aretomo3"]), vol_size=dataset["vol_size"]),
+            lambda: aretomo3_alignment(parse_aln(read_text(dataset["aretomo3"])), vol_size=dataset["vol_size"]),
+        ),
+        "imod": (
+            lambda: Alignment.from_imod_basename(dataset["imod"]),
+            lambda: read_imod_alignment(dataset["imod"]),
+        ),
+    }
+
+
+def parse_args(argv: List[str]):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sections", type=int, nargs="+", default=[41, 300, 2000], help="Sections per alignment.")
+    parser.add_argument("--size", type=int, default=512, help="Image size (pixels) of the tilt series.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per parser.")
+    parser.add_argument("--data", default=None, help="Directory for the synthetic datasets (default: temporary).")
+    parser.add_argument("--output", default="parsers.json", help="Results file.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    import_sources()
+    from synthetic import write_dataset
+
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="inspectet-parsers-") as tmp:
+        directory = args.data or tmp
+        for sections in args.sections:
+            for variant, options in variants(sections).items():
+                dataset = write_dataset(directory, sections, args.size, stack=False, **options)
+                for fmt, (reference, fast) in parsers(dataset).items():
+                    expected, actual = reference(), fast()
+                    ok = expected == actual and expected.model_dump_json() == actual.model_dump_json()
+
+                    info = {"sections": sections, "image_size": args.size}
+                    for name, parse in (("reference", reference), ("fast", fast)):
+                        times = measure(parse, args.repeat)
+                        results.append(result(f"parse {fmt} {variant} {name}", info, times, ok=ok))
+
+                    speedup = results[-2]["median"] / results[-1]["median"]
+                    print(
+                        f"{fmt:<9} {variant:<8} {sections:>6} sections  "
+                        f"{results[-2]['median'] * 1e3:9.2f} ms -> {results[-1]['median'] * 1e3:8.2f} ms  "
+                        f"{speedup:6.1f}x{'' if ok else '  MISMATCH'}",
+                        flush=True,
+                    )
+
+    with open(args.output, "w") as f:
+        json.dump({"metadata": metadata(None, args), "results": results, "skipped": []}, f, indent=2)
+
+    print(f"Wrote {len(results)} results to {args.output}.")
+    return 0 if all(r["ok"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,270 @@
+"""
+Regression harness for the S3 loaders of ``util/s3.py``. Synthetic IMOD, AreTomo3 and portal alignments and a tilt
+series are served from a local S3 stand-in (moto) that delays every request by the injected latency. For each loader,
+latency and cold or warm download cache, the harness records the wall time, the requests and bytes seen by the server
+and the loader's profiler counters, and checks that the loaded data matches the local files::
+
+    python benchmarks/remote.py --latency 0 20 100 --output remote.json
+
+Exits with status 1 if a loader returned different data. Needs ``moto[server]`` and ``boto3``. Results have the format
+of ``benchmarks/run.py`` and can be compared with ``benchmarks/compare.py``.
+"""
+
+import argparse
+import filecmp
+import json
+import logging
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Tuple
+
+from run import import_sources, metadata
+
+BUCKET = "inspectet-fixtures"
+
+
+class LatencyMiddleware:
+    """WSGI middleware delaying every request by ``latency`` seconds and counting requests and bytes."""
+
+    def __init__(self, app, latency: float = 0.0):
+        self.app = app
+        self.latency = latency
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = Counter()
+            self.bytes_sent = 0
+            self.bytes_received = 0
+
+    def __call__(self, environ, start_response):
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+        with self._lock:
+            self.requests[environ["REQUEST_METHOD"]] += 1
+            self.bytes_received += int(environ.get("CONTENT_LENGTH") or 0)
+
+        for chunk in self.app(environ, start_response):
+            with self._lock:
+                self.bytes_sent += len(chunk)
+            yield chunk
+
+
+class S3StandIn:
+    """A moto S3 server on a free local port, behind a ``LatencyMiddleware``."""
+
+    def __init__(self):
+        from moto.server import DomainDispatcherApplication, create_backend_app
+        from werkzeug.serving import make_server
+
+        # No log line per request
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+        self.middleware = LatencyMiddleware(DomainDispatcherApplication(create_backend_app))
+        self._server = make_server("127.0.0.1", 0, self.middleware, threaded=True)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    @property
+    def endpoint_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def upload(self, files: Dict[str, str]):
+        """Create the fixture bucket and upload local files, by key."""
+        import boto3
+
+        client = boto3.client(
+            "s3",
+            endpoint_url=self.endpoint_url,
+            aws_access_key_id="testing",
+            aws_secret_access_key="testing",
+            region_name="us-east-1",
+        )
+        client.create_bucket(Bucket=BUCKET)
+        for key, path in files.items():
+            client.upload_file(path, BUCKET, key)
+
+    def stop(self):
+        self._server.shutdown()
+        self._thread.join()
+
+
+def fixtures(directory: str, sections: int, size: int, patches: int) -> Dict[str, dict]:
+    """
+    Write the fixture files and describe each loader: its S3 URI, the local files to upload (by key) and the local file
+    its result must match.
+    """
+    import os
+
+    from synthetic import write_dataset
+
+    paths = write_dataset(directory, sections, size, patches=patches)
+    name = os.path.basename(paths["imod"])
+    imod_dir = os.path.dirname(paths["imod"])
+
+    return {
+        "imod": {
+            "uri": f"s3://{BUCKET}/imod/{name}",
+            "files": {
+                f"imod/{name}.xf": f"{paths['imod']}.xf",
+                f"imod/{name}.tlt": f"{paths['imod']}.tlt",
+                f"imod/{name}.xtilt": f"{paths['imod']}.xtilt",
+                "imod/tilt.com": os.path.join(imod_dir, "tilt.com"),
+                "imod/newst.com": os.path.join(imod_dir, "newst.com"),
+            },
+            "local": paths["imod"],
+        },
+        "aretomo3": {
+            "uri": f"s3://{BUCKET}/aretomo3/{name}.aln",
+            "files": {f"aretomo3/{name}.aln": paths["aretomo3"]},
+            "local": paths["aretomo3"],
+        },
+        "cdp": {
+            "uri": f"s3://{BUCKET}/cdp/{name}.json",
+            "files": {f"cdp/{name}.json": paths["cdp"]},
+            "local": paths["cdp"],
+        },
+        "tiltseries": {
+            "uri": f"s3://{BUCKET}/tiltseries/{name}.mrc",
+            "files": {f"tiltseries/{name}.mrc": paths["stack"]},
+            "local": paths["stack"],
+        },
+    }
+
+
+def loaders() -> Dict[str, Tuple[Callable, Callable]]:
+    """Per loader: a function loading an S3 URI and a function checking its result against the local file."""
+    from cryoet_alignment.io.aretomo3 import AreTomo3ALN
+    from cryoet_alignment.io.cryoet_data_portal import Alignment
+    from cryoet_alignment.io.imod import ImodAlignment
+    from inspectet.util.s3 import aretomo3_from_s3, cdp_from_s3, fetch_file, imod_from_s3
+
+    return {
+        "imod": (imod_from_s3, lambda result, local: result == ImodAlignment.read(base_name=local)),
+        "aretomo3": (aretomo3_from_s3, lambda result, local: result == AreTomo3ALN.from_file(local)),
+        "cdp": (cdp_from_s3, lambda result, local: result == Alignment.from_file(local)),
+        "tiltseries": (fetch_file, lambda result, local: filecmp.cmp(result, local, shallow=False)),
+    }
+
+
+def run_loader(server: S3StandIn, loader: Tuple[Callable, Callable], fixture: dict, repeat: int, cold: bool) -> dict:
+    """Load a fixture ``repeat`` times, with an empty (cold) or filled (warm) download cache."""
+    from inspectet.util.cache import get_cache
+    from inspectet.util.profiling import profiler
+
+    load, check = loader
+    if not cold:
+        load(fixture["uri"])
+
+    times, requests, sent, counters = [], Counter(), 0, Counter()
+    ok = True
+    for _ in range(repeat):
+        if cold:
+            get_cache().clear()
+
+        server.middleware.reset()
+        profiler.reset()
+        profiler.enabled = True
+        try:
+            start = time.perf_counter()
+            loaded = load(fixture["uri"])
+            times.append(time.perf_counter() - start)
+        finally:
+            profiler.enabled = False
+
+        ok = check(loaded, fixture["local"]) and ok
+        requests.update(server.middleware.requests)
+        sent += server.middleware.bytes_sent
+        counters.update({k: v for k, v in profiler.counters.items() if k.startswith("s3")})
+
+    return {
+        "runs": repeat,
+        "mean": statistics.fmean(times),
+        "median": statistics.median(times),
+        "min": min(times),
+        "max": max(times),
+        "times": times,
+        "requests": {method: n / repeat for method, n in sorted(requests.items())},
+        "bytes_sent": sent / repeat,
+        "counters": {name: n / repeat for name, n in sorted(counters.items())},
+        "ok": ok,
+    }
+
+
+def parse_args(argv: List[str]):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, nargs="+", default=[0, 20, 100], help="Request latencies in ms.")
+    parser.add_argument("--sections", type=int, default=41, help="Sections of the fixture alignments.")
+    parser.add_argument("--size", type=int, default=256, help="Image size (pixels) of the fixture tilt series.")
+    parser.add_argument("--patches", type=int, default=0, help="Local alignment patches per section (AreTomo3).")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per loader, latency and cache state.")
+    parser.add_argument("--output", default="remote.json", help="Results file.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    import_sources()
+    from inspectet.util.cache import configure_cache
+    from inspectet.util.s3 import configure_s3, get_filesystem
+
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    server = S3StandIn()
+    results = []
+    with tempfile.TemporaryDirectory(prefix="inspectet-remote-") as tmp:
+        try:
+            loaders_by_name = loaders()
+            fixtures_by_name = fixtures(tmp, args.sections, args.size, args.patches)
+            server.upload({k: v for f in fixtures_by_name.values() for k, v in f["files"].items()})
+
+            configure_cache(directory=f"{tmp}/cache")
+            configure_s3(
+                endpoint_url=server.endpoint_url,
+                key="testing",
+                secret="testing",
+                client_kwargs={"region_name": "us-east-1"},
+            )
+
+            # Connect before measuring
+            get_filesystem().ls(BUCKET)
+
+            for latency in args.latency:
+                server.middleware.latency = latency / 1e3
+                for name, load in loaders_by_name.items():
+                    for cold in (True, False):
+                        r = run_loader(server, load, fixtures_by_name[name], args.repeat, cold)
+                        r = {
+                            "name": f"{name} {'cold' if cold else 'warm'} {latency:g}ms",
+                            "sections": args.sections,
+                            "image_size": args.size,
+                            "loader": name,
+                            "latency_ms": latency,
+                            "cache": "cold" if cold else "warm",
+                            **r,
+                        }
+                        requests = ", ".join(f"{n:g} {method}" for method, n in r["requests"].items())
+                        print(
+                            f"{r['name']:<24} {r['median'] * 1e3:9.1f} ms  {requests:<24} "
+                            f"{r['bytes_sent'] / 1024:9.1f} KiB{'' if r['ok'] else '  MISMATCH'}",
+                            flush=True,
+                        )
+                        results.append(r)
+        finally:
+            server.stop()
+
+    with open(args.output, "w") as f:
+        json.dump({"metadata": metadata(None, args), "results": results, "skipped": []}, f, indent=2)
+
+    print(f"Wrote {len(results)} results to {args.output}.")
+    return 0 if all(r["ok"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
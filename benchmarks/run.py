@@ -0,0 +1,445 @@
+"""
+Benchmarks of the parse, load, switch, scrub and playback paths on synthetic alignments and tilt series.
+
+Outside ChimeraX, only the benchmarks that do not need a session run (parsers, placements, footprint, section
+reads)::
+
+    python benchmarks/run.py --sections 41 300 --output results.json
+
+Everything runs in a headless ChimeraX session::
+
+    chimerax --nogui --offscreen --exit --script "benchmarks/run.py --sections 41 300 --output results.json"
+
+The sources of this checkout are benchmarked, not the installed bundle. Results are written as JSON, compare two runs
+with ``benchmarks/compare.py``.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import types
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+BENCHMARKS: Dict[str, Callable] = {}
+"""Benchmarks by name, in the order they run."""
+
+SESSION_BENCHMARKS = set()
+"""Benchmarks that need a ChimeraX session."""
+
+
+def import_sources():
+    """
+    Make the sources of this checkout importable as package ``inspectet``, without the ChimeraX bundle entry point.
+    """
+    if "inspectet" not in sys.modules:
+        package = types.ModuleType("inspectet")
+        package.__path__ = [os.path.join(ROOT, "src")]
+        sys.modules["inspectet"] = package
+
+    if HERE not in sys.path:
+        sys.path.insert(0, HERE)
+
+
+def benchmark(name: str, session: bool = False):
+    def decorator(func):
+        BENCHMARKS[name] = func
+        if session:
+            SESSION_BENCHMARKS.add(name)
+        return func
+
+    return decorator
+
+
+def measure(func: Callable, repeat: int, setup: Optional[Callable] = None) -> List[float]:
+    """Wall times of ``repeat`` calls of func in seconds. ``setup`` runs untimed before every call."""
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def result(name: str, dataset: dict, times: List[float], **extra) -> dict:
+    return {
+        "name": name,
+        "sections": dataset["sections"],
+        "image_size": dataset["image_size"],
+        "runs": len(times),
+        "mean": statistics.fmean(times),
+        "median": statistics.median(times),
+        "min": min(times),
+        "max": max(times),
+        "times": times,
+        **extra,
+    }
+
+
+# Benchmarks without a session
+
+
+@benchmark("parse")
+def bench_parse(session, dataset: dict, args) -> List[dict]:
+    """The alignment parsers of cryoet_alignment and the array parsers the loader uses, one result per format."""
+    from cryoet_alignment.io.aretomo3 import AreTomo3ALN
+    from cryoet_alignment.io.cryoet_data_portal import Alignment
+    from inspectet.util.parsers import aretomo3_alignment, parse_aln, read_imod_alignment, read_text
+
+    parsers = {
+        "aretomo3": lambda: Alignment.from_aretomo3(
+            AreTomo3ALN.from_file(dataset["aretomo3"]),
+            vol_size=dataset["vol_size"],
+        ),
+        "aretomo3 fast": lambda: aretomo3_alignment(
+            parse_aln(read_text(dataset["aretomo3"])),
+            vol_size=dataset["vol_size"],
+        ),
+        "imod": lambda: Alignment.from_imod_basename(dataset["imod"]),
+        "imod fast": lambda: read_imod_alignment(dataset["imod"]),
+        "cdp": lambda: Alignment.from_file(dataset["cdp"]),
+    }
+
+    return [result(f"parse {fmt}", dataset, measure(parse, args.repeat)) for fmt, parse in parsers.items()]
+
+
+@benchmark("placements")
+def bench_placements(session, dataset: dict, args) -> List[dict]:
+    """Image and volume placements of all sections, without the placement cache."""
+    import numpy as np
+    from cryoet_alignment.io.cryoet_data_portal import Alignment
+    from inspectet.core.placement import compute_placements
+
+    ali = Alignment.from_file(dataset["cdp"])
+    size = dataset["image_size"] * 10.0
+
+    def compute():
+        compute_placements(
+            ali,
+            image_size=(size, size),
+            pixel_size=(10.0, 10.0),
+            z_offset=-1000,
+            additional_rotation=np.eye(3, 4),
+            coord_order=(0, 1, 2),
+            plane_step=10.0,
+        )
+
+    return [result("placements", dataset, measure(compute, args.repeat))]
+
+
+@benchmark("footprint")
+def bench_footprint(session, dataset: dict, args) -> List[dict]:
+    """Volume footprint QC of all sections (corners and sampled coverage) from precomputed placements."""
+    import numpy as np
+    from cryoet_alignment.io.cryoet_data_portal import Alignment
+    from inspectet.core.footprint import volume_footprint
+    from inspectet.core.placement import compute_placements
+
+    ali = Alignment.from_file(dataset["cdp"])
+    size = dataset["image_size"] * 10.0
+    p = compute_placements(ali, (size, size), (10.0, 10.0), -1000, np.eye(3, 4), (0, 1, 2))
+
+    def compute():
+        volume_footprint(p.image, p.volume, p.image_size, p.volume_size)
+
+    return [result("footprint", dataset, measure(compute, args.repeat))]
+
+
+@benchmark("sections")
+def bench_sections(session, dataset: dict, args) -> List[dict]:
+    """Reading every section of the stack, unbinned and binned by 2."""
+    from inspectet.core.sources import bin_section_source, open_section_source
+
+    results = []
+    for binning in (1, 2):
+
+        def read(binning=binning):
+            source = bin_section_source(open_section_source(dataset["stack"]), binning)
+            for z in range(source.shape[0]):
+                # Touch the data, sections of native MRC files are views into the file mapping
+                source.section(z).max()
+
+        results.append(result(f"read sections bin{binning}", dataset, measure(read, args.repeat), binning=binning))
+
+    return results
+
+
+# Benchmarks in a ChimeraX session
+
+
+def load_request(dataset: dict):
+    from inspectet.core.loader import LoadRequest
+
+    return LoadRequest("AreTomo3", dataset["aretomo3"], vol_size=dataset["vol_size"], ts_file=dataset["stack"])
+
+
+def close_models(session):
+    from chimerax.core.commands import run
+
+    run(session, "close", log=False)
+
+
+def load_counted(session, request) -> dict:
+    """Load an alignment with the profiler on, returning the profiler's stage times (ms) and counters."""
+    from inspectet.core.loader import load_alignment
+    from inspectet.util.profiling import profiler
+
+    profiler.reset()
+    profiler.enabled = True
+    try:
+        load_alignment(session, request)
+    finally:
+        profiler.enabled = False
+
+    return {
+        "stages": {stage: total * 1e3 for stage, (_, total, _, _) in profiler.times.items()},
+        "counters": dict(profiler.counters),
+    }
+
+
+@benchmark("load", session=True)
+def bench_load(session, dataset: dict, args) -> List[dict]:
+    """
+    Loading an alignment with its tilt series: cold (no models), reloading the same alignment and switching between
+    two alignments of the same size.
+    """
+    from inspectet.core.loader import load_alignment
+    from synthetic import write_dataset
+
+    request = load_request(dataset)
+    other = load_request(
+        write_dataset(args.data, dataset["sections"], dataset["image_size"], patches=args.patches, seed=1),
+    )
+
+    results = []
+
+    times = measure(lambda: load_alignment(session, request), args.repeat, setup=lambda: close_models(session))
+    close_models(session)
+    results.append(result("load cold", dataset, times, profile=load_counted(session, request)))
+
+    times = measure(lambda: load_alignment(session, request), args.repeat)
+    results.append(result("load reload", dataset, times, profile=load_counted(session, request)))
+
+    def switch():
+        load_alignment(session, other)
+        load_alignment(session, request)
+
+    times = [t / 2 for t in measure(switch, args.repeat)]
+    results.append(result("load switch", dataset, times, profile=load_counted(session, other)))
+
+    return results
+
+
+@benchmark("create", session=True)
+def bench_create(session, dataset: dict, args) -> List[dict]:
+    """Building the models of an alignment from an opened tilt series grid (``create_alignment_objects``)."""
+    from inspectet.core.alignment import create_alignment_objects
+    from inspectet.core.loader import load_alignment
+    from inspectet.core.tiltstack import open_tilt_series
+
+    # Sets the volume orientation of the state
+    ali = load_alignment(session, load_request(dataset)).alignment
+    grid = open_tilt_series(dataset["stack"])
+
+    def create():
+        create_alignment_objects(
+            session,
+            ali,
+            ali.per_section_alignment_parameters[0],
+            vol_file=None,
+            ts_file=None,
+            ts_data=grid,
+        )
+
+    times = measure(create, args.repeat, setup=lambda: close_models(session))
+    return [result("create models", dataset, times)]
+
+
+def frame_driver(session) -> Callable[[], None]:
+    """
+    Draws one frame like the redraw timer of the GUI, offscreen if available. Without rendering, only the ``new frame``
+    trigger fires.
+    """
+    from chimerax.core.errors import UserError
+    from inspectet.core.recorder import initialize_rendering
+
+    try:
+        initialize_rendering(session)
+    except UserError:
+        return lambda: session.triggers.activate_trigger("new frame", session.update_loop)
+
+    return session.update_loop.draw_new_frame
+
+
+@benchmark("scrub", session=True)
+def bench_scrub(session, dataset: dict, args) -> List[dict]:
+    """Showing every section forwards and backwards, as when dragging the slider, with and without drawing."""
+    from inspectet.core.alignment import apply_alignment
+    from inspectet.core.loader import load_alignment
+
+    ali = load_alignment(session, load_request(dataset)).alignment
+    psaps = ali.per_section_alignment_parameters
+    order = psaps + psaps[::-1]
+    draw = frame_driver(session)
+
+    def scrub():
+        for p in order:
+            apply_alignment(session, ali, p)
+
+    def scrub_drawn():
+        for p in order:
+            apply_alignment(session, ali, p)
+            draw()
+
+    return [
+        result("scrub", dataset, [t / len(order) for t in measure(scrub, args.repeat)], unit="section"),
+        result("scrub drawn", dataset, [t / len(order) for t in measure(scrub_drawn, args.repeat)], unit="section"),
+    ]
+
+
+@benchmark("play", session=True)
+def bench_play(session, dataset: dict, args) -> List[dict]:
+    """Playback at ``--fps`` views per second, driven by drawing frames as fast as possible."""
+    from inspectet.core.loader import load_alignment
+    from inspectet.core.playback import AlignmentPlayer
+
+    ali = load_alignment(session, load_request(dataset)).alignment
+    draw = frame_driver(session)
+
+    results = []
+    for _ in range(args.repeat):
+        player = AlignmentPlayer(session, ali, args.fps)
+        frames = []
+
+        player.start()
+        while player.active:
+            start = time.perf_counter()
+            draw()
+            frames.append(time.perf_counter() - start)
+
+        results.append(
+            {
+                "elapsed": player.elapsed(),
+                "achieved_fps": player.achieved_fps(),
+                "shown": player.shown,
+                "dropped": player.dropped,
+                "frame_p95": sorted(frames)[int(0.95 * (len(frames) - 1))],
+            },
+        )
+
+    return [
+        result(
+            "play",
+            dataset,
+            [r["elapsed"] for r in results],
+            target_fps=args.fps,
+            achieved_fps=statistics.fmean(r["achieved_fps"] for r in results),
+            dropped=statistics.fmean(r["dropped"] for r in results),
+            frame_p95=max(r["frame_p95"] for r in results),
+        ),
+    ]
+
+
+def metadata(session, args) -> dict:
+    import numpy as np
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    try:
+        from importlib.metadata import version
+
+        chimerax = version("ChimeraX-Core") if session is not None else None
+    except ImportError:
+        chimerax = None
+
+    return {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "chimerax": chimerax,
+        "platform": platform.platform(),
+        "arguments": {k: v for k, v in vars(args).items() if k != "data"},
+    }
+
+
+def parse_args(argv: List[str]):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sections", type=int, nargs="+", default=[41, 300], help="Numbers of sections.")
+    parser.add_argument("--size", type=int, default=512, help="Image size (pixels) of the synthetic tilt series.")
+    parser.add_argument("--patches", type=int, default=0, help="Local alignment patches per section (AreTomo3).")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per benchmark.")
+    parser.add_argument("--fps", type=float, default=60, help="Target rate of the playback benchmark.")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="Benchmarks to run (default: all).")
+    parser.add_argument("--data", help="Directory for the synthetic datasets, kept between runs (default: temporary).")
+    parser.add_argument("--output", default="benchmark.json", help="Results file.")
+    return parser.parse_args(argv)
+
+
+def main(session=None, argv: Optional[List[str]] = None):
+    import_sources()
+    from synthetic import write_dataset
+
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    temporary = args.data is None
+    if temporary:
+        args.data = tempfile.mkdtemp(prefix="inspectet-benchmark-")
+
+    def log(message: str):
+        if session is not None:
+            session.logger.info(message)
+        else:
+            print(message, flush=True)
+
+    names = args.only or list(BENCHMARKS)
+    results, skipped = [], []
+    try:
+        for sections in args.sections:
+            paths = write_dataset(args.data, sections, args.size, patches=args.patches)
+            dataset = {"sections": sections, "image_size": args.size, **paths}
+
+            for name in names:
+                if name in SESSION_BENCHMARKS and session is None:
+                    skipped.append({"name": name, "sections": sections, "reason": "needs a ChimeraX session"})
+                    continue
+
+                for r in BENCHMARKS[name](session, dataset, args):
+                    log(f"{r['name']:<20} {sections:>4} sections  mean {r['mean'] * 1e3:9.3f} ms")
+                    results.append(r)
+    finally:
+        if temporary:
+            shutil.rmtree(args.data, ignore_errors=True)
+
+    with open(args.output, "w") as f:
+        json.dump({"metadata": metadata(session, args), "results": results, "skipped": skipped}, f, indent=2)
+
+    log(f"Wrote {len(results)} results to {args.output}, skipped {len(skipped)}.")
+
+
+if __name__ == "__main__":
+    main()
+elif "session" in globals():
+    # Run as a ChimeraX script
+    main(session)  # noqa: F821
@@ -0,0 +1,143 @@
+import os
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+from cryoet_alignment.io.aretomo3 import AreTomo3ALN
+from cryoet_alignment.io.aretomo3.aln import DarkFrameInfo, GlobalAlignmentInfo, LocalAlignmentInfo
+from cryoet_alignment.io.cryoet_data_portal import Alignment
+from inspectet.util.mrc import _HEADER_SIZE, _header_dtype
+
+DEFAULT_PIXEL_SIZE = 10.0
+"""Pixel size of the synthetic tilt series in Angstrom."""
+
+MAX_TILT = 60.0
+
+
+def synthetic_aln(
+    num_sections: int,
+    image_size: int,
+    patches: int = 0,
+    seed: int = 0,
+    dark_frames: Sequence[int] = (),
+) -> AreTomo3ALN:
+    """
+    An AreTomo3 alignment of a tilt series of ``num_sections`` square images, tilted from -60 to 60 degrees, with
+    random shifts and tilt axis rotations near -85 degrees. With ``patches`` set, every section gets that many local
+    alignments. The sections at ``dark_frames`` (indices into the raw stack) are left out as dark frames, the
+    alignment keeps ``num_sections`` sections.
+    """
+    rng = np.random.default_rng(seed)
+    tilts = np.linspace(-MAX_TILT, MAX_TILT, num_sections)
+    rotations = -85 + rng.normal(0, 0.5, num_sections)
+    shifts = rng.normal(0, image_size / 100, (num_sections, 2))
+
+    global_alignments = [
+        GlobalAlignmentInfo(sec=i, rot=rotations[i], tx=shifts[i, 0], ty=shifts[i, 1], tilt=tilts[i])
+        for i in range(num_sections)
+    ]
+
+    local_alignments = []
+    centers = rng.uniform(-image_size / 2, image_size / 2, (patches, 2))
+    for i in range(num_sections):
+        for p in range(patches):
+            local_alignments.append(
+                LocalAlignmentInfo(
+                    sec_idx=i,
+                    patch_idx=p,
+                    center_x=centers[p, 0],
+                    center_y=centers[p, 1],
+                    shift_x=rng.normal(),
+                    shift_y=rng.normal(),
+                    is_reliable=1.0,
+                ),
+            )
+
+    return AreTomo3ALN(
+        RawSize=(image_size, image_size, num_sections + len(dark_frames)),
+        NumPatches=patches,
+        DarkFrames=[DarkFrameInfo(section_idx=d, val2=0, angle=MAX_TILT) for d in sorted(dark_frames)],
+        AlphaOffset=0.0,
+        BetaOffset=0.0,
+        GlobalAlignments=global_alignments,
+        LocalAlignments=local_alignments,
+    )
+
+
+def write_mrc(path: str, shape: Tuple[int, int, int], pixel_size: float = DEFAULT_PIXEL_SIZE, seed: int = 0):
+    """Write an MRC stack (mode 2) of noise, shape (z, y, x). Sections are generated one at a time."""
+    nz, ny, nx = shape
+
+    header = np.zeros(1, dtype=_header_dtype("<"))
+    header["nx"], header["ny"], header["nz"] = nx, ny, nz
+    header["mode"] = 2
+    header["mx"], header["my"], header["mz"] = nx, ny, nz
+    header["cella"] = (nx * pixel_size, ny * pixel_size, nz * pixel_size)
+    header["cellb"] = (90, 90, 90)
+    header["mapcrs"] = (1, 2, 3)
+    header["dmin"], header["dmax"], header["dmean"] = -4, 4, 0
+    header["ispg"] = 1
+    header["nversion"] = 20141
+    header["map"] = b"MAP "
+    header["machst"] = (0x44, 0x44, 0, 0)
+    header["rms"] = 1
+    assert header.nbytes == _HEADER_SIZE
+
+    rng = np.random.default_rng(seed)
+    with open(path, "wb") as f:
+        f.write(header.tobytes())
+        for _ in range(nz):
+            f.write(rng.standard_normal((ny, nx), dtype=np.float32).tobytes())
+
+
+def write_dataset(
+    directory: str,
+    num_sections: int,
+    image_size: int,
+    patches: int = 0,
+    stack: bool = True,
+    seed: int = 0,
+    dark_frames: Sequence[int] = (),
+) -> Dict[str, str]:
+    """
+    Write one synthetic dataset: the same alignment as AreTomo3 .aln, IMOD basename (.xf, .tlt, .xtilt, tilt.com,
+    newst.com) and portal .json, and optionally the tilt series stack. Files are only written if they do not exist.
+    Dark frames are excluded sections in tilt.com.
+
+    Returns
+    -------
+    dict
+        Paths of the ``aretomo3`` alignment, ``imod`` basename, ``cdp`` alignment and ``stack`` (if written), and the
+        ``vol_size`` of the alignment in Angstrom.
+    """
+    name = f"ts{num_sections}_{image_size}px_{patches}patches_seed{seed}"
+    if dark_frames:
+        name += f"_{len(dark_frames)}dark"
+    raw_sections = num_sections + len(dark_frames)
+    directory = os.path.join(directory, name)
+    os.makedirs(directory, exist_ok=True)
+
+    paths = {
+        "aretomo3": os.path.join(directory, f"{name}.aln"),
+        "imod": os.path.join(directory, name),
+        "cdp": os.path.join(directory, f"{name}.json"),
+    }
+    vol_size = (image_size * DEFAULT_PIXEL_SIZE, image_size * DEFAULT_PIXEL_SIZE, image_size * DEFAULT_PIXEL_SIZE / 4)
+
+    if not all(os.path.exists(p) for p in (paths["aretomo3"], paths["cdp"], f"{paths['imod']}.xf")):
+        aln = synthetic_aln(num_sections, image_size, patches=patches, seed=seed, dark_frames=dark_frames)
+        aln.to_file(paths["aretomo3"])
+
+        ali = Alignment.from_aretomo3(aln, vol_size=vol_size)
+        ali.to_file(paths["cdp"])
+
+        imod = ali.to_imod((image_size, image_size, raw_sections), DEFAULT_PIXEL_SIZE, basename=name)
+        imod.write(base_name=paths["imod"])
+
+    if stack:
+        # Named like IMOD's raw stack, so the IMOD loader finds it
+        paths["stack"] = f"{paths['imod']}.mrc"
+        if not os.path.exists(paths["stack"]):
+            write_mrc(paths["stack"], (raw_sections, image_size, image_size), seed=seed)
+
+    paths["vol_size"] = vol_size
+    return paths
@@ -24,6 +24,18 @@ class _MyAPI(BundleAPI):
 
             register_inspectet(logger)
 
+    @staticmethod
+    def get_class(class_name):
+        # Classes saved in sessions
+        if class_name == "InspectETTool":
+            from . import tool
+
+            return tool.InspectETTool
+        if class_name == "InspectETState":
+            from .core.state import InspectETState
+
+            return InspectETState
+
 
 # Create the ``bundle_api`` object that ChimeraX expects.
 bundle_api = _MyAPI()
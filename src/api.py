@@ -0,0 +1,33 @@
+"""
+Scripting interface of InspectET, independent of the tool window::
+
+    from chimerax.InspectET.api import open_alignment, show_section
+
+    open_alignment(session, "/data/TS_01.aln", alignment_type="aretomo3", vol_file="/data/TS_01.mrc")
+    show_section(session, 10)
+"""
+
+from .core.alignment import show_section
+from .core.footprint import VolumeFootprint, loaded_footprint, volume_footprint
+from .core.loader import ALIGNMENT_FORMATS, ALIGNMENT_TYPES, LoadRequest, load_alignment, open_alignment
+from .core.recorder import record
+from .core.sources import AUTO_BINNING
+from .core.state import ALIGNMENT_SHOWN, SECTION_SHOWN, InspectETState, get_state
+
+__all__ = [
+    "ALIGNMENT_FORMATS",
+    "ALIGNMENT_SHOWN",
+    "ALIGNMENT_TYPES",
+    "AUTO_BINNING",
+    "SECTION_SHOWN",
+    "InspectETState",
+    "LoadRequest",
+    "VolumeFootprint",
+    "get_state",
+    "load_alignment",
+    "loaded_footprint",
+    "open_alignment",
+    "record",
+    "show_section",
+    "volume_footprint",
+]
@@ -1,49 +1,448 @@
 # vim: set expandtab shiftwidth=4 softtabstop=4:
 
-from ..core.alignment import apply_alignment
+from ..core.playback import DEFAULT_FRAME_RATE, AlignmentPlayer
+from ..core.state import get_state
 
 
-def play(session, framesPerView: int = 10, loopNumber: int = 1):
-    """Playback a tomographic alignment."""
+def open_alignment(
+    session,
+    path: str,
+    format: str = "aretomo3",
+    volDims=None,
+    volume: str = None,
+    tiltSeries: str = None,
+    binning: str = None,
+):
+    """
+    Open a tomographic alignment without the tool window. ``format`` is one of cdp, imod or aretomo3, ``volDims`` the
+    volume size (x, y, z) if no ``volume`` file is given and ``binning`` the tilt series binning (1, 2, 4, 8 or auto).
+    """
+    from ..core.loader import open_alignment as open_alignment_api
+    from ..core.sources import AUTO_BINNING
+
+    if binning is not None:
+        binning = AUTO_BINNING if binning == "auto" else int(binning)
+
+    loaded = open_alignment_api(
+        session,
+        path,
+        alignment_type=format,
+        vol_size=tuple(volDims) if volDims is not None else None,
+        vol_file=volume,
+        ts_file=tiltSeries,
+        binning=binning,
+    )
+
+    message = "Opened alignment %s with %d sections." % (path, len(loaded.sections))
+    session.logger.info(message)
+
+
+def compare(
+    session,
+    path: str,
+    format: str = "aretomo3",
+    volDims=None,
+    volume: str = None,
+    name: str = None,
+):
+    """
+    Compare another alignment of the current tilt series with the current alignment. The tilt series and tomogram
+    data are shared, only the placements are added. Toggle it by showing or hiding its group model.
+    """
+    from ..core.loader import compare_alignment
+
+    comparison = compare_alignment(
+        session,
+        path,
+        alignment_type=format,
+        vol_size=tuple(volDims) if volDims is not None else None,
+        vol_file=volume,
+        name=name,
+    )
+    message = "Comparing alignment %s (#%s, %s)." % (comparison.name, comparison.group.id_string, comparison.color)
+    session.logger.info(message)
+
+
+def uncompare(session, name: str = None):
+    """Remove compared alignments, all or those with the given name."""
+    from ..core.compare import remove_comparisons
+
+    remove_comparisons(session, name)
+
+
+def queue(session, path: str, format: str = "aretomo3", volDims=None, prefetch: int = 2):
+    """
+    Queue the alignments of a directory (IMOD basenames, AreTomo3 .aln or portal .json files) or of a run list (one
+    alignment per line, optionally followed by tilt series and volume) and show the first one. The next ``prefetch``
+    datasets are prepared in the background.
+    """
+    from ..core.datasets import queue_datasets, show_dataset_when_ready
+    from ..core.loader import ALIGNMENT_FORMATS, LoadRequest
+
+    template = LoadRequest(ALIGNMENT_FORMATS[format], "", tuple(volDims) if volDims is not None else None)
+    datasets = queue_datasets(session, path, template, prefetch=prefetch)
+    message = "Queued %d datasets." % len(datasets)
+    session.logger.info(message)
+
+    show_dataset_when_ready(session, datasets, datasets.next())
+
+
+def next_dataset(session):
+    """Show the next dataset of the queue."""
+    _step_dataset(session, 1)
+
+
+def previous_dataset(session):
+    """Show the previous dataset of the queue."""
+    _step_dataset(session, -1)
+
+
+def _step_dataset(session, step: int):
+    from chimerax.core.errors import UserError
+
+    from ..core.datasets import show_dataset_when_ready
+
+    datasets = get_state(session).datasets
+    if datasets is None:
+        raise UserError("No datasets queued.")
+
+    future = datasets.go(datasets.index + step)
+    message = "Dataset %d / %d: %s" % (datasets.index + 1, len(datasets), datasets.name())
+    session.logger.info(message)
+    show_dataset_when_ready(session, datasets, future)
+
+
+def footprint(
+    session,
+    path: str = None,
+    format: str = "aretomo3",
+    volDims=None,
+    output: str = None,
+    samples: int = 16,
+):
+    """
+    Report where the volume projects into the tilt image of every section: the fraction of the volume inside the image
+    (sampled at ``samples`` points per axis) and the corners outside it. Without ``path`` for the current alignment,
+    otherwise for every alignment of a directory or run list. These are only parsed, sizes are read from the tilt
+    series and volume headers (by ranged reads on S3, nothing is downloaded) and no models are built (works in
+    ``chimerax --nogui``). ``output`` writes one row per section, as JSON (.json) or tab-separated values.
+    """
+    import os
+
+    from chimerax.core.errors import UserError
+
+    from ..core.footprint import (
+        DEFAULT_SAMPLES,
+        footprint_rows,
+        loaded_footprint,
+        summary,
+        volume_footprint,
+        write_footprints,
+    )
+
+    rows = []
+    if path is None:
+        state = get_state(session)
+        if state.current_alignment is None or state.placements is None:
+            raise UserError("No tomographic alignment loaded.")
+
+        # As shown: the image size of the current tilt series or placeholder boxes
+        placements = state.placements
+        if samples == DEFAULT_SAMPLES:
+            fp = placements.footprint()
+        else:
+            fp = volume_footprint(
+                placements.image,
+                placements.volume,
+                placements.image_size,
+                placements.volume_size,
+                samples,
+            )
+        rows += footprint_rows("current", placements.sections, fp)
+        message = "Volume footprint: %s." % summary(fp, placements.sections)
+        session.logger.info(message)
+    else:
+        from ..core.datasets import dataset_requests
+        from ..core.loader import ALIGNMENT_FORMATS, LoadRequest, read_alignment
+
+        template = LoadRequest(ALIGNMENT_FORMATS[format], "", tuple(volDims) if volDims is not None else None)
+        requests = dataset_requests(path, template)
+        failed = 0
+        for request in requests:
+            name = os.path.basename(request.path.rstrip("/"))
+            # Remote tilt series and volumes are not downloaded, only their headers are read
+            try:
+                loaded = read_alignment(request)
+                fp, _ = loaded_footprint(loaded, samples)
+            except Exception as e:
+                failed += 1
+                message = "%s: %s" % (name, e)
+                session.logger.warning(message)
+                continue
+
+            rows += footprint_rows(name, loaded.sections, fp)
+            message = "%s: %s." % (name, summary(fp, loaded.sections))
+            session.logger.info(message)
+
+        message = "Volume footprints of %d / %d datasets." % (len(requests) - failed, len(requests))
+        session.logger.info(message)
+
+    if output is not None:
+        write_footprints(output, rows)
+        message = "Wrote %d sections to %s." % (len(rows), output)
+        session.logger.info(message)
+
+
+def play(session, framesPerView: int = 10, loopNumber: int = 1, fps: float = None):
+    """
+    Playback a tomographic alignment. Views are shown at ``fps`` views per second (by default the ChimeraX frame rate
+    divided by ``framesPerView``), dropping views if rendering falls behind. Returns immediately, use
+    ``inspectet pause``, ``inspectet resume`` and ``inspectet stop`` to control playback.
+    """
     if not session.ui.is_gui:
-        session.logger.warning("InspectET requires Chimerax GUI.")
+        session.logger.warning("Playback requires the ChimeraX GUI, use inspectet record in sessions without a window.")
+        return
 
-    if session.inspectet is None or session.inspectet.current_alignment is None:
+    state = get_state(session)
+    if state.current_alignment is None:
         session.logger.warning("No tomographic alignment loaded.")
         return
 
-    ali = session.inspectet.current_alignment
-    psaps = session.inspectet.current_alignment.per_section_alignment_parameters
-
     if loopNumber < 1:
         session.logger.warning("Loop number must be greater than 0.")
         return
 
-    num_views = len(psaps)
+    if fps is None:
+        if framesPerView < 1:
+            session.logger.warning("Frames per view must be greater than 0.")
+            return
+        fps = DEFAULT_FRAME_RATE / framesPerView
+
+    if fps <= 0:
+        session.logger.warning("Frame rate must be greater than 0.")
+        return
+
+    stop(session)
+
+    player = AlignmentPlayer(session, state.current_alignment, fps, loopNumber)
+    state.player = player
+    player.start()
+
+    return player
+
+
+def _player(session):
+    state = getattr(session, "inspectet", None)
+    player = getattr(state, "player", None)
+    if player is None or not player.active:
+        return None
+    return player
 
-    for loop in range(loopNumber):
-        for i in range(num_views):
-            if loop % 2 == 0:
-                idx = i
-            else:
-                idx = -i
 
-            psap = psaps[idx]
-            apply_alignment(session, ali, psap)
+def pause(session):
+    """Pause alignment playback."""
+    player = _player(session)
+    if player is not None:
+        player.pause()
 
-            for f in range(framesPerView):
-                session.update_loop.draw_new_frame()
+
+def resume(session):
+    """Resume paused alignment playback."""
+    player = _player(session)
+    if player is not None:
+        player.resume()
+
+
+def stop(session):
+    """Stop alignment playback and report the achieved frame rate."""
+    player = _player(session)
+    if player is not None:
+        player.stop()
+
+
+def record(
+    session,
+    path: str,
+    width: int = 1920,
+    height: int = 1080,
+    framesPerView: int = 10,
+    loopNumber: int = 1,
+    fps: float = 25,
+    supersample: int = 3,
+):
+    """
+    Record a movie of the tomographic alignment. Every view is rendered offscreen at ``width`` x ``height`` and kept
+    for ``framesPerView`` movie frames. Paths ending in .mp4, .mov, .avi or .webm are encoded with ffmpeg, any other
+    path is a directory for PNG frames. Works without a window, e.g. in ``chimerax --nogui --offscreen``.
+    """
+    from chimerax.core.errors import UserError
+
+    from ..core.recorder import record as record_alignment
+
+    state = get_state(session)
+    if state.current_alignment is None:
+        session.logger.warning("No tomographic alignment loaded.")
+        return
+
+    if framesPerView < 1 or loopNumber < 1:
+        raise UserError("Frames per view and loop number must be greater than 0.")
+
+    stop(session)
+
+    frames, render_time, write_time = record_alignment(
+        session,
+        state.current_alignment,
+        path,
+        width=width,
+        height=height,
+        frames_per_view=framesPerView,
+        loops=loopNumber,
+        fps=fps,
+        supersample=supersample,
+    )
+
+    message = "Recorded %d frames to %s (rendering %.2f s, encoding and writing %.2f s)." % (
+        frames,
+        path,
+        render_time,
+        write_time,
+    )
+    session.logger.info(message)
+
+
+def profile(session, action: str = "report"):
+    """
+    Profile loading, scrubbing and playback. ``start`` enables the timers and counters, ``stop`` disables them,
+    ``reset`` clears them and ``report`` logs wall time per stage, bytes read, models created and frame times.
+    """
+    from ..util.profiling import profiler
+
+    if action == "start":
+        profiler.enabled = True
+        session.logger.info("InspectET profiling started.")
+    elif action == "stop":
+        profiler.enabled = False
+        session.logger.info("InspectET profiling stopped.")
+    elif action == "reset":
+        profiler.reset()
+    else:
+        from html import escape
+
+        message = "<pre>%s</pre>" % escape(profiler.report())
+        session.logger.info(message, is_html=True)
 
 
 def register_inspectet(logger):
     """Register all commands with ChimeraX, and specify expected arguments."""
-    from chimerax.core.commands import CmdDesc, IntArg, register
+    from chimerax.core.commands import CmdDesc, FloatArg, IntArg, SaveFileNameArg, register
 
     def register_inspectet_play():
         desc = CmdDesc(
             optional=[("framesPerView", IntArg), ("loopNumber", IntArg)],
+            keyword=[("fps", FloatArg)],
             synopsis="Playback the tomographic alignment.",
         )
         register("inspectet play", desc, play)
 
+    def register_inspectet_playback_control():
+        register("inspectet pause", CmdDesc(synopsis="Pause alignment playback."), pause)
+        register("inspectet resume", CmdDesc(synopsis="Resume alignment playback."), resume)
+        register("inspectet stop", CmdDesc(synopsis="Stop alignment playback."), stop)
+
+    def register_inspectet_record():
+        desc = CmdDesc(
+            required=[("path", SaveFileNameArg)],
+            keyword=[
+                ("width", IntArg),
+                ("height", IntArg),
+                ("framesPerView", IntArg),
+                ("loopNumber", IntArg),
+                ("fps", FloatArg),
+                ("supersample", IntArg),
+            ],
+            synopsis="Record a movie of the tomographic alignment offscreen.",
+        )
+        register("inspectet record", desc, record)
+
+    def register_inspectet_compare():
+        from chimerax.core.commands import EnumOf, Float3Arg, StringArg
+
+        desc = CmdDesc(
+            required=[("path", StringArg)],
+            keyword=[
+                ("format", EnumOf(("cdp", "imod", "aretomo3"))),
+                ("volDims", Float3Arg),
+                ("volume", StringArg),
+                ("name", StringArg),
+            ],
+            synopsis="Compare another alignment of the current tilt series.",
+        )
+        register("inspectet compare", desc, compare)
+
+        desc = CmdDesc(optional=[("name", StringArg)], synopsis="Remove compared alignments.")
+        register("inspectet ~compare", desc, uncompare)
+
+    def register_inspectet_queue():
+        from chimerax.core.commands import EnumOf, Float3Arg, StringArg
+
+        desc = CmdDesc(
+            required=[("path", StringArg)],
+            keyword=[
+                ("format", EnumOf(("cdp", "imod", "aretomo3"))),
+                ("volDims", Float3Arg),
+                ("prefetch", IntArg),
+            ],
+            synopsis="Queue the alignments of a directory or run list.",
+        )
+        register("inspectet queue", desc, queue)
+        register("inspectet next", CmdDesc(synopsis="Show the next queued dataset."), next_dataset)
+        register("inspectet previous", CmdDesc(synopsis="Show the previous queued dataset."), previous_dataset)
+
+    def register_inspectet_footprint():
+        from chimerax.core.commands import EnumOf, Float3Arg, StringArg
+
+        desc = CmdDesc(
+            optional=[("path", StringArg)],
+            keyword=[
+                ("format", EnumOf(("cdp", "imod", "aretomo3"))),
+                ("volDims", Float3Arg),
+                ("output", SaveFileNameArg),
+                ("samples", IntArg),
+            ],
+            synopsis="Report the volume footprint of every section.",
+        )
+        register("inspectet footprint", desc, footprint)
+
+    def register_inspectet_profile():
+        from chimerax.core.commands import EnumOf
+
+        desc = CmdDesc(
+            optional=[("action", EnumOf(("start", "stop", "reset", "report")))],
+            synopsis="Profile loading, scrubbing and playback.",
+        )
+        register("inspectet profile", desc, profile)
+
+    def register_inspectet_open():
+        from chimerax.core.commands import EnumOf, Float3Arg, StringArg
+
+        desc = CmdDesc(
+            required=[("path", StringArg)],
+            keyword=[
+                ("format", EnumOf(("cdp", "imod", "aretomo3"))),
+                ("volDims", Float3Arg),
+                ("volume", StringArg),
+                ("tiltSeries", StringArg),
+                ("binning", EnumOf(("1", "2", "4", "8", "auto"))),
+            ],
+            synopsis="Open a tomographic alignment.",
+        )
+        register("inspectet open", desc, open_alignment)
+
     register_inspectet_play()
+    register_inspectet_playback_control()
+    register_inspectet_record()
+    register_inspectet_compare()
+    register_inspectet_queue()
+    register_inspectet_footprint()
+    register_inspectet_profile()
+    register_inspectet_open()
@@ -1,277 +1,370 @@
-import numpy as np
-from typing import List, Tuple
+from typing import Dict, Optional
 
+from ..util.profiling import profiler
+from .placement import placement_cache
+from .provenance import box_provenance, tilt_series_provenance, volume_provenance
+from .sections import section_table
+from .shapes import get_axes_model, get_box_model, get_instanced_box_model, show_instance
+from .sources import DEFAULT_MAX_IMAGE_SIZE, DEFAULT_SECTION_CACHE_BYTES
+from .state import SECTION_SHOWN
+from .tiltstack import TiltStack, open_tilt_series
 
-def get_axes_model(session, size: Tuple[float, float, float], z_offset=0):
-    # Axes from https://www.cgl.ucsf.edu/chimera/docs/UsersGuide/bild.html
-    from chimerax.bild.bild import _BildFile
 
-    b = _BildFile(session, "dummy")
-    # Global X
-    b.color_command(".color red".split())
-    b.arrow_command(f".arrow {-size[0]} 0 0 {size[0]} 0 0 80 240 0.9".split())
-    b.color_command(".color red".split())
-    b.transparency_command(".transparency 0.5".split())
-    b.arrow_command(f".arrow {-size[0]} 0 {z_offset} {size[0]} 0 {z_offset} 80 240 0.9".split())
+def image_z_offset(alignment) -> float:
+    """Height at which the tilt images are shown, below the volume."""
+    return -4 * alignment.volume_dimension["z"] + 1000
 
-    # Global Y
-    b.color_command(".color yellow".split())
-    b.transparency_command(".transparency 0".split())
-    b.arrow_command(f".arrow 0 {-size[1]} 0 0 {size[1]} 0 80 240 0.9".split())
-    b.color_command(".color yellow".split())
-    b.transparency_command(".transparency 0.5".split())
-    b.arrow_command(f".arrow 0 {-size[1]} {z_offset} 0 {size[1]} {z_offset} 80 240 0.9".split())
 
-    # Global Z
-    b.color_command(".color blue".split())
-    b.transparency_command(".transparency 0".split())
-    b.arrow_command(f".arrow 0 0 {-size[2]} 0 0 {size[2]} 80 240 0.9".split())
-
-    # Electron Beam
-    b.color_command(".color green".split())
-    b.arrow_command(f".arrow 0 0 {size[2] + 1000} 0 0 {size[2] + 500} 160 600 0.9".split())
-
-    from chimerax.atomic import AtomicShapeDrawing
-    from chimerax.core.models import Model
-
-    d = AtomicShapeDrawing("shapes")
-    d.add_shapes(b.shapes)
-    m = Model("axes", session)
-    m.add_drawing(d)
-
-    return m
-
-
-def get_box_model(
+def section_placements(
     session,
-    size: Tuple[float, float, float],
-    name: str = "volume",
-    color: str = "cyan",
-    transparency: float = 0.5,
-    offset=(0, 0, 0),
+    alignment,
+    stack: Optional[TiltStack] = None,
+    additional_rotation=None,
+    coord_order=None,
 ):
-    from chimerax.bild.bild import _BildFile
-
-    b = _BildFile(session, "dummy")
-    # Box
-    b.color_command(f".color {color}".split())
-    b.transparency_command(f".transparency {transparency}".split())
-    b.box_command(f".box {offset[0]} {offset[0]} {offset[0]} {size[0]} {size[1]} {size[2]}".split())
+    """
+    Placements of all sections, for images of the tilt series stack or for boxes of the volume's size. The volume
+    orientation (``additional_rotation``, ``coord_order``) defaults to that of the current alignment.
+    """
+    if additional_rotation is None:
+        additional_rotation = session.inspectet.additional_rotation
+    if coord_order is None:
+        coord_order = session.inspectet.initial_coord_order
+
+    if stack is not None:
+        im_size = stack.image_size()
+        pixel_size = getattr(stack.data, "pixel_size", stack.data.step[:2])
+        plane_step = stack.data.step[2]
+    else:
+        im_size = (alignment.volume_dimension["x"], alignment.volume_dimension["y"])
+        pixel_size = (1, 1)
+        plane_step = 0
+
+    return placement_cache.get(
+        alignment,
+        image_size=tuple(im_size[:2]),
+        pixel_size=tuple(pixel_size),
+        z_offset=image_z_offset(alignment),
+        additional_rotation=additional_rotation.matrix,
+        coord_order=tuple(coord_order),
+        plane_step=plane_step,
+    )
 
-    # Origin
-    b.color_command(".color red".split())
-    b.sphere_command(f".sphere 0 0 0 300".split())
 
-    from chimerax.atomic import AtomicShapeDrawing
-    from chimerax.core.models import Model
+def _add_models(session, models):
+    session.models.add(models)
+    profiler.count("models created", len(models))
 
-    d = AtomicShapeDrawing("shapes")
-    d.add_shapes(b.shapes)
-    m = Model(name, session)
-    m.add_drawing(d)
 
-    return m
+def _delete_model(model):
+    if model is not None and not model.deleted:
+        model.delete()
 
 
+@profiler.profiled("create models")
 def create_alignment_objects(
     session,
     alignment,
     params,
     vol_file: str = None,
     ts_file: str = None,
+    lazy: bool = True,
+    cache_bytes: int = DEFAULT_SECTION_CACHE_BYTES,
+    binning: int = 1,
+    max_image_size: int = DEFAULT_MAX_IMAGE_SIZE,
+    vol_data=None,
+    ts_data=None,
+    provenance: Optional[Dict[str, Optional[tuple]]] = None,
 ):
+    """
+    Create the axes, volume and tilt series models for an alignment.
+
+    The volume and tilt series are either given as already opened grids (``vol_data``, ``ts_data``) or opened from
+    ``vol_file`` and ``ts_file``. With ``lazy`` set, tilt series sections are only read the first time they are
+    displayed and kept in an LRU cache of at most ``cache_bytes``. Otherwise, the whole stack is read at load time.
+    Tilt series opened here are binned by ``binning`` (see ``open_tilt_series``).
+
+    Models of the previous alignment whose inputs are unchanged are kept. ``provenance`` identifies the inputs of the
+    given grids (``"tiltseries"`` and ``"volume"``, see ``core.provenance``), by default it is derived from the file
+    paths. Inputs without provenance are always rebuilt.
+    """
+    state = session.inspectet
+
+    if provenance is None:
+        provenance = {
+            "tiltseries": tilt_series_provenance(ts_file, lazy, binning, max_image_size) if ts_data is None else None,
+            "volume": volume_provenance(vol_file) if vol_data is None else None,
+        }
+    box = box_provenance(alignment)
+    provenance = {
+        "axes": box,
+        "tiltseries": provenance.get("tiltseries"),
+        # Without a tomogram, the volume is a box of the volume's size
+        "volume": provenance.get("volume") if (vol_file or vol_data is not None) else box,
+    }
+
+    def unchanged(kind: str, model) -> bool:
+        key = provenance[kind]
+        return key is not None and state.provenance.get(kind) == key and model is not None and not model.deleted
+
+    keep_axes = unchanged("axes", state.axes_model)
+    keep_stack = state.tilt_stack is not None and unchanged("tiltseries", state.tilt_stack.volume)
+    keep_volume = unchanged("volume", state.volume_model)
 
     axes_size = (
         1 * alignment.volume_dimension["x"],
         1 * alignment.volume_dimension["y"],
         2 * alignment.volume_dimension["z"],
     )
-    z_offset = -4 * alignment.volume_dimension["z"] + 1000
+    z_offset = image_z_offset(alignment)
+
+    # Compared alignments share the grids that are replaced here
+    from chimerax.map import Volume
+
+    replaced_stack = state.tilt_stack is not None and not keep_stack
+    replaced_volume = isinstance(state.volume_model, Volume) and not keep_volume
+    if replaced_stack or replaced_volume:
+        for comparison in state.comparisons:
+            comparison.delete()
+        state.comparisons = []
+
+    if not keep_axes:
+        _delete_model(state.axes_model)
+        axes = get_axes_model(session, axes_size, z_offset)
+        _add_models(session, [axes])
+        state.axes_model = axes
+
+    if not keep_volume:
+        _delete_model(state.volume_model)
+        state.volume_model = None
+
+    # The placeholder boxes depend on the alignment and are always rebuilt, they are cheap.
+    _delete_model(state.raw_tiltseries)
+    state.raw_tiltseries = None
+
+    if not keep_stack:
+        _delete_model(state.aligned_tiltseries)
+        state.aligned_tiltseries = None
+        state.tilt_stack = None
+
+    state.current_section = None
+    state.current_tilt_angle = None
+    state.provenance = provenance
+
+    from chimerax.geometry import Place, translation
+
+    stack = state.tilt_stack
+    if not keep_stack:
+        if ts_data is None and ts_file:
+            with profiler.timed("open tilt series"):
+                ts_data = open_tilt_series(
+                    ts_file,
+                    lazy=lazy,
+                    cache_bytes=cache_bytes,
+                    binning=binning,
+                    max_image_size=max_image_size,
+                )
+
+        if ts_data is not None:
+            # All sections share one grid, only the displayed plane changes.
+            stack = TiltStack(session, ts_data, name="aligned tiltseries")
+
+    with profiler.timed("placements"):
+        placements = section_placements(session, alignment, stack)
+    state.placements = placements
+    row = placements.row(params.z_index)
+    state.current_tilt_angle = placements.tilt_angle[row]
+
+    if keep_volume:
+        state.volume_model.position = Place(matrix=placements.volume[row])
 
-    if session.inspectet.axes_model is not None and not session.inspectet.axes_model.deleted:
-        session.inspectet.axes_model.delete()
-        session.inspectet.axes_model = None
+    else:
+        if vol_data is None and vol_file:
+            from chimerax.map_data import open_file
 
-    axes = get_axes_model(session, axes_size, z_offset)
-    session.models.add([axes])
-    session.inspectet.axes_model = axes
+            with profiler.timed("open volume"):
+                vol_data = open_file(vol_file)[0]
 
-    if session.inspectet.volume_model is not None and not session.inspectet.volume_model.deleted:
-        session.inspectet.volume_model.delete()
-        session.inspectet.volume_model = None
+        if vol_data is not None:
+            from chimerax.map import volume_from_grid_data
 
-    if vol_file:
-        from chimerax.open_command.cmd import cmd_open
+            vol_data.set_origin((0, 0, 0))
+            vol = volume_from_grid_data(vol_data, session, open_model=False, show_dialog=False)
+            vol.position = Place(matrix=placements.volume[row])
+            _add_models(session, [vol])
+            state.volume_model = vol
 
-        models = cmd_open(session, [vol_file], "", log=True)
-        session.inspectet.volume_model = models[0]
-        session.inspectet.volume_model.data.set_origin((0, 0, 0))
+            from chimerax.core.commands import run
 
-        vol_size = (alignment.volume_dimension["x"], alignment.volume_dimension["y"], alignment.volume_dimension["z"])
-        print("vol size", vol_size)
-        from chimerax.geometry import rotation, translation
+            with profiler.timed("volume commands"):
+                run(
+                    session,
+                    f"volume #{vol.id_string} style surface region all showOutlineBox true capFaces false",
+                    log=True,
+                )
 
-        ico = session.inspectet.initial_coord_order
-        pos = (
-            rotation((0, 1, 0), params.tilt_angle)
-            * session.inspectet.additional_rotation
-            * translation((-vol_size[ico[0]] / 2, -vol_size[ico[1]] / 2, -vol_size[ico[2]] / 2))
-        )
+        else:
+            vol_size = (
+                alignment.volume_dimension["x"],
+                alignment.volume_dimension["y"],
+                alignment.volume_dimension["z"],
+            )
+            vol = get_box_model(session, vol_size)
+            _add_models(session, [vol])
+            state.volume_model = vol
+            vol.position = Place(matrix=placements.volume[row])
 
-        session.inspectet.volume_model.position = pos
+    if stack is not None:
+        if not keep_stack:
+            _add_models(session, [stack.volume])
+            state.tilt_stack = stack
+            state.aligned_tiltseries = stack.volume
 
-        from chimerax.core.commands import run
+            from chimerax.core.commands import run
+
+            with profiler.timed("volume commands"):
+                run(
+                    session,
+                    f"volume #{stack.volume.id_string} style image colorMode l8 color white",
+                    log=True,
+                )
 
-        run(
+        # All raw images have the same extent, so one box represents every section.
+        fake_im = get_box_model(
             session,
-            f"volume #{models[0].id_string} style surface region all showOutlineBox true capFaces false",
-            log=True,
+            stack.image_size(thickness=5),
+            name="raw image",
+            color="grey",
+            transparency=0.9,
         )
+        fake_im.position = translation((0, 0, z_offset))
+        fake_im.display = False
+        _add_models(session, [fake_im])
+        state.raw_tiltseries = fake_im
 
     else:
-        vol_size = (alignment.volume_dimension["x"], alignment.volume_dimension["y"], alignment.volume_dimension["z"])
-        vol = get_box_model(session, vol_size)
-        session.models.add([vol])
-        session.inspectet.volume_model = vol
-
-        from chimerax.geometry import rotation, translation
+        vd = alignment.volume_dimension
 
-        pos = (
-            rotation((0, 1, 0), params.tilt_angle)
-            * session.inspectet.additional_rotation
-            * translation((-vol_size[0] / 2, -vol_size[1] / 2, -vol_size[2] / 2))
+        # All raw images have the same extent and position, so one box represents every section.
+        raw_tiltseries = get_box_model(
+            session,
+            (vd["x"], vd["y"], 19),
+            name="raw tiltseries",
+            color="grey",
+            transparency=0.5,
+            offset=(0, 0, 1),
         )
-        vol.position = pos
-
-    if session.inspectet.raw_tiltseries is not None and not session.inspectet.raw_tiltseries.deleted:
-        session.inspectet.raw_tiltseries.delete()
-        session.inspectet.raw_tiltseries = None
+        raw_tiltseries.position = translation((0, 0, z_offset))
+        raw_tiltseries.display = False
+        _add_models(session, [raw_tiltseries])
+        state.raw_tiltseries = raw_tiltseries
 
-    if session.inspectet.aligned_tiltseries is not None and not session.inspectet.aligned_tiltseries.deleted:
-        session.inspectet.aligned_tiltseries.delete()
-        session.inspectet.aligned_tiltseries = None
+        # One instanced box per section, at its image placement, only the current one is shown
+        ali_tiltseries = get_instanced_box_model(session, (vd["x"], vd["y"], 20), placements.image)
+        _add_models(session, [ali_tiltseries])
+        state.aligned_tiltseries = ali_tiltseries
 
-    from chimerax.core.models import Model
+    # Compared alignments kept on unchanged grids follow the new placements of the current section
+    for comparison in state.comparisons:
+        comparison.show_section(params.z_index)
 
-    raw_tiltseries = Model("raw tiltseries", session)
-    session.models.add([raw_tiltseries])
-    session.inspectet.raw_tiltseries = raw_tiltseries
 
-    ali_tiltseries = Model("aligned tiltseries", session)
-    session.models.add([ali_tiltseries])
-    session.inspectet.aligned_tiltseries = ali_tiltseries
+@profiler.profiled("replace tilt series")
+def replace_tilt_series(session, ts_data):
+    """Show the current tilt series from a new grid, e.g. a finer resolution level, keeping the current section."""
+    from chimerax.core.commands import run
+    from chimerax.geometry import Place
 
-    if ts_file:
-        from chimerax.open_command.cmd import cmd_open
+    state = session.inspectet
+    stack = state.tilt_stack
+    if stack is None or stack.volume.deleted:
+        return
 
-        models = cmd_open(session, [ts_file], "", log=True)
-        ts = models[0]
-        mat = ts.data.matrix()
+    old = stack.replace_data(ts_data)
+    state.placements = section_placements(session, state.current_alignment, stack)
+    if state.current_section is not None:
+        row = state.placements.row(state.current_section)
+        stack.volume.position = Place(matrix=state.placements.image[row])
 
-        for z in range(mat.shape[0]):
-            data = mat[z, :, :]
-            data = np.expand_dims(data, axis=0)
+    _add_models(session, [stack.volume])
+    state.aligned_tiltseries = stack.volume
+    old.delete()
 
-            from chimerax.map_data import ArrayGridData
-            from chimerax.map import volume_from_grid_data
-
-            im_data = ArrayGridData(data, origin=(0, 0, 0), step=ts.data.step)
-            im = volume_from_grid_data(im_data, session, style="image", open_model=False)
-            im.name = f"aligned image {z}"
-            ali_tiltseries.add([im])
-            im.display = False
-
-            im_size = im.data.ijk_to_xyz((im.data.size[0], im.data.size[1], 5))
+    run(session, f"volume #{stack.volume.id_string} style image colorMode l8 color white", log=False)
 
-            fake_im = get_box_model(session, im_size, name="raw_image", color="grey", transparency=0.9)
-            fake_im.name = f"raw image {z}"
-            raw_tiltseries.add([fake_im])
-            fake_im.display = False
+    for comparison in state.comparisons:
+        comparison.replace_tilt_series(ts_data)
 
-            # General Alignment
-            pos = translation((-im_size[0] / 2, -im_size[1] / 2, z_offset))
-            im.position = pos
 
-            pos2 = translation((0, 0, z_offset))
-            fake_im.position = pos2
+@profiler.profiled("replace volume")
+def replace_volume(session, vol_data):
+    """Show the current volume from a new grid, e.g. a finer resolution level."""
+    from chimerax.core.commands import run
+    from chimerax.map import Volume, volume_from_grid_data
 
-            from chimerax.core.commands import run
-
-            run(
-                session,
-                f"volume #{im.id_string} style image colorMode l8 color white",
-                log=True,
-            )
+    state = session.inspectet
+    old = state.volume_model
+    if not isinstance(old, Volume) or old.deleted:
+        return
 
-        # Per image alignment
-        for psap in alignment.per_section_alignment_parameters:
-            im = ali_tiltseries.child_models()[psap.z_index]
-
-            im_size = im.data.ijk_to_xyz((im.data.size[0], im.data.size[1], 0))
-            pos = translation((-im_size[0] / 2, -im_size[1] / 2, z_offset))
-            print("shifts: ", (-psap.x_offset * im.data.step[0], -psap.y_offset * im.data.step[1], 0))
-            off = translation((-psap.x_offset * im.data.step[0], -psap.y_offset * im.data.step[1], 0))
-            rot = rotation((0, 0, 1), -psap.tilt_axis_rotation)
-
-            im.position = rot * off * pos
-            im.display = False
-
-        ts.delete()
-
-    else:
-        max_z = max([psap.z_index for psap in alignment.per_section_alignment_parameters])
+    vol_data.set_origin((0, 0, 0))
+    vol = volume_from_grid_data(vol_data, session, open_model=False, show_dialog=False)
+    vol.name = old.name
+    vol.position = old.position
+    vol.display = old.display
+    _add_models(session, [vol])
+    state.volume_model = vol
+    old.delete()
 
-        for z in range(max_z + 1):
-            im_size = (alignment.volume_dimension["x"], alignment.volume_dimension["y"], 20)
-            im = get_box_model(session, im_size, name="aligned_image", color="cyan")
-            ali_tiltseries.add([im])
-            im.display = False
+    run(session, f"volume #{vol.id_string} style surface region all showOutlineBox true capFaces false", log=False)
 
-            im_size = (alignment.volume_dimension["x"], alignment.volume_dimension["y"], 19)
-            im2 = get_box_model(session, im_size, name="raw_image", color="grey", transparency=0.5, offset=(0, 0, 1))
-            raw_tiltseries.add([im2])
-            im2.display = False
-
-            from chimerax.geometry import translation
-
-            pos = translation((-im_size[0] / 2, -im_size[0] / 2, z_offset))
-            im.position = pos
-
-            pos2 = translation((0, 0, z_offset))
-            im2.position = pos2
-
-        for psap in alignment.per_section_alignment_parameters:
-            im = ali_tiltseries.child_models()[psap.z_index]
-
-            im_size = (alignment.volume_dimension["x"], alignment.volume_dimension["y"], 20)
-            pos = translation((-im_size[0] / 2, -im_size[1] / 2, z_offset))
-            off = translation((-psap.x_offset, -psap.y_offset, 0))
-            rot = rotation((0, 0, 1), -psap.tilt_axis_rotation)
-
-            im.position = rot * off * pos
-            im.display = False
+    for comparison in state.comparisons:
+        comparison.replace_volume(vol_data)
 
 
 def apply_alignment(session, alignment, params):
+    """
+    Show the section of ``params`` of an alignment, which must be the current one. Its row is looked up in the section
+    table of ``alignment``. Only the previously shown and the new section are touched.
+    """
+    if alignment is not session.inspectet.current_alignment:
+        raise ValueError("Only sections of the current alignment can be shown, compared alignments follow them.")
+
+    show_section(session, section_table(alignment).row(params.z_index))
+
+
+@profiler.profiled("apply alignment")
+def show_section(session, row: int):
+    """
+    Show a section of the current alignment, by its row in ``per_section_alignment_parameters``. Only the previously
+    shown and the new section are touched.
+    """
+    from chimerax.geometry import Place
+
+    state = session.inspectet
+    placements = state.placements
+    z_index = int(placements.z_index[row])
+    profiler.count("sections shown")
+
+    # The volume only moves if the tilt angle changes
+    tilt_angle = placements.tilt_angle[row]
+    if tilt_angle != state.current_tilt_angle:
+        state.volume_model.position = Place(matrix=placements.volume[row])
+        state.current_tilt_angle = tilt_angle
+
+    stack = state.tilt_stack
+    if stack is not None:
+        stack.show_section(z_index, Place(matrix=placements.image[row]))
+    else:
+        show_instance(state.aligned_tiltseries, row)
+    state.raw_tiltseries.display = True
 
-    from chimerax.geometry import rotation, translation
+    state.current_section = z_index
+    _show_compared_sections(state, z_index)
+    state.triggers.activate_trigger(SECTION_SHOWN, row)
 
-    vol = session.inspectet.volume_model
-    vol_size = (alignment.volume_dimension["x"], alignment.volume_dimension["y"], alignment.volume_dimension["z"])
-    ico = session.inspectet.initial_coord_order
-    vol.position = (
-        rotation((0, 1, 0), params.tilt_angle)
-        * session.inspectet.additional_rotation
-        * translation((-vol_size[ico[0]] / 2, -vol_size[ico[1]] / 2, -vol_size[ico[2]] / 2))
-    )
 
-    ali_ts = session.inspectet.aligned_tiltseries
-    raw_ts = session.inspectet.raw_tiltseries
-
-    for idx, (ali_im, raw_im) in enumerate(zip(ali_ts.child_models(), raw_ts.child_models())):
-        if idx == params.z_index:
-            ali_im.display = True
-            raw_im.display = True
-        else:
-            ali_im.display = False
-            raw_im.display = False
+def _show_compared_sections(state, z_index: int):
+    for comparison in state.comparisons:
+        if not comparison.deleted:
+            comparison.show_section(z_index)
@@ -0,0 +1,192 @@
+from typing import Optional
+
+from .alignment import get_box_model, section_placements
+from .state import get_state
+from .tiltstack import TiltStack
+
+COMPARISON_COLORS = ("orange", "magenta", "lime", "yellow", "salmon", "cornflowerblue")
+"""Colors of compared alignments, in the order they are added."""
+
+
+class ComparedAlignment:
+    """
+    Another alignment of the tilt series shown by the current alignment. Its tilt series image and tomogram are new
+    models on the grids of the current alignment, so the pixel data is held only once; only the placements are its own.
+    All models are children of one group model, which toggles the alignment's visibility.
+
+    Parameters
+    ----------
+    session : chimerax.core.session.Session
+        The ChimeraX session.
+    loaded : LoadedAlignment
+        The parsed alignment and its initial volume orientation.
+    name : str
+        Name of the group model.
+    color : str
+        Color of the tomogram surface and tilt series image.
+    """
+
+    def __init__(self, session, loaded, name: str, color: str):
+        from chimerax.core.commands import run
+        from chimerax.core.models import Model
+        from chimerax.geometry import rotation
+        from chimerax.map import Volume, volume_from_grid_data
+
+        state = session.inspectet
+
+        self.session = session
+        self.alignment = loaded.alignment
+        self.name = name
+        self.color = color
+        self.additional_rotation = rotation((1, 0, 0), loaded.x_rotation)
+        self.coord_order = loaded.coord_order
+
+        self.group = Model(name, session)
+        session.models.add([self.group])
+
+        # Tilt series image, sharing the grid of the current tilt series
+        self.stack: Optional[TiltStack] = None
+        self.image_box = None
+        if state.tilt_stack is not None:
+            self.stack = TiltStack(session, state.tilt_stack.data, name="aligned tiltseries")
+            self.group.add([self.stack.volume])
+            run(session, f"volume #{self.stack.volume.id_string} style image color {color}", log=False)
+        else:
+            vd = self.alignment.volume_dimension
+            self.image_box = get_box_model(session, (vd["x"], vd["y"], 20), name="aligned image", color=color)
+            self.group.add([self.image_box])
+
+        # Tomogram, sharing the grid of the current tomogram
+        if isinstance(state.volume_model, Volume) and not state.volume_model.deleted:
+            self.volume_model = volume_from_grid_data(
+                state.volume_model.data,
+                session,
+                open_model=False,
+                show_dialog=False,
+            )
+            self.volume_model.name = "volume"
+            self.group.add([self.volume_model])
+            self._style_volume()
+        else:
+            vd = self.alignment.volume_dimension
+            self.volume_model = get_box_model(session, (vd["x"], vd["y"], vd["z"]), color=color)
+            self.group.add([self.volume_model])
+
+        self._update_placements()
+
+        if state.current_section is not None:
+            self.show_section(state.current_section)
+
+    @property
+    def shown(self) -> bool:
+        return self.group.display
+
+    @shown.setter
+    def shown(self, shown: bool):
+        self.group.display = shown
+
+    @property
+    def deleted(self) -> bool:
+        return self.group.deleted
+
+    def show_section(self, z_index: int):
+        """Show the section with the given z-index, or hide the image if this alignment does not contain it."""
+        from chimerax.geometry import Place
+
+        row = self.placements.find_row(z_index)
+        image = self.stack.volume if self.stack is not None else self.image_box
+        if row is None:
+            image.display = False
+            return
+
+        self.volume_model.position = Place(matrix=self.placements.volume[row])
+        if self.stack is not None:
+            self.stack.show_section(z_index, Place(matrix=self.placements.image[row]))
+        else:
+            self.image_box.position = Place(matrix=self.placements.image[row])
+            self.image_box.display = True
+
+    def replace_tilt_series(self, ts_data):
+        """Follow the current tilt series to a new grid."""
+        from chimerax.core.commands import run
+
+        if self.stack is None:
+            return
+
+        old = self.stack.replace_data(ts_data)
+        self.group.add([self.stack.volume])
+        old.delete()
+        run(self.session, f"volume #{self.stack.volume.id_string} style image color {self.color}", log=False)
+
+        self._update_placements()
+        if self.session.inspectet.current_section is not None:
+            self.show_section(self.session.inspectet.current_section)
+
+    def replace_volume(self, vol_data):
+        """Follow the current tomogram to a new grid."""
+        from chimerax.map import Volume, volume_from_grid_data
+
+        old = self.volume_model
+        if not isinstance(old, Volume):
+            return
+
+        self.volume_model = volume_from_grid_data(vol_data, self.session, open_model=False, show_dialog=False)
+        self.volume_model.name = old.name
+        self.volume_model.position = old.position
+        self.volume_model.display = old.display
+        self.group.add([self.volume_model])
+        old.delete()
+        self._style_volume()
+
+    def delete(self):
+        if not self.group.deleted:
+            self.group.delete()
+
+    def _update_placements(self):
+        # Without a tilt series, images are boxes of the volume's size
+        self.placements = section_placements(
+            self.session,
+            self.alignment,
+            self.stack,
+            additional_rotation=self.additional_rotation,
+            coord_order=self.coord_order,
+        )
+
+    def _style_volume(self):
+        from chimerax.core.commands import run
+
+        run(
+            self.session,
+            f"volume #{self.volume_model.id_string} style surface region all showOutlineBox true capFaces false "
+            f"color {self.color} transparency 0.5",
+            log=False,
+        )
+
+
+def add_comparison(session, loaded, name: str) -> ComparedAlignment:
+    """Show another alignment of the current tilt series, in sync with the current alignment."""
+    state = get_state(session)
+    remove_deleted_comparisons(session)
+
+    color = COMPARISON_COLORS[len(state.comparisons) % len(COMPARISON_COLORS)]
+    comparison = ComparedAlignment(session, loaded, name, color)
+    state.comparisons.append(comparison)
+    return comparison
+
+
+def remove_comparisons(session, name: Optional[str] = None):
+    """Remove the compared alignments, or only those with the given name."""
+    state = get_state(session)
+    keep = []
+    for comparison in state.comparisons:
+        if name is None or comparison.name == name:
+            comparison.delete()
+        else:
+            keep.append(comparison)
+    state.comparisons = keep
+
+
+def remove_deleted_comparisons(session):
+    """Forget compared alignments whose models were closed."""
+    state = get_state(session)
+    state.comparisons = [c for c in state.comparisons if not c.deleted]
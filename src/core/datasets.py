@@ -0,0 +1,200 @@
+import glob
+import os.path
+import threading
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import replace
+from typing import Callable, Dict, List, Optional
+
+from chimerax.core.errors import UserError
+
+from .loader import LoadRequest, dataset_preparer, show_alignment
+from .state import get_state
+
+DEFAULT_PREFETCH = 2
+"""Number of datasets after the current one that are prepared in the background."""
+
+ALIGNMENT_SUFFIXES = {"CryoET Data Portal": ".json", "IMOD": ".xf", "AreTomo3": ".aln"}
+"""Suffix of the files that identify alignments of each type in a directory."""
+
+
+def requests_from_directory(directory: str, template: LoadRequest) -> List[LoadRequest]:
+    """
+    One load request per alignment found below a directory: IMOD basenames (from their .xf files), AreTomo3 .aln files
+    or portal alignment .json files. The remaining inputs (e.g. volume dims) are taken from ``template``.
+    """
+    suffix = ALIGNMENT_SUFFIXES[template.alignment_type]
+    paths = sorted(glob.glob(os.path.join(directory, "**", f"*{suffix}"), recursive=True))
+
+    if template.alignment_type == "IMOD":
+        paths = [p[: -len(suffix)] for p in paths]
+
+    return [replace(template, path=p) for p in paths]
+
+
+def requests_from_list(path: str, template: LoadRequest) -> List[LoadRequest]:
+    """
+    One load request per line of a run list. Each line holds an alignment path, basename or S3 URI, optionally followed
+    by the tilt series and the volume. Empty lines and lines starting with # are skipped.
+    """
+    requests = []
+    with open(path) as f:
+        for line in f:
+            fields = line.split()
+            if not fields or fields[0].startswith("#"):
+                continue
+
+            request = replace(template, path=fields[0])
+            if len(fields) > 1:
+                request = replace(request, ts_file=fields[1])
+            if len(fields) > 2:
+                request = replace(request, vol_file=fields[2])
+            requests.append(request)
+
+    return requests
+
+
+def dataset_requests(path: str, template: LoadRequest) -> List[LoadRequest]:
+    """Load requests from a directory of alignments or from a run list file."""
+    if os.path.isdir(path):
+        requests = requests_from_directory(path, template)
+    elif os.path.isfile(path):
+        requests = requests_from_list(path, template)
+    else:
+        raise UserError(f"{path} is neither a directory nor a run list.")
+
+    if not requests:
+        raise UserError(f"No {template.alignment_type} alignments found in {path}.")
+
+    return requests
+
+
+class DatasetQueue:
+    """
+    An ordered list of datasets to step through. While one dataset is inspected, the next ``prefetch`` datasets are
+    prepared (downloaded, parsed and opened) in background threads, so switching to them only builds the models.
+
+    Parameters
+    ----------
+    requests : list of LoadRequest
+        The datasets.
+    prepare : callable
+        Prepares one dataset in a worker thread, e.g. ``prepare_dataset`` with the session's tilt series options. Called
+        with the request and a ``cancelled`` event that is set on ``shutdown``.
+    prefetch : int
+        Number of datasets prepared ahead.
+    """
+
+    def __init__(self, requests: List[LoadRequest], prepare: Callable, prefetch: int = DEFAULT_PREFETCH):
+        self.requests = list(requests)
+        self.prepare = prepare
+        self.prefetch = prefetch
+        self.index = -1
+
+        self._executor = ThreadPoolExecutor(max_workers=max(prefetch, 1), thread_name_prefix="InspectET prefetch")
+        self._futures: Dict[int, Future] = {}
+        self._cancelled = threading.Event()
+
+    def __len__(self) -> int:
+        return len(self.requests)
+
+    @property
+    def current(self) -> Optional[LoadRequest]:
+        return self.requests[self.index] if 0 <= self.index < len(self.requests) else None
+
+    def name(self, index: Optional[int] = None) -> str:
+        request = self.requests[self.index if index is None else index]
+        return os.path.basename(request.path.rstrip("/"))
+
+    def go(self, index: int) -> Future:
+        """
+        Make dataset ``index`` the current one and start prefetching the ones after it. Returns a future of the prepared
+        dataset, which is already done if it was prefetched.
+        """
+        if not 0 <= index < len(self.requests):
+            raise UserError("No more datasets in the queue.")
+
+        self.index = index
+        future = self._submit(index)
+
+        # Keep only the current and upcoming datasets
+        window = range(index, index + self.prefetch + 1)
+        for i in list(self._futures):
+            if i not in window:
+                self._futures.pop(i).cancel()
+
+        for i in window[1:]:
+            if i < len(self.requests):
+                self._submit(i)
+
+        return future
+
+    def next(self) -> Future:
+        return self.go(self.index + 1)
+
+    def previous(self) -> Future:
+        return self.go(self.index - 1)
+
+    def shutdown(self):
+        """Cancel pending prefetches, interrupt running ones and stop the worker threads."""
+        self._cancelled.set()
+        for future in self._futures.values():
+            future.cancel()
+        self._futures.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, index: int) -> Future:
+        # Failed datasets are prepared again, e.g. after a network error
+        future = self._futures.get(index)
+        if future is None or future.cancelled() or (future.done() and future.exception() is not None):
+            future = self._executor.submit(self.prepare, self.requests[index], cancelled=self._cancelled)
+            self._futures[index] = future
+        return future
+
+
+def queue_datasets(session, path: str, template: LoadRequest, prefetch: int = DEFAULT_PREFETCH) -> DatasetQueue:
+    """Replace the session's dataset queue by the datasets of a directory or run list."""
+    state = get_state(session)
+    queue = DatasetQueue(dataset_requests(path, template), dataset_preparer(session), prefetch=prefetch)
+
+    if state.datasets is not None:
+        state.datasets.shutdown()
+    state.datasets = queue
+
+    return queue
+
+
+def show_dataset(session, future: Future):
+    """Show a prepared dataset of the queue, waiting for it if it is still being prepared."""
+    loaded, inputs = future.result()
+    show_alignment(session, loaded, inputs)
+
+    return loaded
+
+
+def show_dataset_when_ready(session, datasets: DatasetQueue, future: Future):
+    """
+    Show the current dataset of a queue once it is prepared, without blocking the GUI thread while it is still being
+    prepared. It is not shown if the queue moves on or is replaced meanwhile. Without a GUI there is no event loop to
+    show it later, so this waits for it.
+    """
+    if future.done() or not session.ui.is_gui:
+        show_dataset(session, future)
+        return
+
+    index = datasets.index
+    message = "Preparing dataset %s ..." % datasets.name()
+    session.logger.status(message)
+
+    def show():
+        if get_state(session).datasets is not datasets or datasets.index != index or future.cancelled():
+            return
+
+        try:
+            show_dataset(session, future)
+        except UserError as e:
+            session.logger.error(str(e))
+        except Exception:
+            session.logger.error(traceback.format_exc())
+
+    future.add_done_callback(lambda _: session.ui.thread_safe(show))
@@ -0,0 +1,199 @@
+from dataclasses import dataclass
+from itertools import product
+from typing import List, Tuple
+
+import numpy as np
+
+DEFAULT_SAMPLES = 16
+"""Sample points per volume axis for the coverage fraction."""
+
+
+@dataclass
+class VolumeFootprint:
+    """
+    Where the tomogram volume lands in the tilt image of every section, in the row order of
+    ``per_section_alignment_parameters``. Coordinates are in the image frame of a section: physical units from its lower
+    left corner, with the image spanning ``image_size``.
+    """
+
+    corners: np.ndarray
+    """Projected volume box corners (N, 8, 2)."""
+    corners_out: np.ndarray
+    """Corners that land outside the image (N, 8)."""
+    coverage: np.ndarray
+    """Fraction of the volume that projects into the image (N,)."""
+
+    def __len__(self) -> int:
+        return len(self.coverage)
+
+    @property
+    def out_of_frame(self) -> np.ndarray:
+        """Number of corners outside the image (N,)."""
+        return np.count_nonzero(self.corners_out, axis=1)
+
+
+def box_points(size: Tuple[float, float, float], samples: int = 0) -> np.ndarray:
+    """The 8 corners of a box at the origin, or with samples > 0 a grid of samples^3 cell centers inside it (K, 3)."""
+    if samples <= 0:
+        return np.array(list(product(*[(0.0, s) for s in size])))
+
+    axes = [(np.arange(samples) + 0.5) * s / samples for s in size]
+    return np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, 3)
+
+
+def image_frame_transforms(image: np.ndarray, volume: np.ndarray) -> np.ndarray:
+    """
+    Batched transforms (N, 2, 4) from volume coordinates to the image frames of the sections, given their image and
+    volume placements (N, 3, 4). The beam runs along the scene z-axis, so projecting drops z.
+    """
+    r_inv = np.transpose(image[:, :, :3], (0, 2, 1))
+    t_inv = -np.einsum("nij,nj->ni", r_inv, image[:, :, 3])
+
+    r = r_inv @ volume[:, :, :3]
+    t = np.einsum("nij,nj->ni", r_inv, volume[:, :, 3]) + t_inv
+    return np.concatenate([r, t[:, :, np.newaxis]], axis=2)[:, :2]
+
+
+def project(transforms: np.ndarray, points: np.ndarray) -> np.ndarray:
+    """Points (K, 3) through transforms (N, 2, 4), giving (N, K, 2)."""
+    return np.matmul(points, np.transpose(transforms[:, :, :3], (0, 2, 1))) + transforms[:, np.newaxis, :, 3]
+
+
+def inside(points: np.ndarray, image_size: Tuple[float, float], tolerance: float) -> np.ndarray:
+    x, y = points[..., 0], points[..., 1]
+    return (x >= -tolerance) & (x <= image_size[0] + tolerance) & (y >= -tolerance) & (y <= image_size[1] + tolerance)
+
+
+def volume_footprint(
+    image: np.ndarray,
+    volume: np.ndarray,
+    image_size: Tuple[float, float],
+    volume_size: Tuple[float, float, float],
+    samples: int = DEFAULT_SAMPLES,
+) -> VolumeFootprint:
+    """
+    Project the volume box through the placements of all sections in one batched pass.
+
+    Parameters
+    ----------
+    image, volume : np.ndarray
+        Image and volume placements of the sections (N, 3, 4), see ``compute_placements``.
+    image_size : tuple
+        Physical size (x, y) of a tilt image.
+    volume_size : tuple
+        Physical size of the volume box in its own coordinates, i.e. in the axis order of the volume data.
+    samples : int
+        Sample points per volume axis for the coverage fraction.
+    """
+    transforms = image_frame_transforms(image, volume)
+
+    # Corners within rounding of the image edge count as inside
+    tolerance = 1e-6 * max(image_size)
+
+    corners = project(transforms, box_points(volume_size))
+    corners_out = ~inside(corners, image_size, tolerance)
+
+    coverage = np.empty(len(transforms))
+    grid = box_points(volume_size, samples)
+    # Bounded memory for long tilt series
+    chunk = max(1, 2**20 // len(grid))
+    for start in range(0, len(transforms), chunk):
+        projected = project(transforms[start : start + chunk], grid)
+        coverage[start : start + chunk] = inside(projected, image_size, tolerance).mean(axis=1)
+
+    return VolumeFootprint(corners=corners, corners_out=corners_out, coverage=coverage)
+
+
+def tilt_image_geometry(ts_file: str) -> Tuple[Tuple[float, float], Tuple[float, float]]:
+    """
+    Physical image size (x, y) and pixel size (x, y) of a local, S3 or OME-Zarr tilt series, from its header or metadata
+    only. Headers of S3 files are read by a ranged GET, the file is not downloaded.
+    """
+    from ..util.mrc import has_mrc_suffix, read_header, voxel_size
+    from .multiscale import OmeZarrMultiscale, is_zarr_path
+
+    if is_zarr_path(ts_file):
+        multiscale = OmeZarrMultiscale(ts_file)
+        extent, step = multiscale.extent(), multiscale.step(0)
+    elif has_mrc_suffix(ts_file):
+        header = read_header(ts_file)
+        step = voxel_size(header)
+        extent = (int(header["nx"]) * step[0], int(header["ny"]) * step[1])
+    else:
+        from chimerax.map_data import open_file
+
+        grid = open_file(ts_file)[0]
+        step = grid.step
+        extent = (grid.size[0] * step[0], grid.size[1] * step[1])
+
+    return (extent[0], extent[1]), (step[0], step[1])
+
+
+def loaded_footprint(loaded, samples: int = DEFAULT_SAMPLES) -> Tuple[VolumeFootprint, Tuple[float, float]]:
+    """
+    The volume footprint of a ``LoadedAlignment``, without building models or reading image data. Images have the size
+    of its tilt series, or without one, the volume's x and y size (as the boxes drawn in its place). Returns the
+    footprint and the image size.
+    """
+    from .placement import compose, compute_placements, rotation_matrices
+
+    alignment = loaded.alignment
+    if loaded.ts_file is not None:
+        image_size, pixel_size = tilt_image_geometry(loaded.ts_file)
+    else:
+        image_size = (alignment.volume_dimension["x"], alignment.volume_dimension["y"])
+        pixel_size = (1, 1)
+
+    additional_rotation = compose(rotation_matrices(0, [loaded.x_rotation]), np.zeros((1, 3)))[0]
+    placements = compute_placements(alignment, image_size, pixel_size, 0, additional_rotation, loaded.coord_order)
+    footprint = volume_footprint(placements.image, placements.volume, image_size, placements.volume_size, samples)
+
+    return footprint, image_size
+
+
+def footprint_rows(name: str, sections, footprint: VolumeFootprint) -> List[dict]:
+    """One row per section: dataset name, z-index, tilt angle, coverage, corners out of frame and the corners."""
+    columns = zip(
+        sections.z_index.tolist(),
+        sections.tilt_angle.tolist(),
+        footprint.coverage.tolist(),
+        footprint.out_of_frame.tolist(),
+        footprint.corners.tolist(),
+        strict=True,
+    )
+    keys = ("z_index", "tilt_angle", "coverage", "out_of_frame", "corners")
+    return [{"dataset": name, **dict(zip(keys, values, strict=True))} for values in columns]
+
+
+def summary(footprint: VolumeFootprint, sections) -> str:
+    """One line on the worst covered section and the sections with corners out of frame."""
+    worst = int(np.argmin(footprint.coverage))
+    out = int(np.count_nonzero(footprint.out_of_frame))
+    return (
+        f"{len(footprint)} sections, lowest coverage {footprint.coverage[worst]:.2f} (z {sections.z_index[worst]}), "
+        f"{out} with corners out of frame"
+    )
+
+
+def write_footprints(path: str, rows: List[dict]):
+    """Write footprint rows as JSON (.json) or tab-separated values, with one column per corner coordinate."""
+    import json
+
+    if path.lower().endswith(".json"):
+        with open(path, "w") as f:
+            json.dump(rows, f, indent=1)
+        return
+
+    corner_columns = [f"corner{i}_{axis}" for i in range(8) for axis in "xy"]
+    with open(path, "w") as f:
+        f.write("\t".join(["dataset", "z_index", "tilt_angle", "coverage", "out_of_frame"] + corner_columns) + "\n")
+        for row in rows:
+            values = [
+                row["dataset"],
+                str(row["z_index"]),
+                f"{row['tilt_angle']:.2f}",
+                f"{row['coverage']:.4f}",
+                str(row["out_of_frame"]),
+            ]
+            values += [f"{v:.2f}" for corner in row["corners"] for v in corner]
+            f.write("\t".join(values) + "\n")
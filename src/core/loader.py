@@ -0,0 +1,459 @@
+import os.path
+import threading
+from dataclasses import dataclass, replace
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
+
+from chimerax.core.errors import UserError
+from cryoet_alignment.io.cryoet_data_portal import Alignment
+
+from ..util.cancel import LoadCancelledError, check_cancelled
+from ..util.parsers import aretomo3_alignment, imod_alignment, parse_aln, read_imod_alignment, read_text
+from ..util.profiling import profiler
+from ..util.s3 import aln_arrays_from_s3, cdp_from_s3, imod_arrays_from_s3, localize
+from .multiscale import MultiscaleStreamer, OmeZarrMultiscale, ZarrSectionSource, is_zarr_path
+from .provenance import tilt_series_provenance, volume_provenance
+from .sections import SectionTable, section_table
+from .sources import DEFAULT_MAX_IMAGE_SIZE, DEFAULT_SECTION_CACHE_BYTES, ArraySectionSource, binned_level
+from .state import ALIGNMENT_SHOWN, get_state
+
+ALIGNMENT_TYPES = ("CryoET Data Portal", "IMOD", "AreTomo3")
+
+ALIGNMENT_FORMATS = {"cdp": "CryoET Data Portal", "imod": "IMOD", "aretomo3": "AreTomo3"}
+"""Short format names used by commands, mapped to alignment types."""
+
+
+@dataclass
+class LoadRequest:
+    """The inputs of one alignment load."""
+
+    alignment_type: str
+    path: str
+    vol_size: Optional[Tuple[float, float, float]] = None
+    vol_file: Optional[str] = None
+    ts_file: Optional[str] = None
+
+
+@dataclass
+class LoadedAlignment:
+    """A parsed alignment with the resolved volume and tilt series paths and the initial volume orientation."""
+
+    alignment: Alignment
+    vol_file: Optional[str]
+    ts_file: Optional[str]
+    x_rotation: float
+    coord_order: List[int]
+
+    @property
+    def sections(self) -> SectionTable:
+        return section_table(self.alignment)
+
+
+@dataclass
+class LoadedInputs:
+    """Opened volume and tilt series grids, ready to be turned into models."""
+
+    vol_data: object = None
+    ts_data: object = None
+    vol_multiscale: Optional[Tuple[OmeZarrMultiscale, int]] = None
+    ts_multiscale: Optional[Tuple[OmeZarrMultiscale, int, int]] = None
+    """The OME-Zarr tilt series, the level shown and the level matching the binning, streamed down to."""
+    provenance: Optional[Dict[str, Optional[tuple]]] = None
+    """Identifies the inputs of the grids, unchanged inputs are not opened again."""
+
+
+@profiler.profiled("fetch remote inputs")
+def fetch_remote_inputs(request: LoadRequest, cancelled: Optional[threading.Event] = None) -> LoadRequest:
+    """
+    Download S3 volume and tilt series files into the local cache and return a request pointing at the local copies.
+    Setting ``cancelled`` interrupts a download with ``LoadCancelledError``. Safe to run in a thread.
+    """
+
+    # OME-Zarr stores are streamed instead of downloaded
+    def fetch(path):
+        return path if is_zarr_path(path) else localize(path, cancelled)
+
+    return replace(request, vol_file=fetch(request.vol_file), ts_file=fetch(request.ts_file))
+
+
+@profiler.profiled("parse alignment")
+def read_alignment(request: LoadRequest) -> LoadedAlignment:
+    """Parse the alignment of a load request and resolve the volume and tilt series paths. Safe to run in a thread."""
+    file = request.path
+    vol_size = request.vol_size
+    vol_file = request.vol_file
+    ts_file = request.ts_file
+
+    if request.alignment_type == "CryoET Data Portal":
+        ali = cdp_from_s3(file) if "s3://" in file else Alignment.from_file(file)
+
+        loaded = LoadedAlignment(ali, vol_file, ts_file, 0, [0, 1, 2])
+
+    elif request.alignment_type == "IMOD":
+        if "s3://" in file:
+            ali = imod_alignment(imod_arrays_from_s3(file), vol_size=vol_size)
+        else:
+            ali = read_imod_alignment(file)
+
+        if os.path.exists(f"{file}_full_rec.mrc"):
+            vol_file = f"{file}_full_rec.mrc"
+
+        if vol_file is None and vol_size is None:
+            raise UserError("No *_full_rec.mrc found at IMOD basename and no vol dims provided.")
+
+        if os.path.exists(f"{file}.mrc"):
+            ts_file = f"{file}.mrc"
+
+        loaded = LoadedAlignment(ali, vol_file, ts_file, -90, [0, 2, 1])
+
+    elif request.alignment_type == "AreTomo3":
+        if vol_file is None and vol_size is None:
+            raise UserError("Please provide volume dimensions or a volume file.")
+
+        aln = aln_arrays_from_s3(file) if "s3://" in file else parse_aln(read_text(file))
+
+        if is_zarr_path(vol_file):
+            ali = aretomo3_alignment(aln, vol_size=OmeZarrMultiscale(vol_file).extent())
+        elif vol_file is None:
+            ali = aretomo3_alignment(aln, vol_size=vol_size)
+        else:
+            ali = aretomo3_alignment(aln, vol=vol_file)
+
+        loaded = LoadedAlignment(ali, vol_file, ts_file, 0, [0, 1, 2])
+
+    else:
+        raise UserError(f"Unknown alignment type {request.alignment_type}.")
+
+    # Converted once, off the GUI thread
+    section_table(loaded.alignment)
+
+    return loaded
+
+
+@profiler.profiled("open inputs")
+def open_inputs(
+    loaded: LoadedAlignment,
+    lazy: bool = True,
+    cache_bytes: int = DEFAULT_SECTION_CACHE_BYTES,
+    binning: int = 1,
+    max_image_size: int = DEFAULT_MAX_IMAGE_SIZE,
+    current: Optional[Dict[str, Optional[tuple]]] = None,
+    cancelled: Optional[threading.Event] = None,
+) -> LoadedInputs:
+    """
+    Open the volume and tilt series of a loaded alignment and read the first tilt series section. Tilt series sections
+    are binned by ``binning`` (see ``open_tilt_series``). Inputs whose provenance matches ``current`` (the provenance
+    of the models shown, ``state.provenance``) are not opened again, their models are kept. Setting ``cancelled``
+    interrupts reading whole stacks and levels with ``LoadCancelledError``. Safe to run in a thread, no models are
+    created.
+    """
+    from .tiltstack import TiltStackGridData, open_tilt_series
+
+    provenance = {
+        "tiltseries": tilt_series_provenance(loaded.ts_file, lazy, binning, max_image_size),
+        "volume": volume_provenance(loaded.vol_file),
+    }
+    inputs = LoadedInputs(provenance=provenance)
+
+    current = current or {}
+    reuse_ts = provenance["tiltseries"] is not None and current.get("tiltseries") == provenance["tiltseries"]
+    reuse_vol = provenance["volume"] is not None and current.get("volume") == provenance["volume"]
+
+    if loaded.ts_file and not reuse_ts:
+        inputs.ts_data = open_tilt_series(
+            loaded.ts_file,
+            lazy=lazy,
+            cache_bytes=cache_bytes,
+            binning=binning,
+            max_image_size=max_image_size,
+            cancelled=cancelled,
+        )
+
+        # Materialize the section shown first
+        if isinstance(inputs.ts_data, TiltStackGridData):
+            inputs.ts_data.section(int(loaded.sections.z_index[0]))
+
+            source = inputs.ts_data.source
+            if isinstance(source, ZarrSectionSource):
+                target = binned_level(source.multiscale, binning, max_image_size)
+                inputs.ts_multiscale = (source.multiscale, source.level, target)
+
+    if reuse_vol:
+        # The volume model is kept
+        return inputs
+
+    check_cancelled(cancelled)
+
+    if is_zarr_path(loaded.vol_file):
+        # Coarsest level now, finer levels are streamed once the models are shown
+        from chimerax.map_data import ArrayGridData
+
+        multiscale = OmeZarrMultiscale(loaded.vol_file)
+        level = multiscale.coarsest
+        data = multiscale.read_level(level, cancelled)
+        if data is None:
+            raise LoadCancelledError()
+
+        inputs.vol_data = ArrayGridData(
+            data,
+            origin=multiscale.origin(level),
+            step=multiscale.step(level),
+        )
+        inputs.vol_multiscale = (multiscale, level)
+
+    elif loaded.vol_file:
+        from chimerax.map_data import open_file
+
+        inputs.vol_data = open_file(loaded.vol_file)[0]
+
+    return inputs
+
+
+@profiler.profiled("show alignment")
+def show_alignment(session, loaded: LoadedAlignment, inputs: Optional[LoadedInputs] = None):
+    """Make a loaded alignment the current one and build its models. Must run on the GUI thread."""
+    from chimerax.geometry import rotation
+
+    from .alignment import create_alignment_objects
+
+    state = get_state(session)
+
+    if inputs is None:
+        inputs = LoadedInputs()
+
+    # Streaming into kept models continues if nothing is replaced
+    if state.player is not None:
+        state.player.stop()
+    if inputs.provenance is None or inputs.provenance != {k: state.provenance.get(k) for k in inputs.provenance}:
+        state.stop_background_work()
+
+    state.additional_rotation = rotation((1, 0, 0), loaded.x_rotation)
+    state.initial_coord_order = loaded.coord_order
+    state.current_alignment = loaded.alignment
+    state.loaded = loaded
+
+    ali = loaded.alignment
+    create_alignment_objects(
+        session,
+        ali,
+        ali.per_section_alignment_parameters[0],
+        loaded.vol_file,
+        loaded.ts_file,
+        lazy=state.lazy_sections,
+        cache_bytes=state.section_cache_bytes,
+        binning=state.binning,
+        max_image_size=state.max_image_size,
+        vol_data=inputs.vol_data,
+        ts_data=inputs.ts_data,
+        provenance=inputs.provenance,
+    )
+
+    if inputs.ts_multiscale is not None or inputs.vol_multiscale is not None:
+        start_streaming(session, inputs)
+
+    state.triggers.activate_trigger(ALIGNMENT_SHOWN, loaded)
+
+
+def prepare_dataset(
+    request: LoadRequest,
+    lazy: bool = True,
+    cache_bytes: int = DEFAULT_SECTION_CACHE_BYTES,
+    binning: int = 1,
+    max_image_size: int = DEFAULT_MAX_IMAGE_SIZE,
+    current: Optional[Dict[str, Optional[tuple]]] = None,
+    cancelled: Optional[threading.Event] = None,
+) -> Tuple[LoadedAlignment, LoadedInputs]:
+    """
+    Fetch, parse and open the inputs of a load request, everything but building models. Inputs matching the ``current``
+    provenance are not opened again (see ``open_inputs``). Setting ``cancelled`` interrupts it with
+    ``LoadCancelledError``. Safe to run in a thread.
+    """
+    request = fetch_remote_inputs(request, cancelled)
+    check_cancelled(cancelled)
+    loaded = read_alignment(request)
+    check_cancelled(cancelled)
+    inputs = open_inputs(loaded, lazy, cache_bytes, binning, max_image_size, current, cancelled)
+
+    return loaded, inputs
+
+
+def dataset_preparer(session, reuse: bool = False) -> Callable[[LoadRequest], Tuple[LoadedAlignment, LoadedInputs]]:
+    """
+    ``prepare_dataset`` with the section cache and binning settings of the session state. With ``reuse`` set, inputs of
+    the models currently shown are not opened again.
+    """
+    state = get_state(session)
+    return partial(
+        prepare_dataset,
+        lazy=state.lazy_sections,
+        cache_bytes=state.section_cache_bytes,
+        binning=state.binning,
+        max_image_size=state.max_image_size,
+        current=dict(state.provenance) if reuse else None,
+    )
+
+
+def load_alignment(session, request: LoadRequest) -> LoadedAlignment:
+    """
+    Fetch, parse and open the inputs of a load request and show the alignment, on the calling thread. The tilt series is
+    opened with the section cache and binning settings of the session state.
+    """
+    loaded, inputs = dataset_preparer(session, reuse=True)(request)
+    show_alignment(session, loaded, inputs)
+
+    return loaded
+
+
+def comparison_request(session, request: LoadRequest) -> LoadRequest:
+    """
+    Prepare a load request for comparison with the current alignment: only the alignment is read, the tilt series and
+    tomogram of the current alignment are shared. Without a volume file or dims, the current volume's dims are used.
+    """
+    state = get_state(session)
+    if state.current_alignment is None:
+        raise UserError("Load an alignment to compare with first.")
+
+    request = replace(request, ts_file=None)
+    if request.vol_file is None and request.vol_size is None:
+        vd = state.current_alignment.volume_dimension
+        request = replace(request, vol_size=(vd["x"], vd["y"], vd["z"]))
+
+    return request
+
+
+def compare_alignment(
+    session,
+    path: str,
+    alignment_type: str = "AreTomo3",
+    vol_size: Optional[Tuple[float, float, float]] = None,
+    vol_file: Optional[str] = None,
+    name: Optional[str] = None,
+):
+    """
+    Show another alignment of the current tilt series next to the current one. It shares the tilt series and tomogram
+    data, is scrubbed and played in sync and can be toggled through its group model.
+
+    Returns
+    -------
+    ComparedAlignment
+        The compared alignment.
+    """
+    from .compare import add_comparison
+
+    alignment_type = ALIGNMENT_FORMATS.get(alignment_type.lower(), alignment_type)
+    if alignment_type not in ALIGNMENT_TYPES:
+        raise UserError(f"Unknown alignment type {alignment_type}.")
+
+    request = comparison_request(session, LoadRequest(alignment_type, path, vol_size, vol_file))
+    loaded = read_alignment(fetch_remote_inputs(request))
+
+    return add_comparison(session, loaded, name or os.path.basename(path.rstrip("/")))
+
+
+def open_alignment(
+    session,
+    path: str,
+    alignment_type: str = "AreTomo3",
+    vol_size: Optional[Tuple[float, float, float]] = None,
+    vol_file: Optional[str] = None,
+    ts_file: Optional[str] = None,
+    binning: Optional[int] = None,
+) -> LoadedAlignment:
+    """
+    Load and show an alignment without the tool window, e.g. from scripts or ``chimerax --nogui``.
+
+    Parameters
+    ----------
+    session : chimerax.core.session.Session
+        The ChimeraX session.
+    path : str
+        Alignment file, IMOD basename or S3 URI.
+    alignment_type : str
+        One of ``ALIGNMENT_TYPES`` or a short name from ``ALIGNMENT_FORMATS``.
+    vol_size : tuple of float
+        Volume dimensions (x, y, z), if no volume file is given.
+    vol_file : str
+        Tomogram path, S3 URI or OME-Zarr store.
+    ts_file : str
+        Tilt series path, S3 URI or OME-Zarr store.
+    binning : int
+        Tilt series binning factor (``AUTO_BINNING`` for automatic). Defaults to the session's current setting.
+
+    Returns
+    -------
+    LoadedAlignment
+        The alignment shown.
+    """
+    alignment_type = ALIGNMENT_FORMATS.get(alignment_type.lower(), alignment_type)
+    if alignment_type not in ALIGNMENT_TYPES:
+        raise UserError(f"Unknown alignment type {alignment_type}.")
+
+    if binning is not None:
+        get_state(session).binning = binning
+
+    return load_alignment(session, LoadRequest(alignment_type, path, vol_size, vol_file, ts_file))
+
+
+def start_streaming(session, inputs: LoadedInputs):
+    """
+    Stream the finer pyramid levels of OME-Zarr inputs in the background and swap them in as they complete. Tilt series
+    are streamed down to the level matching the binning. Their levels are read whole if they fit into the section cache
+    budget, a larger last level is read section by section like the coarsest.
+    """
+    from .alignment import replace_tilt_series, replace_volume
+
+    state = get_state(session)
+    streamer = MultiscaleStreamer(session, max_bytes=state.stream_bytes)
+
+    if inputs.ts_multiscale is not None:
+        ts_zarr, level, target = inputs.ts_multiscale
+        cache_bytes = state.section_cache_bytes
+        finer = [i for i in reversed(ts_zarr.section_levels()) if target <= i < level]
+
+        # Levels that do not fit into the section cache budget are skipped, except the last one
+        levels = [i for i in finer if ts_zarr.nbytes(i) <= cache_bytes]
+        if finer and finer[-1] not in levels:
+            levels.append(finer[-1])
+
+        def read_ts_level(i, cancelled):
+            from .tiltstack import TiltStackGridData
+
+            if ts_zarr.nbytes(i) > cache_bytes:
+                grid = TiltStackGridData(ts_zarr.section_source(i), cache_bytes=cache_bytes)
+
+                # The section shown is read ahead, off the GUI thread
+                stack = state.tilt_stack
+                grid.section(0 if stack is None or stack.section is None else stack.section)
+                return grid
+
+            data = ts_zarr.read_level(i, cancelled)
+            if data is None:
+                return None
+
+            source = ts_zarr.section_source(i)
+            array = ArraySectionSource(
+                data,
+                source.step,
+                pixel_size=source.pixel_size,
+                extent=source.extent,
+                origin=source.origin,
+            )
+            return TiltStackGridData(array, cache_bytes=cache_bytes)
+
+        def on_ts_level(grid, i):
+            replace_tilt_series(session, grid)
+
+        streamer.add(ts_zarr, levels, on_ts_level, read=read_ts_level)
+
+    if inputs.vol_multiscale is not None:
+        vol_zarr, level = inputs.vol_multiscale
+
+        def on_vol_level(data, i):
+            from chimerax.map_data import ArrayGridData
+
+            replace_volume(session, ArrayGridData(data, origin=vol_zarr.origin(i), step=vol_zarr.step(i)))
+
+        streamer.add(vol_zarr, list(range(level - 1, -1, -1)), on_vol_level)
+
+    state.streamer = streamer
+    streamer.start()
@@ -0,0 +1,215 @@
+import threading
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_STREAM_BYTES = 4 * 2**30
+"""Largest tomogram pyramid level (in bytes) that is streamed into memory in the background (4 GiB)."""
+
+
+def is_zarr_path(path: Optional[str]) -> bool:
+    """Return true if path points at a zarr store."""
+    return path is not None and path.rstrip("/").lower().endswith(".zarr")
+
+
+class OmeZarrMultiscale:
+    """
+    Pyramid levels of an OME-Zarr image, local or on S3. Levels are ordered from finest (0) to coarsest. Steps are in
+    (x, y, z) order and in the units of the image's coordinate transformations.
+
+    Parameters
+    ----------
+    path : str
+        Path or S3 URI of the OME-Zarr group.
+    """
+
+    def __init__(self, path: str):
+        import zarr
+
+        self.path = path
+
+        if path.startswith("s3://"):
+            from ..util.s3 import storage_options
+
+            self.group = zarr.open_group(path, mode="r", storage_options=storage_options())
+        else:
+            self.group = zarr.open_group(path, mode="r")
+
+        multiscale = self.group.attrs["multiscales"][0]
+
+        levels = []
+        for dataset in multiscale["datasets"]:
+            scale = [1.0, 1.0, 1.0]
+            translation = None
+            for transform in dataset.get("coordinateTransformations", []):
+                if transform["type"] == "scale":
+                    scale = transform["scale"][-3:]
+                elif transform["type"] == "translation":
+                    translation = tuple(float(t) for t in reversed(transform["translation"][-3:]))
+
+            array = self.group[dataset["path"]]
+            levels.append((array, tuple(float(s) for s in reversed(scale)), translation))
+
+        levels.sort(key=lambda level: -int(np.prod(level[0].shape[-3:])))
+        self._levels: List[Tuple[object, Tuple[float, float, float], Optional[Tuple[float, float, float]]]] = levels
+
+    def __len__(self) -> int:
+        return len(self._levels)
+
+    @property
+    def coarsest(self) -> int:
+        return len(self._levels) - 1
+
+    def array(self, level: int):
+        return self._levels[level][0]
+
+    def shape(self, level: int) -> Tuple[int, int, int]:
+        """Level shape in (z, y, x) order."""
+        return tuple(self.array(level).shape[-3:])
+
+    def step(self, level: int) -> Tuple[float, float, float]:
+        return self._levels[level][1]
+
+    def origin(self, level: int) -> Tuple[float, float, float]:
+        """
+        Position (x, y, z) of the first voxel of a level relative to the first voxel of the finest level: the difference
+        of their translations, or without translations the center of the block of finest voxels it covers.
+        """
+        _, step, translation = self._levels[level]
+        _, finest_step, finest_translation = self._levels[0]
+        if translation is None and finest_translation is None:
+            return tuple((s - f) / 2 for s, f in zip(step, finest_step, strict=True))
+
+        translation = translation or (0.0, 0.0, 0.0)
+        finest_translation = finest_translation or (0.0, 0.0, 0.0)
+        return tuple(t - f for t, f in zip(translation, finest_translation, strict=True))
+
+    def nbytes(self, level: int) -> int:
+        return int(np.prod(self.shape(level))) * self.array(level).dtype.itemsize
+
+    def extent(self) -> Tuple[float, float, float]:
+        """Physical size (x, y, z) of the image."""
+        nz, ny, nx = self.shape(0)
+        sx, sy, sz = self.step(0)
+        return nx * sx, ny * sy, nz * sz
+
+    def section_levels(self) -> List[int]:
+        """Levels that keep every section, i.e. are only downsampled in x and y."""
+        nz = self.shape(0)[0]
+        return [i for i in range(len(self)) if self.shape(i)[0] == nz]
+
+    def read(self, level: int, z_start: int, z_stop: int) -> np.ndarray:
+        array = self.array(level)
+        lead = (0,) * (array.ndim - 3)
+        return np.asarray(array[lead + (slice(z_start, z_stop),)])
+
+    def read_level(self, level: int, cancelled: Optional[threading.Event] = None) -> Optional[np.ndarray]:
+        """Read a whole level, one chunk of sections at a time. Returns None if cancelled."""
+        array = self.array(level)
+        shape = self.shape(level)
+        chunk = array.chunks[-3]
+
+        out = np.empty(shape, dtype=array.dtype)
+        for z in range(0, shape[0], chunk):
+            if cancelled is not None and cancelled.is_set():
+                return None
+            out[z : z + chunk] = self.read(level, z, min(z + chunk, shape[0]))
+
+        return out
+
+    def section_source(self, level: int) -> "ZarrSectionSource":
+        return ZarrSectionSource(self, level)
+
+
+class ZarrSectionSource:
+    """
+    Reads single sections of one pyramid level of an OME-Zarr tilt series. Shifts are applied in pixels of the finest
+    level, so ``pixel_size`` is the finest level's step.
+    """
+
+    def __init__(self, multiscale: OmeZarrMultiscale, level: int):
+        self.multiscale = multiscale
+        self.level = level
+        self.pixel_size = multiscale.step(0)[:2]
+        self.extent = multiscale.extent()[:2]
+        self.origin = multiscale.origin(level)
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        return self.multiscale.shape(self.level)
+
+    @property
+    def dtype(self):
+        return np.dtype(self.multiscale.array(self.level).dtype)
+
+    @property
+    def step(self) -> Tuple[float, float, float]:
+        return self.multiscale.step(self.level)
+
+    def section(self, z: int) -> np.ndarray:
+        return self.multiscale.read(self.level, z, z + 1)[0]
+
+
+class MultiscaleStreamer:
+    """
+    Streams successively finer pyramid levels in a background thread. Each completed level is handed to its callback on
+    the GUI thread. Levels read whole that are larger than ``max_bytes`` are not streamed.
+
+    Parameters
+    ----------
+    session : chimerax.core.session.Session
+        The ChimeraX session.
+    max_bytes : int
+        Size limit of a level read whole.
+    """
+
+    def __init__(self, session, max_bytes: int = DEFAULT_STREAM_BYTES):
+        self.session = session
+        self.max_bytes = max_bytes
+        self._jobs = []
+        self._cancelled = threading.Event()
+        self._thread = None
+
+    def add(
+        self,
+        multiscale: OmeZarrMultiscale,
+        levels: List[int],
+        on_level: Callable[[object, int], None],
+        read: Optional[Callable[[int, threading.Event], object]] = None,
+    ):
+        """
+        Stream the given levels (finer than the one currently shown, coarse to fine). ``read(level, cancelled)`` returns
+        what is handed to ``on_level`` with the level, or None if cancelled. By default levels are read whole.
+        """
+        if read is None:
+            levels = [level for level in levels if multiscale.nbytes(level) <= self.max_bytes]
+            read = multiscale.read_level
+        if levels:
+            self._jobs.append((levels, read, on_level))
+
+    def start(self):
+        if not self._jobs:
+            return
+
+        self._thread = threading.Thread(target=self._run, name="InspectET multiscale streaming", daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        for levels, read, on_level in self._jobs:
+            for level in levels:
+                data = read(level, self._cancelled)
+                if data is None:
+                    return
+
+                self.session.ui.thread_safe(self._deliver, on_level, data, level)
+
+    def _deliver(self, on_level, data, level):
+        if not self._cancelled.is_set():
+            on_level(data, level)
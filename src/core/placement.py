@@ -0,0 +1,166 @@
+from collections import OrderedDict
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from .footprint import VolumeFootprint, volume_footprint
+from .sections import SectionTable, section_table
+
+
+def rotation_matrices(axis: int, angles: np.ndarray) -> np.ndarray:
+    """
+    Batched right-handed rotations about a coordinate axis.
+
+    Parameters
+    ----------
+    axis : int
+        Rotation axis (0: x, 1: y, 2: z).
+    angles : np.ndarray
+        Rotation angles in degrees, shape (N,).
+
+    Returns
+    -------
+    np.ndarray
+        Rotation matrices, shape (N, 3, 3).
+    """
+    a = np.radians(np.asarray(angles, dtype=np.float64))
+    c, s = np.cos(a), np.sin(a)
+    i, j = [(1, 2), (2, 0), (0, 1)][axis]
+
+    m = np.zeros((len(a), 3, 3))
+    m[:, axis, axis] = 1
+    m[:, i, i] = c
+    m[:, i, j] = -s
+    m[:, j, i] = s
+    m[:, j, j] = c
+    return m
+
+
+def compose(r: np.ndarray, t: np.ndarray) -> np.ndarray:
+    """Stack rotations (N, 3, 3) and translations (N, 3) into (N, 3, 4) placement matrices."""
+    return np.concatenate([r, t[:, :, np.newaxis]], axis=2)
+
+
+class SectionPlacements:
+    """
+    Image and volume placements for all sections of an alignment, as (N, 3, 4) arrays in the row order of
+    ``per_section_alignment_parameters``. ``image_size`` is the physical size (x, y) of the images and ``volume_size``
+    that of the volume box in the axis order of the volume data.
+    """
+
+    def __init__(
+        self,
+        sections: SectionTable,
+        image: np.ndarray,
+        volume: np.ndarray,
+        image_size: Optional[Tuple[float, float]] = None,
+        volume_size: Optional[Tuple[float, float, float]] = None,
+    ):
+        self.sections = sections
+        self.z_index = sections.z_index
+        self.tilt_angle = sections.tilt_angle
+        self.image = image
+        self.volume = volume
+        self.image_size = image_size
+        self.volume_size = volume_size
+        self._footprint = None
+
+    def __len__(self) -> int:
+        return len(self.sections)
+
+    def row(self, z_index: int) -> int:
+        return self.sections.row(z_index)
+
+    def find_row(self, z_index: int) -> Optional[int]:
+        """Row of a section, or None if the alignment does not contain it."""
+        return self.sections.find_row(z_index)
+
+    def footprint(self) -> VolumeFootprint:
+        """Where the volume lands in the image of every section, computed on first use."""
+        if self._footprint is None:
+            self._footprint = volume_footprint(self.image, self.volume, self.image_size, self.volume_size)
+        return self._footprint
+
+
+def compute_placements(
+    alignment,
+    image_size: Tuple[float, float],
+    pixel_size: Tuple[float, float],
+    z_offset: float,
+    additional_rotation: np.ndarray,
+    coord_order: Sequence[int],
+    plane_step: float = 0,
+) -> SectionPlacements:
+    """
+    Compute the image and volume placements of all sections in one batched pass.
+
+    The image of a section is centered, shifted by its offsets (in pixels of size ``pixel_size``), lowered to
+    ``z_offset`` and rotated about z by the negative tilt axis rotation. Sections stored as planes of one stack are
+    additionally moved down by ``z * plane_step``. The volume is centered, rotated by ``additional_rotation`` (3x4) and
+    tilted about y by the tilt angle.
+    """
+    sections = section_table(alignment)
+    n = len(sections)
+
+    # Images
+    t = np.empty((n, 3))
+    t[:, 0] = -sections.x_offset * pixel_size[0] - image_size[0] / 2
+    t[:, 1] = -sections.y_offset * pixel_size[1] - image_size[1] / 2
+    t[:, 2] = z_offset - sections.z_index * plane_step
+
+    rot = rotation_matrices(2, -sections.tilt_axis_rotation)
+    image = compose(rot, np.einsum("nij,nj->ni", rot, t))
+
+    # Volume
+    vd = alignment.volume_dimension
+    vol_size = (vd["x"], vd["y"], vd["z"])
+    box_size = np.array([vol_size[i] for i in coord_order[:3]], dtype=np.float64)
+    center = -box_size / 2
+
+    add = np.asarray(additional_rotation, dtype=np.float64)
+    add_t = add[:, :3] @ center + add[:, 3]
+
+    tilt = rotation_matrices(1, sections.tilt_angle)
+    volume = compose(tilt @ add[:, :3], tilt @ add_t)
+
+    return SectionPlacements(sections, image, volume, tuple(image_size[:2]), tuple(box_size.tolist()))
+
+
+class PlacementCache:
+    """
+    Keeps the placements of the most recently used alignments, so that scrubbing, playback and reloads do not repeat
+    the computation.
+    """
+
+    def __init__(self, max_entries: int = 8):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, alignment, **geometry) -> SectionPlacements:
+        key = (id(alignment), tuple(sorted((k, _hashable(v)) for k, v in geometry.items())))
+
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] is alignment:
+            self._entries.move_to_end(key)
+            return entry[1]
+
+        placements = compute_placements(alignment, **geometry)
+        self._entries[key] = (alignment, placements)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+        return placements
+
+    def clear(self):
+        self._entries.clear()
+
+
+def _hashable(value):
+    if isinstance(value, np.ndarray):
+        return value.tobytes()
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(v) for v in value)
+    return value
+
+
+placement_cache = PlacementCache()
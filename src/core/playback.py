@@ -0,0 +1,155 @@
+import time
+from typing import Callable, List, Optional
+
+from ..util.profiling import profiler
+from .sections import section_table
+
+DEFAULT_FRAME_RATE = 60
+"""Frame rate assumed when converting ``framesPerView`` to a playback rate."""
+
+
+def playback_order(num_views: int, loops: int) -> List[int]:
+    """Row indices shown during playback. Every other loop runs backwards, starting from the first view."""
+    order = []
+    for loop in range(loops):
+        for i in range(num_views):
+            order.append(i if loop % 2 == 0 else -i % num_views)
+    return order
+
+
+class AlignmentPlayer:
+    """
+    Plays an alignment back in wall-clock time, driven by the ChimeraX ``new frame`` trigger. On every frame the view
+    due at the current time is shown, so views are dropped if rendering cannot keep up with the target rate. The UI
+    stays responsive and playback can be paused, resumed and stopped.
+
+    Parameters
+    ----------
+    session : chimerax.core.session.Session
+        The ChimeraX session.
+    alignment : cryoet_alignment.io.cryoet_data_portal.Alignment
+        The alignment to play.
+    fps : float
+        Target rate in views per second.
+    loops : int
+        Number of passes through the views.
+    """
+
+    def __init__(self, session, alignment, fps: float, loops: int = 1):
+        self.session = session
+        self.alignment = alignment
+        self.fps = fps
+        self.order = playback_order(len(section_table(alignment)), loops)
+
+        self.shown = 0
+        """Number of views shown."""
+        self.dropped = 0
+        """Number of views skipped because rendering fell behind."""
+
+        self._position = -1
+        self._last_frame = None
+        self._start = None
+        self._paused_at = None
+        self._handler = None
+        self._listeners: List[Callable[["AlignmentPlayer"], None]] = []
+
+    @property
+    def active(self) -> bool:
+        """True while playing or paused."""
+        return self._handler is not None
+
+    @property
+    def paused(self) -> bool:
+        return self._paused_at is not None
+
+    def add_listener(self, listener: Callable[["AlignmentPlayer"], None]):
+        """Call listener whenever playback starts, pauses, resumes or stops."""
+        self._listeners.append(listener)
+
+    def start(self):
+        self._start = time.perf_counter()
+        self._handler = self.session.triggers.add_handler("new frame", self._on_frame)
+        self._notify()
+
+    def pause(self):
+        if self.active and not self.paused:
+            self._paused_at = time.perf_counter()
+            self._notify()
+
+    def resume(self):
+        if self.active and self.paused:
+            # Paused time does not count towards playback
+            self._start += time.perf_counter() - self._paused_at
+            self._paused_at = None
+            self._notify()
+
+    def stop(self):
+        if not self.active:
+            return
+
+        self.session.triggers.remove_handler(self._handler)
+        self._handler = None
+        self._report()
+        self._notify()
+
+    def elapsed(self, now: Optional[float] = None) -> float:
+        """Playback time in seconds, excluding pauses."""
+        if self._start is None:
+            return 0.0
+
+        if now is None:
+            now = time.perf_counter()
+        if self._paused_at is not None:
+            now = self._paused_at
+
+        return now - self._start
+
+    def achieved_fps(self) -> float:
+        elapsed = self.elapsed()
+        return self.shown / elapsed if elapsed > 0 else 0.0
+
+    def _on_frame(self, trigger_name, data):
+        from .alignment import show_section
+
+        if self.paused:
+            self._last_frame = None
+            return
+
+        now = time.perf_counter()
+        if self._last_frame is not None:
+            profiler.frame(now - self._last_frame)
+        self._last_frame = now
+
+        position = int(self.elapsed(now) * self.fps)
+        if position >= len(self.order):
+            # Show the last view before finishing
+            position = len(self.order) - 1
+            finished = True
+        else:
+            finished = False
+
+        if position > self._position:
+            self.dropped += position - self._position - 1
+            profiler.count("playback views dropped", position - self._position - 1)
+            self._position = position
+            self.shown += 1
+            show_section(self.session, self.order[position])
+
+        if finished:
+            self.stop()
+
+    def _report(self):
+        # The ChimeraX logger takes a formatted message, no arguments
+        message = "Played %d of %d views in %.2f s: %.1f fps (target %g fps, %d dropped)." % (
+            self.shown,
+            len(self.order),
+            self.elapsed(),
+            self.achieved_fps(),
+            self.fps,
+            self.dropped,
+        )
+        self.session.logger.info(message)
+
+    def _notify(self):
+        for listener in self._listeners:
+            listener(self)
@@ -0,0 +1,60 @@
+import os
+from typing import Optional, Tuple
+
+from .sources import AUTO_BINNING
+
+
+def file_provenance(path: Optional[str]) -> Optional[Tuple]:
+    """
+    Identifies the version of an input file: its path, size and modification time. Files in the download cache are
+    named after the version of the remote file, so their path alone identifies them. Remote paths (e.g. streamed
+    OME-Zarr stores) are identified by their path.
+    """
+    if path is None:
+        return None
+
+    if "://" in path:
+        return (path,)
+
+    path = os.path.realpath(path)
+
+    from ..util.cache import get_cache
+
+    if path.startswith(os.path.realpath(get_cache().directory) + os.sep):
+        return (path,)
+
+    try:
+        st = os.stat(path)
+    except OSError:
+        return (path,)
+
+    return path, st.st_size, st.st_mtime_ns
+
+
+def tilt_series_provenance(
+    path: Optional[str],
+    lazy: bool,
+    binning: int,
+    max_image_size: int,
+) -> Optional[Tuple]:
+    """Identifies the tilt series grid opened from a file with the given options."""
+    if path is None:
+        return None
+
+    # The screen size only matters if it picks the binning
+    screen = max_image_size if binning == AUTO_BINNING else None
+    return "tiltseries", file_provenance(path), lazy, binning, screen
+
+
+def volume_provenance(path: Optional[str]) -> Optional[Tuple]:
+    """Identifies the tomogram grid opened from a file."""
+    if path is None:
+        return None
+
+    return "volume", file_provenance(path)
+
+
+def box_provenance(alignment) -> Tuple:
+    """Identifies models that only depend on the volume dimensions of an alignment (axes, volume box)."""
+    vd = alignment.volume_dimension
+    return "box", vd["x"], vd["y"], vd["z"]
@@ -0,0 +1,219 @@
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from typing import Optional
+
+VIDEO_CODECS = {
+    ".mp4": ["-c:v", "libx264", "-pix_fmt", "yuv420p"],
+    ".mov": ["-c:v", "libx264", "-pix_fmt", "yuv420p"],
+    ".avi": ["-c:v", "mpeg4", "-q:v", "2"],
+    ".webm": ["-c:v", "libvpx-vp9", "-pix_fmt", "yuv420p"],
+}
+"""ffmpeg encoder options by movie file suffix."""
+
+DEFAULT_QUEUE_FRAMES = 32
+"""Rendered frames that may wait for the writer before rendering blocks."""
+
+
+def is_video_path(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in VIDEO_CODECS
+
+
+def ffmpeg_executable() -> str:
+    """The ffmpeg shipped with ChimeraX, or the one on the PATH."""
+    try:
+        from chimerax import app_bin_dir
+
+        bundled = os.path.join(app_bin_dir, "ffmpeg")
+        if os.path.exists(bundled):
+            return bundled
+    except ImportError:
+        pass
+
+    path = shutil.which("ffmpeg")
+    if path is None:
+        raise FileNotFoundError("ffmpeg not found.")
+    return path
+
+
+class FrameWriter:
+    """
+    Writes rendered frames in a worker thread, either as numbered PNG files into a directory or encoded into a movie by
+    ffmpeg. Frames are queued by ``write`` and written in order.
+
+    Parameters
+    ----------
+    path : str
+        Movie file (.mp4, .mov, .avi, .webm) or directory for PNG frames.
+    size : tuple of int
+        Frame size (width, height) in pixels.
+    fps : float
+        Movie frame rate.
+    max_queued : int
+        Number of frames that may be queued before ``write`` blocks.
+    """
+
+    def __init__(self, path: str, size, fps: float = 25, max_queued: int = DEFAULT_QUEUE_FRAMES):
+        self.path = path
+        self.size = tuple(size)
+        self.fps = fps
+        self.frames = 0
+        self.write_time = 0.0
+        """Time spent encoding and writing, in seconds."""
+
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._error: Optional[BaseException] = None
+        self._process = None
+
+        if is_video_path(path):
+            w, h = self.size
+
+            # Not a pipe, which ffmpeg could fill and block on while the writer thread waits on stdin
+            self._stderr = tempfile.TemporaryFile()
+            self._process = subprocess.Popen(
+                [ffmpeg_executable(), "-y", "-loglevel", "error", "-nostats"]
+                + ["-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{w}x{h}", "-r", f"{fps:g}", "-i", "-"]
+                + VIDEO_CODECS[os.path.splitext(path)[1].lower()]
+                + [path],
+                stdin=subprocess.PIPE,
+                stderr=self._stderr,
+            )
+        else:
+            os.makedirs(path, exist_ok=True)
+
+        self._thread = threading.Thread(target=self._run, name="InspectET frame writer", daemon=True)
+        self._thread.start()
+
+    def write(self, image, repeat: int = 1):
+        """Queue a PIL image, written ``repeat`` times."""
+        if self._error is not None:
+            raise self._error
+        self._queue.put((image, repeat))
+
+    def close(self):
+        """Write the remaining frames and finish the movie. Raises errors that occurred while writing."""
+        self._queue.put(None)
+        self._thread.join()
+
+        if self._process is not None:
+            self._process.stdin.close()
+            returncode = self._process.wait()
+            self._stderr.seek(0)
+            stderr = self._stderr.read().decode(errors="replace")
+            self._stderr.close()
+            if returncode != 0 and self._error is None:
+                self._error = RuntimeError(f"ffmpeg failed: {stderr.strip()}")
+
+        if self._error is not None:
+            raise self._error
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            # Keep draining after an error, so the renderer does not block on a full queue
+            if self._error is not None:
+                continue
+
+            image, repeat = item
+            start = time.perf_counter()
+            try:
+                if self._process is not None:
+                    data = image.convert("RGB").tobytes()
+                    for _ in range(repeat):
+                        self._process.stdin.write(data)
+                        self.frames += 1
+                else:
+                    for _ in range(repeat):
+                        image.save(os.path.join(self.path, f"frame_{self.frames + 1:05d}.png"))
+                        self.frames += 1
+            except BaseException as e:
+                self._error = e
+            finally:
+                self.write_time += time.perf_counter() - start
+
+
+def initialize_rendering(session):
+    """Set up offscreen rendering (e.g. OSMesa) in sessions without a window."""
+    from chimerax.core.errors import UserError
+
+    if session.ui.is_gui:
+        return
+
+    if session.main_view.render is None:
+        init = getattr(session.ui, "initialize_offscreen_rendering", None)
+        if init is not None:
+            init()
+
+    if session.main_view.render is None:
+        raise UserError("Offscreen rendering is not available, start ChimeraX with --offscreen.")
+
+
+def record(
+    session,
+    alignment,
+    path: str,
+    width: int = 1920,
+    height: int = 1080,
+    frames_per_view: int = 1,
+    loops: int = 1,
+    fps: float = 25,
+    supersample: int = 3,
+):
+    """
+    Render the views of an alignment offscreen at a fixed size and write them to a movie or PNG frames. Rendering
+    happens on the calling thread, encoding and writing in a worker thread.
+
+    Returns
+    -------
+    tuple
+        Number of frames written, rendering time and writing time in seconds.
+    """
+    from .alignment import show_section
+    from .playback import playback_order
+    from .sections import section_table
+
+    initialize_rendering(session)
+
+    # Encoders want even frame sizes
+    width, height = width + width % 2, height + height % 2
+
+    state = session.inspectet
+    current = state.current_section
+
+    writer = FrameWriter(path, (width, height), fps=fps)
+    render_time = 0.0
+    rendered = False
+    try:
+        for row in playback_order(len(section_table(alignment)), loops):
+            start = time.perf_counter()
+            show_section(session, row)
+            image = session.main_view.image(width, height, supersample=supersample)
+            render_time += time.perf_counter() - start
+
+            # Views that stay for several frames are rendered once
+            writer.write(image, repeat=frames_per_view)
+        rendered = True
+    finally:
+        try:
+            # Back to the section shown before recording
+            row = state.placements.find_row(current) if current is not None else None
+            if row is not None:
+                show_section(session, row)
+        finally:
+            try:
+                writer.close()
+            except Exception as e:
+                # A rendering error is more telling than the encoder failing on the truncated movie
+                if rendered:
+                    raise
+                message = "Closing %s after the recording failed: %s" % (path, e)
+                session.logger.warning(message)
+
+    return writer.frames, render_time, writer.write_time
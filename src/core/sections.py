@@ -0,0 +1,112 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import numpy as np
+
+COLUMNS = ("z_index", "tilt_angle", "tilt_axis_rotation", "x_offset", "y_offset", "volume_x_rotation")
+"""The per-section parameters held by a ``SectionTable``."""
+
+
+class SectionTable:
+    """
+    The per-section alignment parameters of an alignment as read-only arrays, one per parameter, in the row order of
+    ``per_section_alignment_parameters``. Built once per alignment (see ``section_table``) and shared by placements,
+    playback, recording and the table, so none of them walks the parameter objects again. Rows are looked up by z-index
+    in O(1).
+
+    Parameters
+    ----------
+    z_index : np.ndarray
+        Section index in the tilt series stack of every row.
+    **columns : np.ndarray
+        The other parameters of ``COLUMNS``, angles in degrees and offsets in pixels.
+    """
+
+    def __init__(self, z_index: np.ndarray, **columns: np.ndarray):
+        self.z_index = _read_only(np.asarray(z_index, dtype=np.int32))
+        for name in COLUMNS[1:]:
+            setattr(self, name, _read_only(np.asarray(columns[name], dtype=np.float64)))
+
+        # Dense map of z-index to row, -1 for sections the alignment leaves out
+        size = int(self.z_index.max()) + 1 if len(self.z_index) else 0
+        rows = np.full(size, -1, dtype=np.int32)
+        rows[self.z_index] = np.arange(len(self.z_index), dtype=np.int32)
+        self._rows = _read_only(rows)
+
+    @classmethod
+    def from_alignment(cls, alignment) -> "SectionTable":
+        psaps = alignment.per_section_alignment_parameters
+        n = len(psaps)
+
+        # One pass over the parameter objects
+        values = np.empty((n, 5))
+        in_plane = np.empty((n, 4))
+        for i, p in enumerate(psaps):
+            values[i] = (p.z_index, p.tilt_angle, p.x_offset, p.y_offset, p.volume_x_rotation)
+            in_plane[i] = p.in_plane_rotation[0] + p.in_plane_rotation[1]
+
+        return cls(
+            z_index=values[:, 0],
+            tilt_angle=values[:, 1],
+            tilt_axis_rotation=np.degrees(np.arctan2(in_plane[:, 2], in_plane[:, 0])),
+            x_offset=values[:, 2],
+            y_offset=values[:, 3],
+            volume_x_rotation=values[:, 4],
+        )
+
+    def __len__(self) -> int:
+        return len(self.z_index)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in COLUMNS) + self._rows.nbytes
+
+    def row(self, z_index: int) -> int:
+        """Row of a section, KeyError if the alignment does not contain it."""
+        row = self.find_row(z_index)
+        if row is None:
+            raise KeyError(z_index)
+        return row
+
+    def find_row(self, z_index: int) -> Optional[int]:
+        """Row of a section, or None if the alignment does not contain it."""
+        if not 0 <= z_index < len(self._rows):
+            return None
+        row = int(self._rows[z_index])
+        return row if row >= 0 else None
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """All parameters by name."""
+        return {name: getattr(self, name) for name in COLUMNS}
+
+
+def _read_only(a: np.ndarray) -> np.ndarray:
+    a.setflags(write=False)
+    return a
+
+
+MAX_TABLES = 32
+"""Number of alignments whose section tables are kept."""
+
+_tables = OrderedDict()
+_lock = threading.Lock()
+
+
+def section_table(alignment) -> SectionTable:
+    """The section table of an alignment, built on first use and kept for the most recently used alignments."""
+    key = id(alignment)
+    with _lock:
+        entry = _tables.get(key)
+        if entry is not None and entry[0] is alignment:
+            _tables.move_to_end(key)
+            return entry[1]
+
+    table = SectionTable.from_alignment(alignment)
+
+    with _lock:
+        _tables[key] = (alignment, table)
+        while len(_tables) > MAX_TABLES:
+            _tables.popitem(last=False)
+
+    return table
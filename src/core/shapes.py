@@ -0,0 +1,161 @@
+from collections import OrderedDict
+from typing import Callable, Tuple
+
+import numpy as np
+
+MAX_TEMPLATES = 32
+"""Number of shape geometries kept, least recently used ones are dropped (a few per volume size)."""
+
+_templates: "OrderedDict[tuple, Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]" = OrderedDict()
+
+
+def bild_geometry(session, key: tuple, build: Callable) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Triangle geometry (vertices, normals, triangles, vertex colors) of a BILD shape. ``build`` is called with a BILD
+    reader to issue the commands, but only the first time a key is requested. Later requests share the arrays, the last
+    ``MAX_TEMPLATES`` keys are kept.
+    """
+    geometry = _templates.get(key)
+    if geometry is not None:
+        _templates.move_to_end(key)
+        return geometry
+
+    from chimerax.atomic import AtomicShapeDrawing
+    from chimerax.bild.bild import _BildFile
+
+    b = _BildFile(session, "dummy")
+    build(b)
+
+    d = AtomicShapeDrawing("shapes")
+    d.add_shapes(b.shapes)
+    geometry = (d.vertices, d.normals, d.triangles, d.vertex_colors)
+    _templates[key] = geometry
+    while len(_templates) > MAX_TEMPLATES:
+        _templates.popitem(last=False)
+
+    return geometry
+
+
+def shape_model(session, name: str, geometry):
+    """A model drawing the given template geometry."""
+    from chimerax.core.models import Surface
+
+    vertices, normals, triangles, vertex_colors = geometry
+
+    m = Surface(name, session)
+    m.set_geometry(vertices, normals, triangles)
+    m.vertex_colors = vertex_colors
+
+    return m
+
+
+def _axes_commands(size: Tuple[float, float, float], z_offset) -> Callable:
+    def build(b):
+        # Global X
+        b.color_command([".color", "red"])
+        b.arrow_command(f".arrow {-size[0]} 0 0 {size[0]} 0 0 80 240 0.9".split())
+        b.color_command([".color", "red"])
+        b.transparency_command([".transparency", "0.5"])
+        b.arrow_command(f".arrow {-size[0]} 0 {z_offset} {size[0]} 0 {z_offset} 80 240 0.9".split())
+
+        # Global Y
+        b.color_command([".color", "yellow"])
+        b.transparency_command([".transparency", "0"])
+        b.arrow_command(f".arrow 0 {-size[1]} 0 0 {size[1]} 0 80 240 0.9".split())
+        b.color_command([".color", "yellow"])
+        b.transparency_command([".transparency", "0.5"])
+        b.arrow_command(f".arrow 0 {-size[1]} {z_offset} 0 {size[1]} {z_offset} 80 240 0.9".split())
+
+        # Global Z
+        b.color_command([".color", "blue"])
+        b.transparency_command([".transparency", "0"])
+        b.arrow_command(f".arrow 0 0 {-size[2]} 0 0 {size[2]} 80 240 0.9".split())
+
+        # Electron Beam
+        b.color_command([".color", "green"])
+        b.arrow_command(f".arrow 0 0 {size[2] + 1000} 0 0 {size[2] + 500} 160 600 0.9".split())
+
+    return build
+
+
+def get_axes_model(session, size: Tuple[float, float, float], z_offset=0):
+    # Axes from https://www.cgl.ucsf.edu/chimera/docs/UsersGuide/bild.html
+    key = ("axes", tuple(size), z_offset)
+    return shape_model(session, "axes", bild_geometry(session, key, _axes_commands(size, z_offset)))
+
+
+def _box_commands(size: Tuple[float, float, float], color: str, transparency: float, offset) -> Callable:
+    def build(b):
+        # Box
+        b.color_command(f".color {color}".split())
+        b.transparency_command(f".transparency {transparency}".split())
+        b.box_command(f".box {offset[0]} {offset[0]} {offset[0]} {size[0]} {size[1]} {size[2]}".split())
+
+        # Origin
+        b.color_command([".color", "red"])
+        b.sphere_command([".sphere", "0", "0", "0", "300"])
+
+    return build
+
+
+def box_geometry(
+    session,
+    size: Tuple[float, float, float],
+    color: str = "cyan",
+    transparency: float = 0.5,
+    offset=(0, 0, 0),
+):
+    key = ("box", tuple(size), color, transparency, tuple(offset))
+    return bild_geometry(session, key, _box_commands(size, color, transparency, offset))
+
+
+def get_box_model(
+    session,
+    size: Tuple[float, float, float],
+    name: str = "volume",
+    color: str = "cyan",
+    transparency: float = 0.5,
+    offset=(0, 0, 0),
+):
+    return shape_model(session, name, box_geometry(session, size, color, transparency, offset))
+
+
+def get_instanced_box_model(
+    session,
+    size: Tuple[float, float, float],
+    positions: np.ndarray,
+    name: str = "aligned tiltseries",
+    color: str = "cyan",
+    transparency: float = 0.5,
+):
+    """
+    One model drawing a box at each of the given placements (N, 3, 4). All instances start hidden, ``show_instance``
+    shows one at a time.
+    """
+    from chimerax.geometry import Places
+
+    m = shape_model(session, name, box_geometry(session, size, color, transparency))
+    m.positions = Places(place_array=np.asarray(positions, dtype=np.float64))
+
+    # Two display masks used in turn by show_instance, with the instance each one shows
+    m.instance_masks = [np.zeros(len(positions), dtype=bool) for _ in range(2)]
+    m.instance_shown = [None, None]
+    m.display_positions = m.instance_masks[0]
+
+    return m
+
+
+def show_instance(model, index: int):
+    """
+    Show instance ``index`` of an instanced model made by ``get_instanced_box_model``, hiding the one shown before. Only
+    these entries of a display mask are updated. The model only notices a mask that differs from the one it has, so the
+    two masks of the model are updated and assigned in turn.
+    """
+    spare = 1 if model.display_positions is model.instance_masks[0] else 0
+    mask = model.instance_masks[spare]
+    shown = model.instance_shown[spare]
+    if shown is not None:
+        mask[shown] = False
+    mask[index] = True
+    model.instance_shown[spare] = index
+    model.display_positions = mask
@@ -0,0 +1,234 @@
+import hashlib
+import os
+import uuid
+from typing import Optional
+
+import numpy as np
+
+SNAPSHOT_VERSION = 1
+"""Version of the InspectET session snapshot."""
+
+SETTINGS = ("lazy_sections", "section_cache_bytes", "binning", "max_image_size", "stream_bytes")
+"""State attributes saved with a session."""
+
+
+def _is_local_file(path: Optional[str]) -> bool:
+    return path is not None and "://" not in path and os.path.exists(path)
+
+
+def _downsampled(grid) -> bool:
+    """Whether a tilt series grid holds binned sections or a coarse pyramid level."""
+    pixel_size = getattr(grid, "pixel_size", None)
+    return pixel_size is not None and not np.allclose(grid.step[:2], pixel_size)
+
+
+def _floats(values) -> Optional[list]:
+    return None if values is None else [float(v) for v in values]
+
+
+def _file_reference(path: str) -> dict:
+    """Reference to a local input file. Downloaded files are pinned in the file cache, so eviction keeps them."""
+    from ..util.cache import get_cache
+
+    cache = get_cache()
+    return {"file": cache.pin(path) if cache.holds(path) else path}
+
+
+def _write_sections(path: str, grid):
+    """Write a grid to a .npy file one z-plane at a time, without reading the whole grid into memory."""
+    nx, ny, nz = grid.size
+    source = getattr(grid, "source", None)
+
+    array = np.lib.format.open_memmap(path, mode="w+", dtype=np.dtype(grid.value_type), shape=(nz, ny, nx))
+    for z in range(nz):
+        if source is not None:
+            array[z] = source.section(z)
+        else:
+            array[z] = grid.read_matrix((0, 0, z), (nx, ny, 1), (1, 1, 1), None)[0]
+    array.flush()
+    del array
+
+
+def cache_grid(kind: str, grid, provenance: Optional[tuple]) -> dict:
+    """
+    Write the data of a grid as it is shown into the file cache, once per input and grid size, and return a reference
+    to the cached array with the geometry needed to show it again (see ``open_cached_grid``).
+    """
+    from ..util.cache import get_cache
+
+    # Without provenance the grid cannot be recognized again
+    identity = (kind, provenance, tuple(grid.size), tuple(float(s) for s in grid.step))
+    key = hashlib.sha256(repr(identity if provenance is not None else uuid.uuid4()).encode()).hexdigest()
+
+    cache = get_cache()
+    path = cache.lookup(key)
+    if path is None:
+        path = cache.store(key, lambda tmp: _write_sections(tmp, grid))
+
+    return {
+        "cache_key": key,
+        "path": path,
+        "step": _floats(grid.step),
+        "origin": _floats(grid.origin),
+        "pixel_size": _floats(getattr(grid, "pixel_size", None)),
+        "extent": _floats(getattr(grid, "extent", None)),
+    }
+
+
+def open_cached_grid(kind: str, reference: dict, cache_bytes: int):
+    """
+    Open a grid written by ``cache_grid``, memory-mapped, or None if it is no longer cached. Tilt series keep the pixel
+    size and extent of their unbinned sections.
+    """
+    from ..util.cache import get_cache
+
+    path = get_cache().lookup(reference["cache_key"])
+    if path is None and os.path.exists(reference["path"]):
+        path = reference["path"]
+    if path is None:
+        return None
+
+    data = np.load(path, mmap_mode="r")
+
+    if kind == "tiltseries":
+        from .sources import ArraySectionSource
+        from .tiltstack import TiltStackGridData
+
+        source = ArraySectionSource(
+            data,
+            reference["step"],
+            pixel_size=reference["pixel_size"],
+            extent=reference["extent"],
+            origin=reference["origin"],
+        )
+        return TiltStackGridData(source, cache_bytes=cache_bytes)
+
+    from chimerax.map_data import ArrayGridData
+
+    return ArrayGridData(data, origin=reference["origin"], step=reference["step"])
+
+
+def tilt_series_reference(state) -> Optional[dict]:
+    """
+    How the current tilt series is found again: local files shown at full resolution by their path, binned, coarse or
+    remote tilt series by a cached copy of the sections as shown.
+    """
+    loaded = state.loaded
+    stack = state.tilt_stack
+    if stack is None or stack.volume.deleted:
+        return None
+
+    if _is_local_file(loaded.ts_file) and not _downsampled(stack.data):
+        return _file_reference(loaded.ts_file)
+
+    state.session.logger.status("Caching tilt series sections for the session")
+    return cache_grid("tiltseries", stack.data, state.provenance.get("tiltseries"))
+
+
+def volume_reference(state) -> Optional[dict]:
+    """
+    How the current tomogram is found again: local files by their path, OME-Zarr stores by a cached copy of the level
+    shown.
+    """
+    from chimerax.map import Volume
+
+    from .multiscale import is_zarr_path
+
+    loaded = state.loaded
+    volume = state.volume_model
+    if not isinstance(volume, Volume) or volume.deleted:
+        return None
+
+    if _is_local_file(loaded.vol_file) and not is_zarr_path(loaded.vol_file):
+        return _file_reference(loaded.vol_file)
+
+    state.session.logger.status("Caching tomogram for the session")
+    return cache_grid("volume", volume.data, state.provenance.get("volume"))
+
+
+def take_snapshot(state) -> dict:
+    """
+    A compact snapshot of the current alignment: the alignment, its inputs and their provenance, the current section,
+    the settings and references to the tilt series and tomogram data (see ``tilt_series_reference``). Only the version
+    if no alignment is shown.
+    """
+    loaded = state.loaded
+    if loaded is None or state.placements is None:
+        return {"version": SNAPSHOT_VERSION}
+
+    return {
+        "version": SNAPSHOT_VERSION,
+        "alignment": loaded.alignment.model_dump_json(),
+        "vol_file": loaded.vol_file,
+        "ts_file": loaded.ts_file,
+        "x_rotation": float(loaded.x_rotation),
+        "coord_order": [int(i) for i in loaded.coord_order],
+        "current_section": state.current_section,
+        "settings": {name: getattr(state, name) for name in SETTINGS},
+        "provenance": dict(state.provenance),
+        "tiltseries": tilt_series_reference(state),
+        "volume": volume_reference(state),
+    }
+
+
+def _restore_input(session, kind: str, reference: Optional[dict], cache_bytes: int):
+    """The file to open or the opened grid of a saved input reference, (None, None) if it is not available locally."""
+    if reference is None:
+        return None, None
+
+    if "file" in reference:
+        if os.path.exists(reference["file"]):
+            return reference["file"], None
+    else:
+        grid = open_cached_grid(kind, reference, cache_bytes)
+        if grid is not None:
+            return None, grid
+
+    message = "InspectET: the %s saved with the session is no longer available and is not shown." % kind
+    session.logger.warning(message)
+    return None, None
+
+
+def restore_snapshot(session, data: dict):
+    """
+    Show the alignment of a snapshot again. Only local files and cached data are opened, nothing is downloaded or
+    streamed, and full-size tilt series are not read.
+    """
+    from cryoet_alignment.io.cryoet_data_portal import Alignment
+
+    from .alignment import show_section
+    from .loader import LoadedAlignment, LoadedInputs, show_alignment
+    from .provenance import tilt_series_provenance, volume_provenance
+    from .state import get_state
+
+    state = get_state(session)
+    for name, value in data["settings"].items():
+        setattr(state, name, value)
+
+    ts_file, ts_data = _restore_input(session, "tiltseries", data["tiltseries"], state.section_cache_bytes)
+    vol_file, vol_data = _restore_input(session, "volume", data["volume"], state.section_cache_bytes)
+
+    # Inputs that are no longer available are left out, instead of opening them from their original (remote) paths
+    loaded = LoadedAlignment(
+        Alignment.model_validate_json(data["alignment"]),
+        vol_file if vol_data is None else data["vol_file"],
+        ts_file if ts_data is None else data["ts_file"],
+        data["x_rotation"],
+        data["coord_order"],
+    )
+
+    # Cached grids are identified by the inputs they were made from, reopened files by their current version
+    saved = data["provenance"]
+    provenance = {
+        "tiltseries": (
+            saved.get("tiltseries")
+            if ts_data is not None
+            else tilt_series_provenance(ts_file, state.lazy_sections, state.binning, state.max_image_size)
+        ),
+        "volume": saved.get("volume") if vol_data is not None else volume_provenance(vol_file),
+    }
+    show_alignment(session, loaded, LoadedInputs(vol_data=vol_data, ts_data=ts_data, provenance=provenance))
+
+    current = data["current_section"]
+    if current is not None:
+        show_section(session, state.placements.row(current))
@@ -0,0 +1,280 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+from ..util.cancel import check_cancelled
+from ..util.mrc import MrcStack, UnsupportedMrcModeError, is_mrc_path
+from ..util.profiling import profiler
+from .multiscale import OmeZarrMultiscale, is_zarr_path
+
+DEFAULT_SECTION_CACHE_BYTES = 512 * 2**20
+"""Default memory budget for materialized tilt series sections (512 MiB)."""
+
+BINNING_FACTORS = (1, 2, 4, 8)
+"""Binning factors offered for tilt series previews."""
+
+AUTO_BINNING = 0
+"""Binning value that picks the factor from the size of the screen."""
+
+DEFAULT_MAX_IMAGE_SIZE = 2048
+"""Largest edge length (in pixels) of an automatically binned section when the screen size is unknown."""
+
+
+class SectionCache:
+    """
+    Least-recently-used cache of materialized sections, bounded by a memory budget. The most recently used section is
+    always kept, even if it alone exceeds the budget.
+
+    Parameters
+    ----------
+    max_bytes : int
+        The memory budget in bytes.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_SECTION_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._sections = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, z: int) -> bool:
+        return z in self._sections
+
+    def __len__(self) -> int:
+        return len(self._sections)
+
+    def get(self, z: int, materialize: Callable[[int], np.ndarray]) -> np.ndarray:
+        """Return section z, materializing it on a cache miss."""
+        with self._lock:
+            section = self._sections.get(z)
+            if section is not None:
+                self._sections.move_to_end(z)
+                return section
+
+        section = materialize(z)
+        profiler.count("sections read")
+        profiler.count("section bytes read", section.nbytes)
+
+        with self._lock:
+            if z not in self._sections:
+                self._sections[z] = section
+                self.nbytes += section.nbytes
+                self._evict()
+            return self._sections[z]
+
+    def set_max_bytes(self, max_bytes: int):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._sections.clear()
+            self.nbytes = 0
+
+    def _evict(self):
+        while self.nbytes > self.max_bytes and len(self._sections) > 1:
+            _, section = self._sections.popitem(last=False)
+            self.nbytes -= section.nbytes
+
+
+class GridSectionSource:
+    """
+    Reads single sections of a tilt series from a ChimeraX grid, without reading the whole stack.
+
+    Parameters
+    ----------
+    grid : chimerax.map_data.GridData
+        The grid opened from the tilt series file.
+    """
+
+    def __init__(self, grid):
+        self.grid = grid
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        """Stack shape in (z, y, x) order."""
+        nx, ny, nz = self.grid.size
+        return nz, ny, nx
+
+    @property
+    def dtype(self):
+        return np.dtype(self.grid.value_type)
+
+    @property
+    def step(self) -> Tuple[float, float, float]:
+        return tuple(self.grid.step)
+
+    def section(self, z: int) -> np.ndarray:
+        nx, ny, _ = self.grid.size
+        return self.grid.read_matrix((0, 0, z), (nx, ny, 1), (1, 1, 1), None)[0]
+
+
+class ArraySectionSource:
+    """
+    Sections of a tilt series held in memory as one (z, y, x) array.
+
+    Parameters
+    ----------
+    data : np.ndarray
+        The stack, shape (z, y, x).
+    step : tuple of float
+        Voxel size (x, y, z).
+    pixel_size : tuple of float
+        Pixel size (x, y) the alignment shifts refer to. Defaults to the step.
+    extent : tuple of float
+        Physical size (x, y) of a section the images are centered by. Defaults to the size of the data.
+    origin : tuple of float
+        Position (x, y, z) of the first pixel, e.g. of previously binned sections. Defaults to (0, 0, 0).
+    """
+
+    zero_copy = True
+
+    def __init__(self, data: np.ndarray, step: Tuple[float, float, float], pixel_size=None, extent=None, origin=None):
+        self.data = data
+        self.step = tuple(step)
+        self.pixel_size = tuple(pixel_size) if pixel_size is not None else self.step[:2]
+        if extent is not None:
+            self.extent = tuple(extent)
+        if origin is not None:
+            self.origin = tuple(origin)
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        return self.data.shape
+
+    @property
+    def dtype(self):
+        return self.data.dtype
+
+    def section(self, z: int) -> np.ndarray:
+        return self.data[z]
+
+
+def block_mean(section: np.ndarray, factor: int) -> np.ndarray:
+    """
+    Bin a section by averaging blocks of ``factor`` x ``factor`` pixels. Rows and columns that do not fill a whole block
+    are dropped.
+    """
+    ny, nx = section.shape[0] // factor, section.shape[1] // factor
+    blocks = section[: ny * factor, : nx * factor].reshape(ny, factor, nx, factor)
+    return blocks.mean(axis=(1, 3), dtype=np.float32)
+
+
+def auto_binning(shape: Tuple[int, int, int], max_image_size: int = DEFAULT_MAX_IMAGE_SIZE) -> int:
+    """Smallest binning factor at which sections of a (z, y, x) stack fit into ``max_image_size`` pixels."""
+    edge = max(shape[1:])
+    for factor in BINNING_FACTORS:
+        if edge / factor <= max_image_size:
+            return factor
+    return BINNING_FACTORS[-1]
+
+
+class BinnedSectionSource:
+    """
+    Sections of another source, binned by block-mean. The step grows by the binning factor and the origin moves to the
+    center of the first block, so binned pixels cover the same area as the pixels they average. ``pixel_size`` and
+    ``extent`` stay those of the unbinned sections, the alignment shifts and image centering are unchanged.
+
+    Parameters
+    ----------
+    source :
+        The section source to bin.
+    factor : int
+        The binning factor in x and y.
+    """
+
+    def __init__(self, source, factor: int):
+        self.source = source
+        self.factor = factor
+
+        nz, ny, nx = source.shape
+        sx, sy, sz = source.step
+        self.shape = (nz, ny // factor, nx // factor)
+        self.step = (sx * factor, sy * factor, sz)
+        self.origin = ((factor - 1) * sx / 2, (factor - 1) * sy / 2, 0)
+        self.pixel_size = tuple(getattr(source, "pixel_size", (sx, sy)))
+        self.extent = tuple(getattr(source, "extent", (nx * sx, ny * sy)))
+
+    @property
+    def dtype(self):
+        return np.dtype(np.float32)
+
+    def section(self, z: int) -> np.ndarray:
+        return block_mean(self.source.section(z), self.factor)
+
+
+def bin_section_source(source, binning: int, max_image_size: int = DEFAULT_MAX_IMAGE_SIZE):
+    """
+    Bin a section source by ``binning`` (``AUTO_BINNING`` picks the factor from ``max_image_size``). OME-Zarr sources
+    are returned unchanged, their pyramid levels already provide downsampled sections (see ``binned_level``).
+    """
+    from .multiscale import ZarrSectionSource
+
+    if binning == AUTO_BINNING:
+        binning = auto_binning(source.shape, max_image_size)
+
+    if binning <= 1 or isinstance(source, ZarrSectionSource):
+        return source
+
+    return BinnedSectionSource(source, binning)
+
+
+def binned_level(multiscale, binning: int, max_image_size: int = DEFAULT_MAX_IMAGE_SIZE) -> int:
+    """
+    The OME-Zarr pyramid level standing in for binning by ``binning`` (``AUTO_BINNING`` picks the factor from
+    ``max_image_size``): the finest level that keeps every section and is downsampled at least as much in x and y, or
+    the coarsest such level if none is.
+    """
+    if binning == AUTO_BINNING:
+        binning = auto_binning(multiscale.shape(0), max_image_size)
+
+    levels = multiscale.section_levels()
+    finest = multiscale.step(0)[0]
+    for level in levels:
+        # Tolerates rounding of the scales
+        if multiscale.step(level)[0] / finest >= binning * (1 - 1e-6):
+            return level
+    return levels[-1]
+
+
+def open_section_source(path: str):
+    """
+    Open a tilt series for per-section access. Local MRC stacks are memory-mapped, OME-Zarr tilt series are read from
+    their coarsest level that keeps every section, and any other format ChimeraX can read (including MRC modes that
+    cannot be memory-mapped) is accessed through its grid reader.
+    """
+    if is_zarr_path(path):
+        multiscale = OmeZarrMultiscale(path)
+        return multiscale.section_source(multiscale.section_levels()[-1])
+
+    if is_mrc_path(path):
+        try:
+            return MrcStack(path)
+        except UnsupportedMrcModeError:
+            # E.g. complex or 4-bit data, which ChimeraX can read
+            pass
+
+    from chimerax.map_data import open_file
+
+    return GridSectionSource(open_file(path)[0])
+
+
+def read_stack(source, cancelled: Optional[threading.Event] = None) -> np.ndarray:
+    """
+    Return the whole stack of a section source as one (z, y, x) array. With ``cancelled``, it is read section by section
+    and interrupted with ``LoadCancelledError`` once the event is set.
+    """
+    if getattr(source, "zero_copy", False):
+        return source.data
+
+    if isinstance(source, GridSectionSource) and cancelled is None:
+        return source.grid.matrix()
+
+    stack = np.empty(source.shape, dtype=source.dtype)
+    for z in range(source.shape[0]):
+        check_cancelled(cancelled)
+        stack[z] = source.section(z)
+    return stack
@@ -0,0 +1,160 @@
+from chimerax.core.state import StateManager
+
+from .multiscale import DEFAULT_STREAM_BYTES
+from .sources import DEFAULT_MAX_IMAGE_SIZE, DEFAULT_SECTION_CACHE_BYTES
+
+ALIGNMENT_SHOWN = "alignment shown"
+"""Trigger fired with the ``LoadedAlignment`` after its models were built."""
+
+SECTION_SHOWN = "section shown"
+"""Trigger fired with the row in ``per_section_alignment_parameters`` of the section now shown."""
+
+
+class InspectETState(StateManager):
+    """
+    The InspectET state of a session, available as ``session.inspectet``. It does not depend on the tool window, so
+    alignments can be loaded, played and recorded from commands and scripts in sessions without a GUI. The tool
+    listens to its triggers to follow changes made elsewhere.
+
+    Saved sessions hold a compact snapshot of the current alignment instead of its models (see ``core.snapshot``), the
+    models are rebuilt from it once the session is restored.
+
+    Parameters
+    ----------
+    session : chimerax.core.session.Session
+        The ChimeraX session.
+    """
+
+    def __init__(self, session):
+        from chimerax.core.triggerset import TriggerSet
+        from chimerax.geometry import rotation
+
+        self.session = session
+
+        self.triggers = TriggerSet()
+        self.triggers.add_trigger(ALIGNMENT_SHOWN)
+        self.triggers.add_trigger(SECTION_SHOWN)
+
+        self.axes_model = None
+        self.volume_model = None
+        self.raw_tiltseries = None
+        self.aligned_tiltseries = None
+        self.tilt_stack = None
+        self.placements = None
+        self.current_section = None
+        self.current_tilt_angle = None
+
+        # Tilt series sections are read on first display and kept in an LRU cache of this size
+        self.lazy_sections = True
+        self.section_cache_bytes = DEFAULT_SECTION_CACHE_BYTES
+
+        # Tilt series sections are binned by this factor (AUTO_BINNING: fit into max_image_size pixels)
+        self.binning = 1
+        self.max_image_size = DEFAULT_MAX_IMAGE_SIZE
+
+        # Finer OME-Zarr tomogram levels up to this size are streamed into memory in the background
+        self.stream_bytes = DEFAULT_STREAM_BYTES
+        self.streamer = None
+
+        # Running alignment playback
+        self.player = None
+
+        # Other alignments of the current tilt series, shown in sync
+        self.comparisons = []
+
+        # Datasets to step through, the upcoming ones are prepared in the background
+        self.datasets = None
+
+        self.additional_rotation = rotation((1, 0, 0), 0)
+        self.initial_coord_order = [0, 1, 2]
+        self.current_alignment = None
+        self.loaded = None
+        """The ``LoadedAlignment`` of the current alignment."""
+
+        self.provenance = {}
+        """Inputs the current models were built from (see ``core.provenance``), to keep them on reload."""
+
+    def models(self) -> list:
+        """The models of the current and the compared alignments."""
+        models = [self.axes_model, self.volume_model, self.raw_tiltseries, self.aligned_tiltseries]
+        models += [comparison.group for comparison in self.comparisons]
+        return [m for m in models if m is not None and not m.deleted]
+
+    def stop_background_work(self):
+        """Cancel streaming and stop playback."""
+        if self.streamer is not None:
+            self.streamer.cancel()
+            self.streamer = None
+        if self.player is not None:
+            self.player.stop()
+
+    def take_snapshot(self, session, flags):
+        from .snapshot import take_snapshot
+
+        return take_snapshot(self)
+
+    @staticmethod
+    def restore_snapshot(session, data):
+        from chimerax.core.triggerset import DEREGISTER
+
+        from .snapshot import SNAPSHOT_VERSION, restore_snapshot
+
+        state = get_state(session)
+        if not isinstance(data, dict):
+            return state
+        if data.get("version") != SNAPSHOT_VERSION:
+            session.logger.warning("InspectET: the session was saved by an incompatible version and is not restored.")
+            return state
+        if "alignment" not in data:
+            return state
+
+        # Models are built once the rest of the session (view, other models) is in place
+        def restore(*_):
+            restore_snapshot(session, data)
+            return DEREGISTER
+
+        session.triggers.add_handler("end restore session", restore)
+        return state
+
+    def reset_state(self, session):
+        """Forget the current alignment, its models are closed with the session. Settings are kept."""
+        self.stop_background_work()
+        if self.datasets is not None:
+            self.datasets.shutdown()
+        self.axes_model = None
+        self.volume_model = None
+        self.raw_tiltseries = None
+        self.aligned_tiltseries = None
+        self.tilt_stack = None
+        self.placements = None
+        self.current_section = None
+        self.current_tilt_angle = None
+        self.player = None
+        self.comparisons = []
+        self.datasets = None
+        self.current_alignment = None
+        self.loaded = None
+        self.provenance = {}
+
+    def _exclude_models(self, *_):
+        # The models are rebuilt from the snapshot, so ChimeraX does not save them itself
+        for model in self.models():
+            for m in model.all_models():
+                m.SESSION_SAVE = False
+
+
+def get_state(session) -> InspectETState:
+    """The InspectET state of a session, created (and the view set up for inspection) on first use."""
+    state = getattr(session, "inspectet", None)
+    if state is None:
+        from chimerax.core.commands import run
+
+        state = InspectETState(session)
+        session.inspectet = state
+        session.add_state_manager("inspectet", state)
+        session.triggers.add_handler("begin save session", state._exclude_models)
+
+        run(session, "camera ortho")
+        run(session, "lighting depthCue false")
+
+    return state
@@ -0,0 +1,184 @@
+import threading
+from typing import Optional
+
+import numpy as np
+from chimerax.map_data import GridData
+
+from .sources import (
+    DEFAULT_MAX_IMAGE_SIZE,
+    DEFAULT_SECTION_CACHE_BYTES,
+    SectionCache,
+    bin_section_source,
+    open_section_source,
+    read_stack,
+)
+
+
+class TiltStackGridData(GridData):
+    """
+    Grid over a tilt series whose sections are materialized on demand. Sections are read from the source the first time
+    they are needed and kept in an LRU cache bounded by a memory budget.
+
+    Parameters
+    ----------
+    source :
+        Section source providing ``shape`` (z, y, x), ``dtype``, ``step`` and ``section(z)``.
+    cache_bytes : int
+        Memory budget of the section cache in bytes.
+    name : str
+        The grid name.
+    """
+
+    def __init__(self, source, cache_bytes: int = DEFAULT_SECTION_CACHE_BYTES, name: str = "tiltseries"):
+        self.source = source
+        self.sections = SectionCache(cache_bytes)
+
+        nz, ny, nx = source.shape
+        GridData.__init__(
+            self,
+            (nx, ny, nz),
+            value_type=source.dtype,
+            origin=getattr(source, "origin", (0, 0, 0)),
+            step=source.step,
+            name=name,
+        )
+        set_section_geometry(self, source)
+
+    def section(self, z: int) -> np.ndarray:
+        if getattr(self.source, "zero_copy", False):
+            return self.source.section(z)
+
+        return self.sections.get(z, self.source.section)
+
+    def read_matrix(self, ijk_origin, ijk_size, ijk_step, progress):
+        i0, j0, k0 = ijk_origin
+        isz, jsz, ksz = ijk_size
+        istep, jstep, kstep = ijk_step
+
+        planes = [self.section(k)[j0 : j0 + jsz : jstep, i0 : i0 + isz : istep] for k in range(k0, k0 + ksz, kstep)]
+
+        # Single planes are handed out as views into the cached section.
+        if len(planes) == 1:
+            return planes[0][np.newaxis]
+
+        return np.stack(planes)
+
+
+def set_section_geometry(grid, source):
+    """
+    Copy the section geometry of a source onto a grid: the pixel size (x, y) the alignment shifts refer to and the
+    physical size (x, y) of a section the images are centered by. Both differ from the grid's step and size for binned
+    sections and coarse pyramid levels.
+    """
+    nz, ny, nx = source.shape
+    sx, sy, _ = source.step
+    grid.pixel_size = tuple(getattr(source, "pixel_size", (sx, sy)))
+    grid.extent = tuple(getattr(source, "extent", (nx * sx, ny * sy)))
+
+
+def open_tilt_series(
+    path: str,
+    lazy: bool = True,
+    cache_bytes: int = DEFAULT_SECTION_CACHE_BYTES,
+    binning: int = 1,
+    max_image_size: int = DEFAULT_MAX_IMAGE_SIZE,
+    cancelled: Optional[threading.Event] = None,
+) -> GridData:
+    """
+    Open a tilt series as one grid. With ``lazy`` set, sections are only read the first time they are displayed and
+    kept in an LRU cache of at most ``cache_bytes``. Otherwise, the whole stack is read, interrupted with
+    ``LoadCancelledError`` once ``cancelled`` is set. With ``binning`` > 1 sections are binned by block-mean before
+    display, ``AUTO_BINNING`` picks the factor that fits sections into ``max_image_size`` pixels.
+    """
+    source = bin_section_source(open_section_source(path), binning, max_image_size)
+
+    if lazy:
+        return TiltStackGridData(source, cache_bytes=cache_bytes)
+
+    from chimerax.map_data import ArrayGridData
+
+    grid = ArrayGridData(read_stack(source, cancelled), origin=getattr(source, "origin", (0, 0, 0)), step=source.step)
+    set_section_geometry(grid, source)
+    return grid
+
+
+class TiltStack:
+    """
+    A whole tilt series held by a single image volume. Only one section is displayed at a time, by restricting the
+    volume region to that section's plane and moving the model to the section's placement.
+
+    Parameters
+    ----------
+    session : chimerax.core.session.Session
+        The ChimeraX session.
+    grid_data : chimerax.map_data.GridData
+        Grid holding all sections of the tilt series (one section per z-plane).
+    name : str
+        The model name.
+    """
+
+    def __init__(self, session, grid_data, name: str = "aligned tiltseries"):
+        from chimerax.map import volume_from_grid_data
+
+        self.session = session
+        self.volume = volume_from_grid_data(grid_data, session, style="image", open_model=False, show_dialog=False)
+        self.volume.name = name
+        self.volume.display = False
+
+        self.section: Optional[int] = None
+        """The section plane currently shown."""
+
+        self.set_section(0)
+
+    @property
+    def data(self):
+        return self.volume.data
+
+    @property
+    def num_sections(self) -> int:
+        return self.volume.data.size[2]
+
+    def image_size(self, thickness: float = 0):
+        """Physical size of one section (x, y) and the given thickness (z)."""
+        data = self.volume.data
+        extent = getattr(data, "extent", None)
+        if extent is None:
+            extent = data.size[0] * data.step[0], data.size[1] * data.step[1]
+        return extent[0], extent[1], thickness
+
+    def plane_offset(self, z: int) -> float:
+        """Z-coordinate of the plane of section z in the volume's coordinate system."""
+        return z * self.volume.data.step[2]
+
+    def set_section(self, z: int):
+        """Restrict the displayed region to the plane of section z."""
+        if z == self.section:
+            return
+
+        nx, ny, _ = self.volume.data.size
+        self.volume.new_region((0, 0, z), (nx - 1, ny - 1, z))
+        self.section = z
+
+    def replace_data(self, grid_data):
+        """
+        Show a new grid (e.g. a finer resolution level) in place of the current one. Returns the previous volume, which
+        the caller deletes once the new one is added to the session.
+        """
+        from chimerax.map import volume_from_grid_data
+
+        old = self.volume
+        self.volume = volume_from_grid_data(grid_data, self.session, style="image", open_model=False, show_dialog=False)
+        self.volume.name = old.name
+        self.volume.position = old.position
+        self.volume.display = old.display
+
+        section, self.section = self.section, None
+        self.set_section(0 if section is None else section)
+
+        return old
+
+    def show_section(self, z: int, position):
+        """Show section z at the given placement."""
+        self.set_section(z)
+        self.volume.position = position
+        self.volume.display = True
@@ -12,14 +12,15 @@ from Qt.QtWidgets import (
     QVBoxLayout,
 )
 
+from .core.state import get_state
 from .ui.main_widget import MainWidget
 
 
 class InspectETTool(ToolInstance):
     # Does this instance persist when session closes
     SESSION_ENDURING = False
-    # We do save/restore in sessions
-    SESSION_SAVE = False
+    # We do save/restore in sessions, the alignment is saved by the InspectET state (see core/snapshot.py)
+    SESSION_SAVE = True
     # Let ChimeraX know about our help page
     # help = "help:user/tools/artiax.html"
 
@@ -37,8 +38,8 @@ class InspectETTool(ToolInstance):
         # Display Name
         self.display_name = "InspectET"
 
-        # Store self in session
-        session.inspectet = self
+        # Alignment state, shared with commands
+        self.state = get_state(session)
 
         # Set the font
         if platform == "darwin":
@@ -50,21 +51,19 @@ class InspectETTool(ToolInstance):
         self.tool_window = MainToolWindow(self, close_destroys=True)
         self._build_ui()
 
-        self.axes_model = None
-        self.volume_model = None
-        self.raw_tiltseries = None
-        self.aligned_tiltseries = None
+    def delete(self):
+        self.state.stop_background_work()
+        self._mw.shutdown()
+        super().delete()
 
-        from chimerax.geometry import rotation
+    def take_snapshot(self, session, flags):
+        return {"version": 1, "ToolInstance": ToolInstance.take_snapshot(self, session, flags)}
 
-        self.additional_rotation = rotation((1, 0, 0), 0)
-        self.initial_coord_order = [0, 1, 2]
-        self.current_alignment = None
-
-        from chimerax.core.commands import run
-
-        run(session, "camera ortho")
-        run(session, "lighting depthCue false")
+    @classmethod
+    def restore_snapshot(cls, session, data):
+        inst = cls(session, "InspectET")
+        ToolInstance.set_state_from_snapshot(inst, session, data["ToolInstance"])
+        return inst
 
     def _build_ui(self):
         tw = self.tool_window
@@ -1,90 +1,146 @@
-from typing import Callable, Tuple, Type, Union
-
-from cryoet_alignment.io.cryoet_data_portal.alignment import Alignment, PerSectionAlignmentParameters
-
-class TableParams:
-    CopickClass = None
-
-    def __init__(self, params: PerSectionAlignmentParameters, parent: "EntityTableRoot"):
-        self.params = params
-        self.parent = parent
-        self.is_active = False
-        self.has_children = False
-
-    def child(self, row) -> None:
-        return None
-
-    def childCount(self) -> int:
-        return 0
-
-    def childIndex(self) -> Union[int, None]:
-        return self.parent.psaps.index(self.params)
-
-    def data(self, column: int) -> str:
-        if column == 0:
-            return self.params.z_index
-        elif column == 1:
-            return f"{self.params.tilt_angle:.2f}"
-        elif column == 2:
-            return f"{self.params.tilt_axis_rotation:.2f}"
-        elif column == 3:
-            return f"{self.params.x_offset:.2f}"
-        elif column == 4:
-            return f"{self.params.y_offset:.2f}"
-        elif column == 5:
-            return f"{self.params.volume_x_rotation:.2f}"
-
-
-    # def color(self) -> Tuple[int, ...]:
-    #     return tuple(self.entity.color)
-
-    def columnCount(self) -> int:
-        return 6
-
-
-class AlignmentTableRoot:
-    def __init__(self, alignment: Alignment):
-        self.alignment = alignment
-        self.psaps = alignment.per_section_alignment_parameters
-        self._children = None
-        self.parent = None
-        self.is_active = False
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from ..core.sections import section_table
+
+COLUMNS = (
+    ("Z", "z_index", "%d"),
+    ("TLT", "tilt_angle", "%.2f"),
+    ("ROT", "tilt_axis_rotation", "%.2f"),
+    ("TX", "x_offset", "%.2f"),
+    ("TY", "y_offset", "%.2f"),
+    ("ROTX", "volume_x_rotation", "%.2f"),
+    ("COV", "coverage", "%.2f"),
+    ("OUT", "out_of_frame", "%.0f"),
+)
+"""Header, parameter and display format of each table column."""
+
+FOOTPRINT_COLUMNS = ("coverage", "out_of_frame")
+"""Columns from the volume footprint (see ``core.footprint``)."""
+
+TOOLTIPS = {
+    "coverage": "Fraction of the volume that projects into the tilt image",
+    "out_of_frame": "Corners of the volume that project outside the tilt image",
+}
+
+
+class AlignmentColumns:
+    """
+    The rows of the alignment table as one array per column, in the row order of ``per_section_alignment_parameters``
+    (source rows). The table shows them in view order, after sorting and filtering. Source and view rows are mapped onto
+    each other in O(1), and display strings are formatted once per column, the first time the column is shown.
+
+    Parameters
+    ----------
+    arrays : dict
+        One array per parameter of ``COLUMNS``, all of the same length.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.arrays = {key: np.array(arrays[key]) for _, key, _ in COLUMNS}
+        self._strings: List[Optional[List[str]]] = [None] * len(COLUMNS)
+
+        self.sort_column: Optional[int] = None
+        self.sort_descending = False
+        self.filter_text = ""
+        self.filter_column: Optional[int] = None
+
+        self._order = np.arange(self.source_count)
+        """Source row of each view row."""
+        self._view_rows = np.arange(self.source_count)
+        """View row of each source row, -1 if filtered out."""
+
+    @classmethod
+    def from_alignment(cls, alignment, footprint=None) -> "AlignmentColumns":
+        """The columns of an alignment. Without a ``VolumeFootprint``, the footprint columns are empty (nan)."""
+        arrays = dict(section_table(alignment).columns())
+        if footprint is not None:
+            arrays["coverage"] = footprint.coverage
+            arrays["out_of_frame"] = footprint.out_of_frame.astype(np.float64)
+        else:
+            for key in FOOTPRINT_COLUMNS:
+                arrays[key] = np.full(len(arrays["z_index"]), np.nan)
+        return cls(arrays)
+
+    def __len__(self) -> int:
+        return len(self._order)
 
     @property
-    def children(self):
-        if self._children is None:
-            self._children = [TableParams(psap, self) for psap in self.psaps]
-
-        return self._children
-
-    def child(self, row) -> TableParams:
-        return self.children[row]
-
-    def childCount(self) -> int:
-        return len(self.children)
-
-    def childIndex(self) -> Union[int, None]:
-        return None
-
-    def data(self, column: int) -> str:
-        if column == 0:
-            return "Z"
-        elif column == 1:
-            return "TLT"
-        elif column == 2:
-            return "ROT"
-        elif column == 3:
-            return "TX"
-        elif column == 4:
-            return "TY"
-        elif column == 5:
-            return "ROTX"
-
-    def columnCount(self) -> int:
-        return 6
-
-    def get_item(self, params: PerSectionAlignmentParameters) -> Union[None, TableParams]:
-        for child in self.children:
-            if child.params == params:
-                return child
-        return None
+    def source_count(self) -> int:
+        return len(self.arrays["z_index"])
+
+    def source_row(self, view_row: int) -> int:
+        return int(self._order[view_row])
+
+    def view_row(self, source_row: int) -> int:
+        """View row of a source row, -1 if it is filtered out."""
+        return int(self._view_rows[source_row])
+
+    def text(self, view_row: int, column: int) -> str:
+        strings = self._strings[column]
+        if strings is None:
+            strings = self._format(column)
+        return strings[self._order[view_row]]
+
+    def value(self, view_row: int, column: int):
+        return self.arrays[COLUMNS[column][1]][self._order[view_row]]
+
+    def set_values(self, column: int, source_rows: Sequence[int], values: Sequence[float]) -> np.ndarray:
+        """
+        Change the values of a column in some source rows. Only the display strings of those cells are formatted again,
+        the view order is kept until the next sort or filter.
+
+        Returns
+        -------
+        np.ndarray
+            The view rows of the changed cells that are not filtered out.
+        """
+        _, key, fmt = COLUMNS[column]
+        source_rows = np.asarray(source_rows, dtype=np.int64)
+        self.arrays[key][source_rows] = values
+
+        strings = self._strings[column]
+        if strings is not None:
+            for row, value in zip(source_rows.tolist(), self.arrays[key][source_rows].tolist(), strict=True):
+                strings[row] = fmt % value
+
+        view_rows = self._view_rows[source_rows]
+        return view_rows[view_rows >= 0]
+
+    def sort(self, column: Optional[int], descending: bool = False):
+        """Sort the view by a column, or show source order if column is None."""
+        self.sort_column = column
+        self.sort_descending = descending
+        self._update_order()
+
+    def set_filter(self, text: str, column: Optional[int] = None):
+        """Only show rows where the column (or any column if None) contains text, as displayed."""
+        self.filter_text = text
+        self.filter_column = column
+        self._update_order()
+
+    def _format(self, column: int) -> List[str]:
+        _, key, fmt = COLUMNS[column]
+        strings = np.char.mod(fmt, self.arrays[key]).tolist()
+        self._strings[column] = strings
+        return strings
+
+    def _update_order(self):
+        rows = np.arange(self.source_count)
+
+        if self.filter_text:
+            columns = range(len(COLUMNS)) if self.filter_column is None else [self.filter_column]
+            mask = np.zeros(self.source_count, dtype=bool)
+            for column in columns:
+                strings = self._strings[column] or self._format(column)
+                mask |= np.char.find(np.array(strings), self.filter_text) >= 0
+            rows = rows[mask]
+
+        if self.sort_column is not None:
+            keys = self.arrays[COLUMNS[self.sort_column][1]][rows]
+            rows = rows[np.argsort(-keys if self.sort_descending else keys, kind="stable")]
+
+        self._order = rows
+        self._view_rows = np.full(self.source_count, -1, dtype=np.int64)
+        self._view_rows[rows] = np.arange(len(rows))
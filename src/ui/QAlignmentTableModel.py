@@ -1,104 +1,113 @@
-from pathlib import Path
-from typing import Any, Literal, Union
+from typing import Any, Optional, Sequence
 
-from qtpy.QtCore import QAbstractItemModel, QModelIndex, Qt
-from qtpy.QtGui import QColor, QIcon
-from qtpy.QtWidgets import QFileIconProvider
+import numpy as np
+from qtpy.QtCore import QAbstractTableModel, QModelIndex, Qt
 
 from cryoet_alignment.io.cryoet_data_portal.alignment import Alignment
-from .AlignmentTable import AlignmentTableRoot, TableParams
+from .AlignmentTable import COLUMNS, TOOLTIPS, AlignmentColumns
+
+
+class QAlignmentTableModel(QAbstractTableModel):
+    """
+    Table of the per-section parameters of an alignment and, given its ``VolumeFootprint``, the volume coverage of
+    every section, backed by ``AlignmentColumns``. Lookups are O(1) and changed cells are announced one by one, so large
+    tables stay responsive. Rows can be sorted and filtered by column.
+    """
 
-class QAlignmentTableModel(QAbstractItemModel):
     def __init__(
         self,
         alignment: Alignment,
+        footprint=None,
         parent=None,
     ):
         super().__init__(parent)
-        self._icon_provider = QFileIconProvider()
-        icons = Path(__file__).parent.parent / "icons"
-        self._icon_eye_closed = QIcon(str(icons / "eye_closed.png"))
-        self._icon_eye_open = QIcon(str(icons / "eye_open.png"))
-
-        self._root = AlignmentTableRoot(alignment=alignment)
-
-    def index(self, row: int, column: int, parent=QModelIndex()) -> Union[QModelIndex, None]:
-        if not self.hasIndex(row, column, parent):
-            return None
-
-        parentItem = self._root if not parent.isValid() else parent.internalPointer()
-        childItem = parentItem.child(row)
-
-        if childItem:
-            return self.createIndex(row, column, childItem)
-        else:
-            return None
-
-    def item_index(self, item: TableParams) -> QModelIndex:
-        childItem = item
-        parentItem = childItem.parent
-
-        if parentItem != self._root:
-            return self.createIndex(parentItem.childIndex(), 0, parentItem)
-        else:
-            return QModelIndex()
-
-    def parent(self, index: QModelIndex) -> Union[QModelIndex, None]:
-        if not index.isValid():
-            return None
-
-        childItem = index.internalPointer()
-        parentItem = childItem.parent
-
-        if parentItem != self._root:
-            return self.createIndex(parentItem.childIndex(), 0, parentItem)
-        else:
-            return QModelIndex()
+        self.alignment = alignment
+        self.columns = AlignmentColumns.from_alignment(alignment, footprint)
 
     def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
-        parentItem = self._root if not parent.isValid() else parent.internalPointer()
-
-        return parentItem.childCount()
+        return 0 if parent.isValid() else len(self.columns)
 
-    def columnCount(self, parent: QModelIndex = QModelIndex()):
-        return self._root.columnCount()
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(COLUMNS)
 
-    def data(self, index: QModelIndex, role: int = ...) -> Any:
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
         if not index.isValid():
             return None
 
-        item = index.internalPointer()
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self.columns.text(index.row(), index.column())
+        elif role == Qt.ItemDataRole.TextAlignmentRole:
+            return int(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
 
-        if role == 0:
-            return item.data(index.column())
+        return None
 
-    def hasChildren(self, parent: QModelIndex = ...) -> bool:
-        parentItem = self._root if not parent.isValid() else parent.internalPointer()
-
-        return parentItem.has_children  # parentItem.is_dir
-
-    def headerData(self, section, orientation, role=...):
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
         if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
-            if section == 0:
-                return "Z"
-            elif section == 1:
-                return "TLT"
-            elif section == 2:
-                return "ROT"
-            elif section == 3:
-                return "TX"
-            elif section == 4:
-                return "TY"
-            elif section == 5:
-                return "ROTX"
-
-    def flags(self, index: QModelIndex) -> Union[Qt.ItemFlag, None]:
-        if not index.isValid():
-            return None
+            return COLUMNS[section][0]
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.ToolTipRole:
+            return TOOLTIPS.get(COLUMNS[section][1])
 
-        index.internalPointer()
+    def flags(self, index: QModelIndex) -> Qt.ItemFlag:
         return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
 
-    def update_all(self):
+    def sort(self, column: int, order: Qt.SortOrder = Qt.SortOrder.AscendingOrder):
+        # Column -1 restores the order of the alignment
+        descending = order == Qt.SortOrder.DescendingOrder
+        self._change_layout(lambda: self.columns.sort(column if column >= 0 else None, descending))
+
+    def set_filter(self, text: str, column: Optional[int] = None):
+        """Only show rows where the column (or any column if None) contains text."""
+        self.beginResetModel()
+        self.columns.set_filter(text, column)
+        self.endResetModel()
+
+    def source_row(self, index: QModelIndex) -> int:
+        """Row of an index in ``per_section_alignment_parameters``."""
+        return self.columns.source_row(index.row())
+
+    def source_index(self, row: int, column: int = 0) -> QModelIndex:
+        """Index of a row of ``per_section_alignment_parameters``, invalid if it is filtered out."""
+        view_row = self.columns.view_row(row)
+        return self.index(view_row, column) if view_row >= 0 else QModelIndex()
+
+    def set_values(self, column: int, rows: Sequence[int], values: Sequence[float]):
+        """Change a column in some rows of ``per_section_alignment_parameters``, only these cells are updated."""
+        view_rows = np.sort(self.columns.set_values(column, rows, values))
+
+        # Consecutive rows are announced together
+        for run in np.split(view_rows, np.flatnonzero(np.diff(view_rows) != 1) + 1):
+            if len(run):
+                self.dataChanged.emit(
+                    self.index(int(run[0]), column),
+                    self.index(int(run[-1]), column),
+                    [Qt.ItemDataRole.DisplayRole],
+                )
+
+    def update_alignment(self, alignment: Alignment, footprint=None) -> bool:
+        """
+        Show another alignment of the same sections, e.g. a reloaded one, updating only the cells that changed. Returns
+        False, leaving the table unchanged, if the sections differ.
+        """
+        columns = AlignmentColumns.from_alignment(alignment, footprint)
+        if not np.array_equal(columns.arrays["z_index"], self.columns.arrays["z_index"]):
+            return False
+
+        self.alignment = alignment
+        for column, (_, key, _) in enumerate(COLUMNS):
+            old, new = self.columns.arrays[key], columns.arrays[key]
+            changed = np.flatnonzero((old != new) & ~(np.isnan(old) & np.isnan(new)))
+            if len(changed):
+                self.set_values(column, changed, new[changed])
+
+        return True
+
+    def _change_layout(self, change):
+        self.layoutAboutToBeChanged.emit()
+
+        # Selection and current index follow their rows
+        persistent = self.persistentIndexList()
+        rows = [(self.source_row(i), i.column()) for i in persistent]
+        change()
+        self.changePersistentIndexList(persistent, [self.source_index(row, column) for row, column in rows])
+
         self.layoutChanged.emit()
-        self.dataChanged.emit(self.index(0, 0), self.index(self.rowCount() - 1, self.columnCount() - 1))
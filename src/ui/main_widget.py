@@ -1,4 +1,6 @@
 import os.path
+import threading
+import traceback
 
 from PyQt6.QtWidgets import QCheckBox
 from Qt.QtCore import Qt, QObject, QModelIndex, Signal
@@ -16,27 +18,38 @@ from Qt.QtWidgets import (
     QTableView,
     QHeaderView,
     QGridLayout,
+    QProgressBar,
 )
+from qt_async_threads import QtAsyncRunner
 
 from typing import Dict, Optional, List
 
 from chimerax.core.errors import UserError
-from cryoet_alignment.io.imod import ImodAlignment
-from cryoet_alignment.io.cryoet_data_portal import Alignment
-from cryoet_alignment.io.aretomo3 import AreTomo3ALN
 
+from .AlignmentTable import COLUMNS
 from .QAlignmentTableModel import QAlignmentTableModel
-from ..core.alignment import create_alignment_objects
-from ..core.alignment import apply_alignment
+from ..core.alignment import show_section
+from ..core.compare import add_comparison
+from ..core.datasets import queue_datasets, show_dataset
+from ..core.loader import (
+    LoadCancelledError,
+    LoadRequest,
+    comparison_request,
+    fetch_remote_inputs,
+    open_inputs,
+    read_alignment,
+    show_alignment,
+)
+from ..core.sources import AUTO_BINNING, BINNING_FACTORS
+from ..core.state import ALIGNMENT_SHOWN, SECTION_SHOWN, get_state
 from .LabelEditSlider import LabelEditSlider
-from ..util.s3 import imod_from_s3, aretomo3_from_s3, cdp_from_s3
 
 PATH_PLACEHOLDER = "Path / S3 URI"
 BASENAME_PLACEHOLDER = "Basename / S3 URI Basename"
+OPTIONAL_PATH_PLACEHOLDER = "Path / S3 URI / OME-Zarr [Optional]"
 
 
 class MainWidget(QWidget):
-
     def __init__(
         self,
         session,
@@ -46,11 +59,21 @@ class MainWidget(QWidget):
 
         self.session = session
 
+        # Loads run in worker threads, results are handed back to the GUI thread
+        self._runner = QtAsyncRunner(max_threads=2)
+        self._cancelled = threading.Event()
+
         self._build()
         self._connect()
 
-    def _build(self):
+        # Follow alignments and sections shown by commands and scripts
+        state = get_state(session)
+        self._trigger_handlers = [
+            state.triggers.add_handler(ALIGNMENT_SHOWN, self._alignment_shown),
+            state.triggers.add_handler(SECTION_SHOWN, self._section_shown),
+        ]
 
+    def _build(self):
         self._input_group = QGroupBox("Input")
         self._input_layout = QVBoxLayout()
 
@@ -96,7 +119,7 @@ class MainWidget(QWidget):
         # Input tilt series
         self._input_ts_label = QLabel("Tilt Series:")
         self._input_ts_edit = QLineEdit()
-        self._input_ts_edit.setPlaceholderText("Path [Optional]")
+        self._input_ts_edit.setPlaceholderText(OPTIONAL_PATH_PLACEHOLDER)
         self._input_ts_edit.setEnabled(False)
 
         self._inputs_layout.addWidget(self._input_ts_label, 3, 0, 1, 1, Qt.AlignmentFlag.AlignLeft)
@@ -105,24 +128,75 @@ class MainWidget(QWidget):
         # Input volume
         self._input_vol_label = QLabel("Volume:")
         self._input_vol_edit = QLineEdit()
-        self._input_vol_edit.setPlaceholderText("Path [Optional]")
+        self._input_vol_edit.setPlaceholderText(OPTIONAL_PATH_PLACEHOLDER)
         self._input_vol_edit.setEnabled(False)
 
         self._inputs_layout.addWidget(self._input_vol_label, 4, 0, 1, 2, Qt.AlignmentFlag.AlignLeft)
         self._inputs_layout.addWidget(self._input_vol_edit, 4, 1, 1, 3)
 
+        # Tilt series binning
+        self._input_bin_label = QLabel("Binning:")
+        self._input_bin_combo = QComboBox()
+        for factor in BINNING_FACTORS:
+            self._input_bin_combo.addItem(f"{factor}×", factor)
+        self._input_bin_combo.addItem("Auto", AUTO_BINNING)
+        self._input_bin_combo.setToolTip("Bin tilt series sections for display. Auto fits them to the screen size.")
+
+        self._inputs_layout.addWidget(self._input_bin_label, 5, 0, 1, 1, Qt.AlignmentFlag.AlignLeft)
+        self._inputs_layout.addWidget(self._input_bin_combo, 5, 1, 1, 3)
+
         # Load button
         self._load_button = QPushButton("Load")
         self._input_layout.addWidget(
             self._load_button,
         )
 
-        self._inputs_layout.addWidget(self._load_button, 5, 0, 1, 4, Qt.AlignmentFlag.AlignCenter)
+        self._compare_button = QPushButton("Compare")
+        self._compare_button.setToolTip(
+            "Show this alignment next to the loaded one, sharing its tilt series and volume.",
+        )
+
+        self._inputs_layout.addWidget(self._load_button, 6, 0, 1, 2, Qt.AlignmentFlag.AlignCenter)
+        self._inputs_layout.addWidget(self._compare_button, 6, 2, 1, 2, Qt.AlignmentFlag.AlignCenter)
+
+        # Load progress
+        self._progress_label = QLabel("")
+        self._progress_bar = QProgressBar()
+        self._progress_bar.setRange(0, 4)
+        self._progress_bar.setValue(0)
+        self._cancel_button = QPushButton("Cancel")
+        self._cancel_button.setEnabled(False)
+
+        self._inputs_layout.addWidget(self._progress_label, 7, 0, 1, 1, Qt.AlignmentFlag.AlignLeft)
+        self._inputs_layout.addWidget(self._progress_bar, 7, 1, 1, 2)
+        self._inputs_layout.addWidget(self._cancel_button, 7, 3, 1, 1)
 
         # Set final layout
         self._input_group.setLayout(self._inputs_layout)
         self._input_group.setSizePolicy(QSizePolicy(QSizePolicy.Policy.Maximum, QSizePolicy.Policy.Maximum))
 
+        # Dataset queue
+        self._datasets_group = QGroupBox("Datasets")
+        self._datasets_layout = QGridLayout()
+
+        self._datasets_edit = QLineEdit()
+        self._datasets_edit.setPlaceholderText("Directory / Run List")
+        self._datasets_button = QPushButton("Queue")
+        self._previous_button = QPushButton("◀")
+        self._next_button = QPushButton("▶")
+        self._datasets_label = QLabel("")
+        self._previous_button.setEnabled(False)
+        self._next_button.setEnabled(False)
+
+        self._datasets_layout.addWidget(self._datasets_edit, 0, 0, 1, 3)
+        self._datasets_layout.addWidget(self._datasets_button, 0, 3, 1, 1)
+        self._datasets_layout.addWidget(self._previous_button, 1, 0, 1, 1)
+        self._datasets_layout.addWidget(self._datasets_label, 1, 1, 1, 2, Qt.AlignmentFlag.AlignCenter)
+        self._datasets_layout.addWidget(self._next_button, 1, 3, 1, 1)
+
+        self._datasets_group.setLayout(self._datasets_layout)
+        self._datasets_group.setSizePolicy(QSizePolicy(QSizePolicy.Policy.Maximum, QSizePolicy.Policy.Maximum))
+
         # Alignment Table
         self._alignment_group = QGroupBox("Alignment")
         self.ali_table = QTableView()
@@ -133,7 +207,21 @@ class MainWidget(QWidget):
         self.ali_table.setSelectionMode(QTableView.SelectionMode.SingleSelection)
         header = self.ali_table.horizontalHeader()
         header.setSectionResizeMode(QHeaderView.ResizeToContents)
+        # Sections stay in alignment order until a header is clicked
+        header.setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
+        self.ali_table.setSortingEnabled(True)
+
+        self._filter_layout = QHBoxLayout()
+        self._filter_edit = QLineEdit()
+        self._filter_edit.setPlaceholderText("Filter")
+        self._filter_edit.setClearButtonEnabled(True)
+        self._filter_column_combo = QComboBox()
+        self._filter_column_combo.addItems(["All"] + [name for name, _, _ in COLUMNS])
+        self._filter_layout.addWidget(self._filter_edit)
+        self._filter_layout.addWidget(self._filter_column_combo)
+
         self._ali_layout = QVBoxLayout()
+        self._ali_layout.addLayout(self._filter_layout)
         self._ali_layout.addWidget(self.ali_table)
 
         self._slide_layout = QHBoxLayout()
@@ -148,12 +236,20 @@ class MainWidget(QWidget):
         # Main layout
         self._layout = QVBoxLayout()
         self._layout.addWidget(self._input_group)
+        self._layout.addWidget(self._datasets_group)
         self._layout.addWidget(self._alignment_group)
         self.setLayout(self._layout)
 
     def _connect(self):
-        self._load_button.clicked.connect(self._load_alignment)
+        self._load_button.clicked.connect(self._runner.to_sync(self._load_alignment))
+        self._compare_button.clicked.connect(self._runner.to_sync(self._compare_alignment))
+        self._datasets_button.clicked.connect(self._runner.to_sync(self._queue_datasets))
+        self._previous_button.clicked.connect(self._runner.to_sync(self._previous_dataset))
+        self._next_button.clicked.connect(self._runner.to_sync(self._next_dataset))
+        self._cancel_button.clicked.connect(self._cancel_load)
         self.ali_table.clicked.connect(self._apply_alignment)
+        self._filter_edit.textChanged.connect(self._filter_changed)
+        self._filter_column_combo.currentIndexChanged.connect(self._filter_changed)
         self._slider.valueChanged.connect(self._apply_alignment_int)
         self._input_ali_combo.currentIndexChanged.connect(self._ali_type_changed)
         self._vol_dim_check.stateChanged.connect(self._input_type_changed)
@@ -162,8 +258,22 @@ class MainWidget(QWidget):
     def _play(self):
         from chimerax.core.commands import run
 
+        player = self.session.inspectet.player
+        if player is not None and player.active:
+            run(self.session, "inspectet resume" if player.paused else "inspectet pause")
+            return
+
         run(self.session, "inspectet play framesPerView 10 loopNumber 1")
 
+        player = self.session.inspectet.player
+        if player is not None:
+            player.add_listener(self._playback_changed)
+            self._playback_changed(player)
+
+    def _playback_changed(self, player):
+        playing = player.active and not player.paused
+        self._play_button.setText("⏸" if playing else "▶")
+
     def _update_ui(self, checkbox: bool = True):
         enable_paths = True
 
@@ -200,8 +310,8 @@ class MainWidget(QWidget):
             self._input_ts_edit.setEnabled(True)
             self._input_vol_edit.setText("")
             self._input_ts_edit.setText("")
-            self._input_vol_edit.setPlaceholderText("Path [Optional]")
-            self._input_ts_edit.setPlaceholderText("Path [Optional]")
+            self._input_vol_edit.setPlaceholderText(OPTIONAL_PATH_PLACEHOLDER)
+            self._input_ts_edit.setPlaceholderText(OPTIONAL_PATH_PLACEHOLDER)
         else:
             self._input_vol_edit.setText("")
             self._input_ts_edit.setText("")
@@ -220,21 +330,24 @@ class MainWidget(QWidget):
         else:
             self._update_ui(False)
 
-    def _load_alignment(self):
+    def _vol_size(self):
+        if not self._vol_dim_check.isChecked():
+            return None
+
+        return (
+            float(self._input_vol_dim_x.text()),
+            float(self._input_vol_dim_y.text()),
+            float(self._input_vol_dim_z.text()),
+        )
+
+    def _load_request(self) -> Optional[LoadRequest]:
         file = self._input_ali_file_edit.text()
 
         if not file:
-            return
+            return None
 
         # Vol Dim
-        if self._vol_dim_check.isChecked():
-            vol_x = float(self._input_vol_dim_x.text())
-            vol_y = float(self._input_vol_dim_y.text())
-            vol_z = float(self._input_vol_dim_z.text())
-        else:
-            vol_x = None
-            vol_y = None
-            vol_z = None
+        vol_size = self._vol_size()
 
         # Vol File
         vol_file = self._input_vol_edit.text()
@@ -246,78 +359,227 @@ class MainWidget(QWidget):
         if ts_file == "":
             ts_file = None
 
-        # Load alignment file
-        type = self._input_ali_combo.currentText()
-        if type == "CryoET Data Portal":
-
-            if "s3://" in file:
-                ali = cdp_from_s3(file)
-            else:
-                ali = Alignment.from_file(file)
+        return LoadRequest(self._input_ali_combo.currentText(), file, vol_size, vol_file, ts_file)
 
-            from chimerax.geometry import rotation
+    async def _load_alignment(self):
+        request = self._load_request()
 
-            self.session.inspectet.additional_rotation = rotation((1, 0, 0), 0)
-            self.session.inspectet.initial_coord_order = [0, 1, 2]
-            self.session.inspectet.current_alignment = ali
-
-        elif type == "IMOD":
-            # imod_ali = ImodAlignment.read(base_name=file)
-            if "s3://" in file:
-                imod_ali = imod_from_s3(file)
-                if vol_x is not None:
-                    ali = Alignment.from_imod(imod_ali, vol_size=(vol_x, vol_y, vol_z))
-                else:
-                    ali = Alignment.from_imod(imod_ali)
-            else:
-                ali = Alignment.from_imod_basename(file)
-
-            if os.path.exists(f"{file}_full_rec.mrc"):
-                vol_file = f"{file}_full_rec.mrc"
+        if request is None:
+            return
 
-            if vol_file is None and vol_x is None:
-                raise UserError("No *_full_rec.mrc found at IMOD basename and no vol dims provided.")
+        state = self.session.inspectet
+        state.binning = self._input_bin_combo.currentData()
+        state.max_image_size = self._screen_pixels()
+        self._cancelled.clear()
+        self._set_loading(True)
+
+        try:
+            # Downloads, parsing and file opening happen in worker threads
+            self._set_progress(0, "Fetching remote files ...")
+            request = await self._runner.run(fetch_remote_inputs, request, self._cancelled)
+            self._check_cancelled()
+
+            self._set_progress(1, "Reading alignment ...")
+            loaded = await self._runner.run(read_alignment, request)
+            self._check_cancelled()
+
+            self._set_progress(2, "Opening volume and tilt series ...")
+            inputs = await self._runner.run(
+                open_inputs,
+                loaded,
+                state.lazy_sections,
+                state.section_cache_bytes,
+                state.binning,
+                state.max_image_size,
+                dict(state.provenance),
+                self._cancelled,
+            )
+            self._check_cancelled()
+
+            # Model hand-off on the GUI thread, the table follows through the alignment shown trigger
+            self._set_progress(3, "Building models ...")
+            show_alignment(self.session, loaded, inputs)
+            self._set_progress(4, "Done.")
+        except LoadCancelledError:
+            self._set_progress(0, "Cancelled.")
+        except UserError as e:
+            self._set_progress(0, "Failed.")
+            self.session.logger.error(str(e))
+        except Exception:
+            self._set_progress(0, "Failed.")
+            self.session.logger.error(traceback.format_exc())
+        finally:
+            self._set_loading(False)
+
+    def _screen_pixels(self) -> int:
+        """Longer edge of the screen showing the tool, in device pixels."""
+        screen = self.screen()
+        size = screen.size()
+        return int(max(size.width(), size.height()) * screen.devicePixelRatio())
+
+    async def _compare_alignment(self):
+        request = self._load_request()
+
+        if request is None:
+            return
 
-            if os.path.exists(f"{file}.mrc"):
-                ts_file = f"{file}.mrc"
+        self._cancelled.clear()
+        self._set_loading(True)
+
+        try:
+            request = comparison_request(self.session, request)
+
+            self._set_progress(0, "Fetching remote files ...")
+            request = await self._runner.run(fetch_remote_inputs, request, self._cancelled)
+            self._check_cancelled()
+
+            self._set_progress(2, "Reading alignment ...")
+            loaded = await self._runner.run(read_alignment, request)
+            self._check_cancelled()
+
+            self._set_progress(3, "Building models ...")
+            add_comparison(self.session, loaded, os.path.basename(request.path.rstrip("/")))
+            self._set_progress(4, "Done.")
+        except LoadCancelledError:
+            self._set_progress(0, "Cancelled.")
+        except UserError as e:
+            self._set_progress(0, "Failed.")
+            self.session.logger.error(str(e))
+        except Exception:
+            self._set_progress(0, "Failed.")
+            self.session.logger.error(traceback.format_exc())
+        finally:
+            self._set_loading(False)
+
+    async def _queue_datasets(self):
+        path = self._datasets_edit.text()
+
+        if not path:
+            return
 
-            from chimerax.geometry import rotation
+        template = LoadRequest(self._input_ali_combo.currentText(), "", self._vol_size())
+        state = self.session.inspectet
+        state.binning = self._input_bin_combo.currentData()
+        state.max_image_size = self._screen_pixels()
 
-            self.session.inspectet.additional_rotation = rotation((1, 0, 0), -90)
-            self.session.inspectet.initial_coord_order = [0, 2, 1]
-            self.session.inspectet.current_alignment = ali
+        try:
+            queue_datasets(self.session, path, template)
+        except UserError as e:
+            self.session.logger.error(str(e))
+            return
 
-        elif type == "AreTomo3":
-            if vol_file is None and vol_x is None:
-                raise UserError("Please provide volume dimensions or a volume file.")
+        await self._next_dataset()
 
-            if "s3://" in file:
-                ali = aretomo3_from_s3(file)
-            else:
-                ali = AreTomo3ALN.from_file(file)
+    async def _next_dataset(self):
+        await self._go_dataset(1)
 
-            if vol_file is None:
-                ali = Alignment.from_aretomo3(ali, vol_size=(vol_x, vol_y, vol_z))
-            else:
-                ali = Alignment.from_aretomo3(ali, vol=vol_file)
+    async def _previous_dataset(self):
+        await self._go_dataset(-1)
 
-            from chimerax.geometry import rotation
+    async def _go_dataset(self, step: int):
+        datasets = self.session.inspectet.datasets
+        if datasets is None:
+            return
 
-            self.session.inspectet.additional_rotation = rotation((1, 0, 0), 0)
-            self.session.inspectet.initial_coord_order = [0, 1, 2]
-            self.session.inspectet.current_alignment = ali
-        else:
+        try:
+            future = datasets.go(datasets.index + step)
+        except UserError:
             return
 
-        # Load alignment into table
-        model = QAlignmentTableModel(ali)
-        self.ali_table.setModel(model)
+        self._cancelled.clear()
+        self._set_loading(True)
+        self._datasets_label.setText(f"{datasets.index + 1} / {len(datasets)}: {datasets.name()}")
+
+        try:
+            # Prefetched datasets are ready, others are still being prepared in the background
+            if not future.done():
+                self._set_progress(2, "Preparing dataset ...")
+                await self._runner.run(self._wait_for, future)
+            self._check_cancelled()
+
+            self._set_progress(3, "Building models ...")
+            show_dataset(self.session, future)
+            self._set_progress(4, "Done.")
+        except LoadCancelledError:
+            self._set_progress(0, "Cancelled.")
+        except UserError as e:
+            self._set_progress(0, "Failed.")
+            self.session.logger.error(str(e))
+        except Exception:
+            self._set_progress(0, "Failed.")
+            self.session.logger.error(traceback.format_exc())
+        finally:
+            self._set_loading(False)
+
+    def _alignment_shown(self, trigger_name, loaded):
+        # Load alignment into table, with the volume coverage of the sections as shown
+        ali = loaded.alignment
+        placements = self.session.inspectet.placements
+        footprint = placements.footprint() if placements is not None else None
+
+        # The same sections (e.g. a reload) only update the cells that changed
+        model = self.ali_table.model()
+        updated = model is not None and model.update_alignment(ali, footprint)
+        if not updated:
+            model = QAlignmentTableModel(ali, footprint)
+            self.ali_table.setModel(model)
 
-        # Render alignment
-        create_alignment_objects(self.session, ali, ali.per_section_alignment_parameters[0], vol_file, ts_file)
+        # Keep the sorting and filter of the previous alignment
+        header = self.ali_table.horizontalHeader()
+        model.sort(header.sortIndicatorSection(), header.sortIndicatorOrder())
+        if not updated or self._filter_edit.text():
+            self._filter_changed()
 
         # Set slider range
-        self._slider.set_range((0, len(ali.per_section_alignment_parameters) - 1), 0)
+        self._slider.set_range((0, len(loaded.sections) - 1), 0)
+
+    def _section_shown(self, trigger_name, row):
+        model = self.ali_table.model()
+        if model is None:
+            return
+
+        # Only follow, do not apply the section again
+        blocked = self._slider.blockSignals(True)
+        self._slider.value = row
+        self._slider.blockSignals(blocked)
+        self.ali_table.setCurrentIndex(model.source_index(int(row)))
+
+    def shutdown(self):
+        """Stop the worker threads and stop following the session state."""
+        triggers = self.session.inspectet.triggers
+        for handler in self._trigger_handlers:
+            triggers.remove_handler(handler)
+        self._cancelled.set()
+        self._runner.close()
+
+    def _cancel_load(self):
+        # Downloads and stack reads in the worker threads stop at their next chunk
+        self._cancelled.set()
+        self._progress_label.setText("Cancelling ...")
+
+    def _check_cancelled(self):
+        if self._cancelled.is_set():
+            raise LoadCancelledError()
+
+    def _wait_for(self, future):
+        """Wait for a prefetch in a worker thread, until it is done or the load is cancelled. The prefetch goes on."""
+        while not future.done():
+            if self._cancelled.wait(0.1):
+                return
+
+    def _set_loading(self, loading: bool):
+        self._load_button.setEnabled(not loading)
+        self._compare_button.setEnabled(not loading)
+        self._datasets_button.setEnabled(not loading)
+
+        datasets = self.session.inspectet.datasets
+        self._previous_button.setEnabled(not loading and datasets is not None and datasets.index > 0)
+        self._next_button.setEnabled(not loading and datasets is not None and datasets.index < len(datasets) - 1)
+        self._cancel_button.setEnabled(loading)
+
+    def _set_progress(self, stage: int, text: str):
+        self._progress_bar.setValue(stage)
+        self._progress_label.setText(text)
 
     def _apply_alignment(self, index: QModelIndex):
         if self.session.inspectet.current_alignment is None:
@@ -326,16 +588,26 @@ class MainWidget(QWidget):
         if not index.isValid():
             return
 
-        item = index.internalPointer()
-
-        if item is not None:
-            apply_alignment(self.session, self.session.inspectet.current_alignment, item.params)
+        show_section(self.session, self.ali_table.model().source_row(index))
 
     def _apply_alignment_int(self, z: int):
         if self.session.inspectet.current_alignment is None:
             return
 
+        # The slider steps through all sections, also those filtered out of the table
+        show_section(self.session, int(z))
+
+    def _filter_changed(self, *args):
         model = self.ali_table.model()
-        index = model.index(int(z), int(0))
-        self._apply_alignment(index)
-        self.ali_table.setCurrentIndex(index)
+        if model is None:
+            return
+
+        column = self._filter_column_combo.currentIndex() - 1
+        model.set_filter(self._filter_edit.text(), column if column >= 0 else None)
+
+        current = self.session.inspectet.current_section
+        placements = self.session.inspectet.placements
+        if current is not None and placements is not None:
+            row = placements.find_row(current)
+            if row is not None:
+                self.ali_table.setCurrentIndex(model.source_index(row))
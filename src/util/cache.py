@@ -0,0 +1,237 @@
+import contextlib
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from typing import Callable, Optional
+
+CACHE_DIR_ENV = "INSPECTET_CACHE_DIR"
+"""Environment variable overriding the cache directory."""
+
+DEFAULT_CACHE_BYTES = 20 * 2**30
+"""Default size limit of the on-disk cache (20 GiB)."""
+
+EVICT_TO = 0.9
+"""Eviction frees space down to this fraction of the size limit, so a full cache is not scanned on every store."""
+
+PINNED_DIR = "pinned"
+"""Subdirectory of the cache holding pinned entries, which are not evicted."""
+
+
+def default_cache_dir() -> str:
+    """The InspectET cache directory inside the ChimeraX user cache directory."""
+    if CACHE_DIR_ENV in os.environ:
+        return os.environ[CACHE_DIR_ENV]
+
+    try:
+        from chimerax import app_dirs
+
+        base = app_dirs.user_cache_dir
+    except (ImportError, AttributeError):
+        base = os.path.join(os.path.expanduser("~"), ".cache")
+
+    return os.path.join(base, "InspectET")
+
+
+def cache_key(uri: str, etag: Optional[str] = None, size: Optional[int] = None, mtime: Optional[str] = None) -> str:
+    """
+    Key of one version of a remote file. The ETag identifies the content if available, otherwise size and modification
+    time are used, so a changed remote file gets a new key.
+    """
+    version = "etag=" + etag.strip('"') if etag else f"size={size};mtime={mtime}"
+
+    return hashlib.sha256(f"{uri}\n{version}".encode()).hexdigest()
+
+
+class FileCache:
+    """
+    Size-bounded on-disk cache of remote files. Entries are addressed by ``cache_key`` and evicted in
+    least-recently-used order (by file modification time, which is updated on every hit) once the total size exceeds
+    ``max_bytes``, down to ``EVICT_TO`` of it.
+
+    The total size is kept as a running count, updated by ``store`` and ``evict``, so storing an entry does not scan the
+    cache. The directory is only scanned on first use and when the count exceeds the limit, which also corrects the
+    count for changes made by other processes.
+
+    Parameters
+    ----------
+    directory : str
+        The cache directory.
+    max_bytes : int
+        The size limit in bytes.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total: Optional[int] = None
+        """Size of all entries in bytes, None until the directory is scanned."""
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def holds(self, path: str) -> bool:
+        """Whether a file lies in the cache directory, as an entry or pinned."""
+        return os.path.realpath(path).startswith(os.path.realpath(self.directory) + os.sep)
+
+    def pin(self, path: str) -> str:
+        """
+        Keep an entry that must outlive eviction, e.g. an input referenced by a saved session, and return the path of
+        the pinned file. It is a hard link to the entry where possible, so it takes no space while the entry is cached.
+        Pinned files are not counted towards the size limit.
+        """
+        pinned = os.path.join(self.directory, PINNED_DIR, os.path.basename(path))
+        if os.path.exists(pinned):
+            return pinned
+
+        os.makedirs(os.path.dirname(pinned), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(pinned), suffix=".part")
+        os.close(fd)
+        try:
+            os.remove(tmp)
+            try:
+                os.link(path, tmp)
+            except OSError:
+                shutil.copyfile(path, tmp)
+            os.replace(tmp, pinned)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+        return pinned
+
+    def lookup(self, key: str) -> Optional[str]:
+        """Local path of a cached entry, or None on a miss."""
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def read_bytes(self, key: str) -> Optional[bytes]:
+        path = self.lookup(key)
+        if path is None:
+            return None
+
+        with open(path, "rb") as f:
+            return f.read()
+
+    def store(self, key: str, write: Callable[[str], None]) -> str:
+        """Store an entry. ``write`` is called with a temporary path to write the content to."""
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+        os.close(fd)
+        try:
+            write(tmp)
+            size = os.path.getsize(tmp)
+            with self._lock:
+                replaced = _file_size(path)
+                os.replace(tmp, path)
+                if self._total is not None:
+                    self._total += size - replaced
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+        self.evict(keep=path)
+        return path
+
+    def store_bytes(self, key: str, data: bytes) -> str:
+        def write(tmp):
+            with open(tmp, "wb") as f:
+                f.write(data)
+
+        return self.store(key, write)
+
+    def size(self) -> int:
+        with self._lock:
+            if self._total is None:
+                self._total = sum(_file_size(p) for p in self._entries())
+            return self._total
+
+    def reset(self):
+        """Forget the size count, e.g. after the directory changed. The next ``size`` or ``evict`` scans again."""
+        with self._lock:
+            self._total = None
+
+    def evict(self, keep: Optional[str] = None):
+        """
+        Remove least recently used entries (except ``keep``) once the cache exceeds its size limit, until it is within
+        ``EVICT_TO`` of the limit.
+        """
+        if self.size() <= self.max_bytes:
+            return
+
+        with self._lock:
+            entries = []
+            for p in self._entries():
+                try:
+                    st = os.stat(p)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, p))
+
+            total = sum(e[1] for e in entries)
+            for _, size, p in sorted(entries):
+                if total <= EVICT_TO * self.max_bytes:
+                    break
+                if p == keep:
+                    continue
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(p)
+                total -= size
+
+            self._total = total
+
+    def clear(self):
+        with self._lock:
+            for p in self._entries():
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(p)
+            self._total = 0
+
+    def _entries(self):
+        if not os.path.isdir(self.directory):
+            return []
+
+        out = []
+        for sub in os.scandir(self.directory):
+            if not sub.is_dir() or sub.name == PINNED_DIR:
+                continue
+            out.extend(e.path for e in os.scandir(sub.path) if e.is_file() and not e.name.endswith(".part"))
+        return out
+
+
+def _file_size(path: str) -> int:
+    """Size of a file, 0 if it does not exist."""
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+
+_cache = None
+
+
+def get_cache() -> FileCache:
+    """The shared on-disk cache."""
+    global _cache
+    if _cache is None:
+        _cache = FileCache(default_cache_dir())
+    return _cache
+
+
+def configure_cache(directory: Optional[str] = None, max_bytes: Optional[int] = None):
+    """Change the directory or size limit of the shared cache."""
+    cache = get_cache()
+    if directory is not None:
+        cache.directory = directory
+        cache.reset()
+    if max_bytes is not None:
+        cache.max_bytes = max_bytes
+        cache.evict()
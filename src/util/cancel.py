@@ -0,0 +1,12 @@
+import threading
+from typing import Optional
+
+
+class LoadCancelledError(Exception):
+    """Raised when a load is cancelled, between two stages or between two chunks of a download or read."""
+
+
+def check_cancelled(cancelled: Optional[threading.Event]):
+    """Raise ``LoadCancelledError`` if the cancellation event is set."""
+    if cancelled is not None and cancelled.is_set():
+        raise LoadCancelledError()
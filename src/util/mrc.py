@@ -0,0 +1,160 @@
+import os
+from typing import Tuple
+
+import numpy as np
+
+MRC_SUFFIXES = (".mrc", ".mrcs", ".st", ".ali", ".rec", ".map")
+
+_HEADER_SIZE = 1024
+_IMOD_STAMP = 1146047817
+
+_MODE_DTYPES = {
+    0: np.int8,
+    1: np.int16,
+    2: np.float32,
+    6: np.uint16,
+    12: np.float16,
+}
+
+
+class UnsupportedMrcModeError(ValueError):
+    """Raised for MRC files whose data mode ``MrcStack`` cannot map."""
+
+
+def _header_dtype(byteorder: str) -> np.dtype:
+    return np.dtype(
+        [
+            ("nx", "i4"),
+            ("ny", "i4"),
+            ("nz", "i4"),
+            ("mode", "i4"),
+            ("nxstart", "i4"),
+            ("nystart", "i4"),
+            ("nzstart", "i4"),
+            ("mx", "i4"),
+            ("my", "i4"),
+            ("mz", "i4"),
+            ("cella", "f4", 3),
+            ("cellb", "f4", 3),
+            ("mapcrs", "i4", 3),
+            ("dmin", "f4"),
+            ("dmax", "f4"),
+            ("dmean", "f4"),
+            ("ispg", "i4"),
+            ("nsymbt", "i4"),
+            ("extra1", "V8"),
+            ("exttyp", "S4"),
+            ("nversion", "i4"),
+            ("extra2", "V40"),
+            ("imod_stamp", "i4"),
+            ("imod_flags", "i4"),
+            ("extra3", "V36"),
+            ("origin", "f4", 3),
+            ("map", "S4"),
+            ("machst", "u1", 4),
+            ("rms", "f4"),
+            ("nlabl", "i4"),
+            ("label", "S80", 10),
+        ],
+    ).newbyteorder(byteorder)
+
+
+def _byteorder(raw: bytes) -> str:
+    # Machine stamp 0x11 marks big endian, anything else is treated as little endian.
+    return ">" if raw[212] == 0x11 else "<"
+
+
+def parse_header(raw: bytes, path: str = "MRC data") -> np.void:
+    """The main header of an MRC file from its first 1024 bytes."""
+    if len(raw) < _HEADER_SIZE:
+        raise ValueError(f"{path} is too small to be an MRC file.")
+
+    return np.frombuffer(raw, dtype=_header_dtype(_byteorder(raw)), count=1)[0]
+
+
+def read_header(path: str) -> np.void:
+    """
+    The main header of a local MRC file or an S3 object. Only the header is read, from S3 by one ranged GET (see
+    ``s3.fetch_header``).
+    """
+    if path.startswith("s3://"):
+        from .s3 import fetch_header
+
+        raw = fetch_header(path, _HEADER_SIZE)
+    else:
+        with open(path, "rb") as f:
+            raw = f.read(_HEADER_SIZE)
+
+    return parse_header(raw, path)
+
+
+def voxel_size(header: np.void) -> Tuple[float, float, float]:
+    """Voxel size (x, y, z) in Angstrom, from the cell dimensions and sampling of an MRC header."""
+    cella = header["cella"]
+    sampling = (header["mx"], header["my"], header["mz"])
+    return tuple(float(c / m) if m > 0 and c > 0 else 1.0 for c, m in zip(cella, sampling, strict=True))
+
+
+def has_mrc_suffix(path: str) -> bool:
+    """Return true if path (local or remote) has an MRC suffix."""
+    return os.path.splitext(path)[1].lower() in MRC_SUFFIXES
+
+
+def is_mrc_path(path: str) -> bool:
+    """Return true if path is a local file with an MRC suffix."""
+    return "://" not in path and has_mrc_suffix(path)
+
+
+class MrcStack:
+    """
+    Memory-mapped MRC stack. Sections are handed out as views into the mapping, so no pixel data is read or copied until
+    it is accessed.
+
+    Parameters
+    ----------
+    path : str
+        Path to a local MRC file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+        with open(path, "rb") as f:
+            raw = f.read(_HEADER_SIZE)
+
+        self.header = parse_header(raw, path)
+        byteorder = _byteorder(raw)
+
+        mode = int(self.header["mode"])
+        if mode not in _MODE_DTYPES:
+            raise UnsupportedMrcModeError(f"MRC mode {mode} is not supported ({path}).")
+
+        dtype = _MODE_DTYPES[mode]
+        if mode == 0 and self.header["imod_stamp"] == _IMOD_STAMP and not self.header["imod_flags"] & 1:
+            dtype = np.uint8
+
+        file_dtype = np.dtype(dtype).newbyteorder(byteorder)
+        self.dtype = file_dtype.newbyteorder("=")
+        self.shape = (int(self.header["nz"]), int(self.header["ny"]), int(self.header["nx"]))
+
+        offset = _HEADER_SIZE + int(self.header["nsymbt"])
+        self.data = np.memmap(path, dtype=file_dtype, mode="r", offset=offset, shape=self.shape)
+
+        self.zero_copy = file_dtype.isnative
+        """Sections are views into the file mapping and need no caching. Byte-swapped files are copied instead."""
+
+    @property
+    def voxel_size(self) -> Tuple[float, float, float]:
+        """Voxel size (x, y, z) in Angstrom, from the cell dimensions and sampling."""
+        return voxel_size(self.header)
+
+    @property
+    def step(self) -> Tuple[float, float, float]:
+        return self.voxel_size
+
+    def section(self, z: int) -> np.ndarray:
+        """Section z, shape (y, x). A view into the file mapping for native byte order files."""
+        if self.zero_copy:
+            return self.data[z]
+
+        return self.data[z].astype(self.dtype)
@@ -0,0 +1,242 @@
+import io
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from cryoet_alignment.io.cryoet_data_portal import Alignment
+from cryoet_alignment.io.cryoet_data_portal.alignment import PerSectionAlignmentParameters
+from cryoet_alignment.io.imod.tilt import imod_range_to_list
+
+# The same pattern as cryoet_alignment's tilt.com reader
+_EXCLUDE = re.compile(r"^(EXCLUDELIST2|EXCLUDELIST|EXCLUDE)\s+(.+)$", re.M)
+
+
+@dataclass
+class ImodArrays:
+    """The contents of an IMOD alignment (.xf, .tlt, .xtilt and the exclude list of tilt.com) as arrays."""
+
+    xf: np.ndarray
+    """Transforms (N, 6): a11, a12, a21, a22, dx, dy."""
+    tlt: np.ndarray
+    """Tilt angles (N,)."""
+    xtilt: Optional[np.ndarray] = None
+    """Volume x-axis tilts (N,)."""
+    exclude: List[int] = field(default_factory=list)
+    """Excluded sections (1-based)."""
+
+
+@dataclass
+class AlnArrays:
+    """The contents of an AreTomo3 .aln file, with the global and local alignments as arrays."""
+
+    raw_size: Tuple[int, int, int]
+    num_patches: int
+    alpha_offset: float
+    beta_offset: float
+    dark_frames: np.ndarray
+    """Dark frames (K, 3): section index, val2 and tilt angle."""
+    global_alignments: np.ndarray
+    """Global alignments (N, 10): sec, rot, gmag, tx, ty, smean, sfit, scale, base, tilt."""
+    local_alignments: np.ndarray
+    """Local alignments (M, 7): sec, patch, center x and y, shift x and y, reliability."""
+
+
+def parse_table(text: str, columns: int) -> np.ndarray:
+    """
+    Parse lines of whitespace-separated numbers into an array (lines, columns) in one pass. Lines may have more values
+    than ``columns``, the extra values are dropped as by the line-by-line parsers. Raises ValueError if a line does not
+    start with ``columns`` numbers.
+    """
+    text = text.strip()
+    if not text:
+        return np.empty((0, columns))
+
+    return np.loadtxt(io.StringIO(text), usecols=range(columns), ndmin=2)
+
+
+def parse_xf(text: str) -> np.ndarray:
+    return parse_table(text, 6)
+
+
+def parse_tlt(text: str) -> np.ndarray:
+    """Angles of a .tlt, .rawtlt or .xtilt file."""
+    return parse_table(text, 1)[:, 0]
+
+
+def parse_exclude(tiltcom: str) -> List[int]:
+    """The excluded sections (1-based) of a tilt.com file."""
+    match = _EXCLUDE.search(tiltcom)
+    return imod_range_to_list(match.group(2)) if match else []
+
+
+def parse_imod(xf: str, tlt: str, xtilt: Optional[str] = None, tiltcom: Optional[str] = None) -> ImodArrays:
+    """Parse the texts of an IMOD alignment."""
+    return ImodArrays(
+        xf=parse_xf(xf),
+        tlt=parse_tlt(tlt),
+        xtilt=parse_tlt(xtilt) if xtilt is not None else None,
+        exclude=parse_exclude(tiltcom) if tiltcom is not None else [],
+    )
+
+
+def parse_aln(text: str) -> AlnArrays:
+    """
+    Parse the text of an AreTomo3 .aln file. Header lines are read one by one, the global and local alignment blocks
+    (after the "# SEC" and "# Local Alignment" lines) in bulk.
+    """
+    header, _, alignments = f"\n{text.strip()}".partition("\n# SEC")
+    global_block, _, local_block = alignments.partition("\n# Local Alignment")
+
+    raw_size = num_patches = alpha_offset = beta_offset = None
+    dark_frames = []
+    for line in header.splitlines():
+        if line.startswith("# RawSize"):
+            raw_size = tuple(map(int, line.split("=")[1].split()))
+        elif line.startswith("# NumPatches"):
+            num_patches = int(line.split("=")[1])
+        elif line.startswith("# DarkFrame"):
+            dark_frames.append(line.split("=")[1])
+        elif line.startswith("# AlphaOffset"):
+            alpha_offset = float(line.split("=")[1])
+        elif line.startswith("# BetaOffset"):
+            beta_offset = float(line.split("=")[1])
+
+    # Drop the rest of the block header lines (column names)
+    return AlnArrays(
+        raw_size=raw_size,
+        num_patches=num_patches,
+        alpha_offset=alpha_offset,
+        beta_offset=beta_offset,
+        dark_frames=parse_table("\n".join(dark_frames), 3),
+        global_alignments=parse_table(global_block.partition("\n")[2], 10),
+        local_alignments=parse_table(local_block.partition("\n")[2], 7),
+    )
+
+
+def read_text(path: str) -> str:
+    with open(path) as f:
+        return f.read()
+
+
+def read_imod(basename: str) -> ImodArrays:
+    """Read the IMOD alignment of a basename: .xf, .tlt, optionally .xtilt and tilt.com next to it."""
+
+    def optional(path):
+        return read_text(path) if os.path.exists(path) else None
+
+    return parse_imod(
+        read_text(f"{basename}.xf"),
+        read_text(f"{basename}.tlt"),
+        xtilt=optional(f"{basename}.xtilt"),
+        tiltcom=optional(f"{os.path.dirname(basename)}/tilt.com"),
+    )
+
+
+def _volume_dimension(vol: Optional[str], vol_size, imod: bool) -> Dict[str, float]:
+    if vol is not None:
+        from .mrc import read_header
+
+        # Local or S3, only the header is read
+        header = read_header(vol)
+        x = header["cella"][0] / header["mx"] * header["nx"]
+        y = header["cella"][1] / header["my"] * header["ny"]
+        z = header["cella"][2] / header["mz"] * header["nz"]
+
+        # IMOD tomograms are stored in xzy order
+        return {"x": x, "y": z, "z": y} if imod else {"x": x, "y": y, "z": z}
+
+    if vol_size is not None:
+        return {"x": vol_size[0], "y": vol_size[1], "z": vol_size[2]}
+
+    return {"x": 0, "y": 0, "z": 0}
+
+
+def _alignment(sections: List[PerSectionAlignmentParameters], fmt: str, tilt_offset, x_rotation_offset, vd):
+    return Alignment(
+        affine_transformation_matrix=np.eye(4, 4).tolist(),
+        alignment_type="GLOBAL",
+        format=fmt,
+        is_canonical=True,
+        tilt_offset=tilt_offset,
+        volume_offset={"x": 0, "y": 0, "z": 0},
+        x_rotation_offset=x_rotation_offset,
+        per_section_alignment_parameters=sections,
+        volume_dimension=vd,
+    )
+
+
+def _sections(z_index, tilt_angle, volume_x_rotation, in_plane, x_offset, y_offset) -> List:
+    # Values are converted to Python types in bulk, so the parameter objects need no validation
+    construct = PerSectionAlignmentParameters.model_construct
+    return [
+        construct(
+            z_index=z,
+            tilt_angle=tilt,
+            volume_x_rotation=xrot,
+            in_plane_rotation=rot,
+            x_offset=dx,
+            y_offset=dy,
+        )
+        for z, tilt, xrot, rot, dx, dy in zip(
+            z_index.tolist(),
+            tilt_angle.tolist(),
+            volume_x_rotation.tolist(),
+            in_plane.tolist(),
+            x_offset.tolist(),
+            y_offset.tolist(),
+            strict=True,
+        )
+    ]
+
+
+def imod_alignment(imod: ImodArrays, vol: Optional[str] = None, vol_size=None) -> Alignment:
+    """
+    The alignment of parsed IMOD files, equal to ``Alignment.from_imod``. Without .xtilt, the volume x rotations are 0.
+    """
+    n = min(len(imod.xf), len(imod.tlt), len(imod.xtilt) if imod.xtilt is not None else len(imod.tlt))
+    xtilt = imod.xtilt[:n] if imod.xtilt is not None else np.zeros(n)
+
+    keep = np.ones(n, dtype=bool)
+    skip = np.array([s - 1 for s in imod.exclude], dtype=np.int64)
+    keep[skip[(skip >= 0) & (skip < n)]] = False
+    z_index = np.flatnonzero(keep)
+
+    # AreTomo convention: transposed matrix, shift rotated back and negated. A batched matmul of the same memory layout
+    # as imod2are rounds the same way, an explicit sum of products does not.
+    xf = imod.xf[z_index]
+    m = np.ascontiguousarray(xf[:, :4]).reshape(-1, 2, 2).transpose(0, 2, 1)
+    shift = np.ascontiguousarray(-xf[:, 4:6])
+    offset = np.matmul(m, shift[:, :, None])[:, :, 0]
+
+    sections = _sections(z_index, imod.tlt[z_index], xtilt[z_index], m, offset[:, 0], offset[:, 1])
+    return _alignment(sections, "IMOD", 0, 0, _volume_dimension(vol, vol_size, imod=True))
+
+
+def aretomo3_alignment(aln: AlnArrays, vol: Optional[str] = None, vol_size=None) -> Alignment:
+    """The alignment of a parsed AreTomo3 .aln file, equal to ``Alignment.from_aretomo3``."""
+    dark = set(aln.dark_frames[:, 0].astype(int).tolist())
+    z_index = np.array([z for z in range(aln.raw_size[2]) if z not in dark], dtype=np.int64)
+    ga = aln.global_alignments
+    if len(z_index) != len(ga):
+        raise ValueError("Number of sections does not match number of DarkFrames.")
+
+    angle = np.radians(ga[:, 1])
+    c, s = np.cos(angle), np.sin(angle)
+    in_plane = np.stack([np.stack([c, -s], axis=1), np.stack([s, c], axis=1)], axis=1)
+
+    sections = _sections(z_index, ga[:, 9], np.zeros(len(ga)), in_plane, ga[:, 3], ga[:, 4])
+    return _alignment(
+        sections,
+        "ARETOMO3",
+        aln.alpha_offset,
+        aln.beta_offset,
+        _volume_dimension(vol, vol_size, imod=False),
+    )
+
+
+def read_imod_alignment(basename: str) -> Alignment:
+    """The alignment of an IMOD basename, equal to ``Alignment.from_imod_basename``."""
+    vol = f"{basename}_full_rec.mrc"
+    return imod_alignment(read_imod(basename), vol=vol if os.path.exists(vol) else None)
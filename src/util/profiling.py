@@ -0,0 +1,141 @@
+import functools
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import nullcontext
+from typing import Dict, List
+
+import numpy as np
+
+MAX_FRAMES = 10000
+"""Number of most recent frame times kept."""
+
+
+class _Timer:
+    __slots__ = ("profiler", "stage", "start")
+
+    def __init__(self, profiler: "Profiler", stage: str):
+        self.profiler = profiler
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add_time(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class Profiler:
+    """
+    Wall-time per stage, counters and frame times of the load, scrub and playback paths. While disabled, ``timed``
+    returns a shared no-op context and ``count`` and ``frame`` return right away, so instrumented code pays one
+    attribute lookup.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._null = nullcontext()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.times: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0, float("inf"), 0.0])
+            """Per stage: calls, total, min and max time in seconds."""
+            self.counters: Dict[str, float] = defaultdict(float)
+            self.frames = deque(maxlen=MAX_FRAMES)
+            """Intervals between playback frames in seconds."""
+
+    def timed(self, stage: str):
+        """Context manager timing one pass through a stage."""
+        if not self.enabled:
+            return self._null
+        return _Timer(self, stage)
+
+    def profiled(self, stage: str):
+        """Decorator timing every call of a function as one pass through a stage."""
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with _Timer(self, stage):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def add_time(self, stage: str, seconds: float):
+        with self._lock:
+            entry = self.times[stage]
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = min(entry[2], seconds)
+            entry[3] = max(entry[3], seconds)
+
+    def count(self, name: str, value: float = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] += value
+
+    def frame(self, seconds: float):
+        if not self.enabled:
+            return
+        self.frames.append(seconds)
+
+    def report(self) -> str:
+        """Plain text report of all stages, counters and frame times."""
+        lines = []
+
+        with self._lock:
+            times = sorted(self.times.items(), key=lambda item: -item[1][1])
+            counters = sorted(self.counters.items())
+            frames = np.array(self.frames)
+
+        if times:
+            width = max(len(stage) for stage, _ in times)
+            lines.append(f"{'Stage':<{width}}  {'Calls':>7}  {'Total ms':>10}  {'Mean ms':>9}  {'Max ms':>9}")
+            for stage, (calls, total, _, longest) in times:
+                lines.append(
+                    f"{stage:<{width}}  {calls:>7}  {total * 1e3:>10.1f}  {total / calls * 1e3:>9.2f}  "
+                    f"{longest * 1e3:>9.2f}",
+                )
+
+        if counters:
+            lines.append("")
+            width = max(len(name) for name, _ in counters)
+            for name, value in counters:
+                lines.append(f"{name:<{width}}  {_format_count(name, value)}")
+
+        if len(frames):
+            lines.append("")
+            lines.append(
+                f"Frames: {len(frames)}, mean {frames.mean() * 1e3:.1f} ms ({1 / frames.mean():.1f} fps), "
+                f"p50 {np.percentile(frames, 50) * 1e3:.1f} ms, p95 {np.percentile(frames, 95) * 1e3:.1f} ms, "
+                f"max {frames.max() * 1e3:.1f} ms",
+            )
+
+        if not lines:
+            return (
+                "No profiling data." if self.enabled else "Profiling is off, start it with 'inspectet profile start'."
+            )
+
+        return "\n".join(lines)
+
+
+def _format_count(name: str, value: float) -> str:
+    if "bytes" in name:
+        for unit in ("B", "KiB", "MiB", "GiB"):
+            if value < 1024 or unit == "GiB":
+                return f"{value:.1f} {unit}" if unit != "B" else f"{int(value)} B"
+            value /= 1024
+    return f"{int(value)}"
+
+
+profiler = Profiler()
+"""The profiler shared by all InspectET code."""
@@ -1,52 +1,246 @@
+import asyncio
 import os
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional
+
 import s3fs
-from cryoet_alignment.io.imod import ImodAlignment, ImodXF, ImodTLT, ImodXTILT, ImodTILTCOM, ImodNEWSTCOM
 from cryoet_alignment.io.aretomo3 import AreTomo3ALN
 from cryoet_alignment.io.cryoet_data_portal import Alignment
+from cryoet_alignment.io.imod import ImodAlignment, ImodNEWSTCOM, ImodTILTCOM, ImodTLT, ImodXF, ImodXTILT
+from fsspec.asyn import sync
+from fsspec.callbacks import Callback
 
+from .cache import FileCache, cache_key, get_cache
+from .cancel import check_cancelled
+from .parsers import AlnArrays, ImodArrays, parse_aln, parse_imod
+from .profiling import profiler
 
-def imod_from_s3(s3_basename: str):
-    fs = s3fs.S3FileSystem()
+ENDPOINT_ENV = "INSPECTET_S3_ENDPOINT_URL"
+"""Environment variable overriding the S3 endpoint, e.g. to point at a local S3 stand-in."""
 
-    with fs.open(f"{s3_basename}.xf", "r") as file:
-        xf = ImodXF.from_stream(file)
+_storage_options = {}
 
-    with fs.open(f"{s3_basename}.tlt", "r") as file:
-        tlt = ImodTLT.from_stream(file)
 
-    if fs.exists(f"{s3_basename}.xtilt"):
-        with fs.open(f"{s3_basename}.xtilt", "r") as file:
-            xtilt = ImodXTILT.from_stream(file)
-    else:
-        xtilt = None
+def configure_s3(**storage_options):
+    """
+    Set the options of the shared S3 filesystem (e.g. ``endpoint_url``, ``anon``). The next access creates a new
+    filesystem with these options.
+    """
+    _storage_options.clear()
+    _storage_options.update(storage_options)
+    get_filesystem.cache_clear()
 
-    directory = os.path.dirname(s3_basename)
-    if fs.exists(f"{directory}/tilt.com"):
-        with fs.open(f"{directory}/tilt.com", "r") as file:
-            tiltcom = ImodTILTCOM.from_stream(file)
+
+def storage_options() -> dict:
+    """The options S3 filesystems are created with."""
+    options = dict(_storage_options)
+    if ENDPOINT_ENV in os.environ:
+        options.setdefault("endpoint_url", os.environ[ENDPOINT_ENV])
+
+    return options
+
+
+@lru_cache(maxsize=1)
+def get_filesystem() -> s3fs.S3FileSystem:
+    """The S3 filesystem shared by all loaders. Its connection pool is reused across requests."""
+    return s3fs.S3FileSystem(**storage_options())
+
+
+def _info_key(fs: s3fs.S3FileSystem, path: str, info: dict) -> str:
+    return cache_key(
+        f"s3://{fs._strip_protocol(path)}",
+        etag=info.get("ETag"),
+        size=info.get("size"),
+        mtime=str(info.get("LastModified")),
+    )
+
+
+async def _fetch_texts(fs: s3fs.S3FileSystem, paths: List[str], cache: FileCache) -> Dict[str, str]:
+    # One listing per directory tells which files exist and their versions ...
+    directories = sorted({os.path.dirname(fs._strip_protocol(p)) for p in paths})
+    listings = await asyncio.gather(
+        *[fs._ls(d, detail=True, refresh=True) for d in directories],
+        return_exceptions=True,
+    )
+    profiler.count("s3 listings", len(directories))
+    for listing in listings:
+        if isinstance(listing, Exception) and not isinstance(listing, FileNotFoundError):
+            raise listing
+
+    infos = {
+        fs._strip_protocol(info["name"]): info
+        for listing in listings
+        if not isinstance(listing, Exception)
+        for info in listing
+    }
+
+    out = {}
+    missing = []
+    for p in paths:
+        info = infos.get(fs._strip_protocol(p))
+        if info is None:
+            continue
+
+        key = _info_key(fs, p, info)
+        data = cache.read_bytes(key)
+        if data is None:
+            missing.append((p, key))
+        else:
+            profiler.count("s3 cache hits")
+            out[p] = data.decode()
+
+    # ... then all GETs for files not in the local cache are sent at once.
+    contents = await asyncio.gather(*[fs._cat_file(p) for p, _ in missing])
+    profiler.count("s3 GETs", len(missing))
+    for (p, key), data in zip(missing, contents, strict=True):
+        profiler.count("s3 bytes downloaded", len(data))
+        cache.store_bytes(key, data)
+        out[p] = data.decode()
+
+    return out
+
+
+@profiler.profiled("s3 fetch texts")
+def fetch_texts(paths: List[str]) -> Dict[str, str]:
+    """
+    Fetch several text files concurrently, using one listing request per directory and one gathered round of GETs.
+    Files already in the local cache with the same version are not downloaded again. Files that do not exist are left
+    out of the result.
+
+    Parameters
+    ----------
+    paths : list of str
+        S3 URIs of the files.
+
+    Returns
+    -------
+    dict
+        Map of S3 URI to file content.
+    """
+    fs = get_filesystem()
+    return sync(fs.loop, _fetch_texts, fs, list(paths), get_cache())
+
+
+def fetch_text(path: str) -> str:
+    """Fetch one text file, through the local cache."""
+    return fetch_texts([path])[path]
+
+
+class _CancelCallback(Callback):
+    """Download progress callback interrupting the download with ``LoadCancelledError`` once the event is set."""
+
+    def __init__(self, cancelled: Optional[threading.Event]):
+        super().__init__()
+        self.cancelled = cancelled
+
+    def call(self, *args, **kwargs):
+        check_cancelled(self.cancelled)
+
+
+@profiler.profiled("s3 fetch file")
+def fetch_file(path: str, cancelled: Optional[threading.Event] = None) -> str:
+    """
+    Download a file into the local cache and return its local path. A cached copy is used if its version (ETag, or
+    size and modification time) matches the remote file. Setting ``cancelled`` interrupts the download between two
+    chunks with ``LoadCancelledError``, nothing is cached.
+    """
+    fs = get_filesystem()
+    cache = get_cache()
+
+    # Keep the suffix, readers pick the file format by it
+    info = fs.info(path)
+    key = _info_key(fs, path, info) + os.path.splitext(path)[1]
+    local = cache.lookup(key)
+    if local is None:
+        local = cache.store(key, lambda tmp: fs.get_file(path, tmp, callback=_CancelCallback(cancelled)))
+        profiler.count("s3 GETs")
+        profiler.count("s3 bytes downloaded", info.get("size") or 0)
     else:
-        tiltcom = None
+        profiler.count("s3 cache hits")
+
+    return local
+
 
-    if fs.exists(f"{directory}/newst.com"):
-        with fs.open(f"{directory}/newst.com", "r") as file:
-            newstcom = ImodNEWSTCOM.from_stream(file)
+@profiler.profiled("s3 fetch header")
+def fetch_header(path: str, nbytes: int) -> bytes:
+    """
+    The first ``nbytes`` of a file by a ranged GET, e.g. an MRC header, without downloading the file. Cached by the
+    version of the remote file like ``fetch_file``.
+    """
+    fs = get_filesystem()
+    cache = get_cache()
+
+    info = fs.info(path)
+    key = _info_key(fs, path, info) + f".head{nbytes}"
+    data = cache.read_bytes(key)
+    if data is None:
+        data = fs.cat_file(path, start=0, end=nbytes)
+        cache.store_bytes(key, data)
+        profiler.count("s3 GETs")
+        profiler.count("s3 bytes downloaded", len(data))
     else:
-        newstcom = None
+        profiler.count("s3 cache hits")
+
+    return data
+
+
+def localize(path: Optional[str], cancelled: Optional[threading.Event] = None) -> Optional[str]:
+    """Return a local path for path, downloading S3 URIs into the local cache (see ``fetch_file``)."""
+    if path is not None and path.startswith("s3://"):
+        return fetch_file(path, cancelled)
+    return path
+
+
+def imod_texts_from_s3(s3_basename: str) -> Dict[str, Optional[str]]:
+    """
+    Fetch the files of an IMOD basename in one batch, by kind: ``xf``, ``tlt``, ``xtilt``, ``tiltcom`` and ``newstcom``.
+    Optional files that do not exist are None.
+    """
+    directory = os.path.dirname(s3_basename)
+    paths = {
+        "xf": f"{s3_basename}.xf",
+        "tlt": f"{s3_basename}.tlt",
+        "xtilt": f"{s3_basename}.xtilt",
+        "tiltcom": f"{directory}/tilt.com",
+        "newstcom": f"{directory}/newst.com",
+    }
+
+    texts = fetch_texts(list(paths.values()))
+
+    for required in ("xf", "tlt"):
+        if paths[required] not in texts:
+            raise FileNotFoundError(paths[required])
+
+    return {kind: texts.get(path) for kind, path in paths.items()}
+
+
+def imod_from_s3(s3_basename: str):
+    texts = imod_texts_from_s3(s3_basename)
+
+    xf = ImodXF.from_string(texts["xf"])
+    tlt = ImodTLT.from_string(texts["tlt"])
+    xtilt = ImodXTILT.from_string(texts["xtilt"]) if texts["xtilt"] is not None else None
+    tiltcom = ImodTILTCOM.from_string(texts["tiltcom"]) if texts["tiltcom"] is not None else None
+    newstcom = ImodNEWSTCOM.from_string(texts["newstcom"]) if texts["newstcom"] is not None else None
 
     return ImodAlignment(xf=xf, tlt=tlt, xtilt=xtilt, tiltcom=tiltcom, newstcom=newstcom)
 
 
+def imod_arrays_from_s3(s3_basename: str) -> ImodArrays:
+    """Like ``imod_from_s3``, parsed by the array parsers of ``parsers.py``."""
+    texts = imod_texts_from_s3(s3_basename)
+    return parse_imod(texts["xf"], texts["tlt"], xtilt=texts["xtilt"], tiltcom=texts["tiltcom"])
+
+
 def aretomo3_from_s3(path: str):
-    fs = s3fs.S3FileSystem()
-    with fs.open(path, "r") as f:
-        aln = AreTomo3ALN.from_stream(f)
+    return AreTomo3ALN.from_string(fetch_text(path))
 
-    return aln
 
+def aln_arrays_from_s3(path: str) -> AlnArrays:
+    """Like ``aretomo3_from_s3``, parsed by the array parsers of ``parsers.py``."""
+    return parse_aln(fetch_text(path))
 
-def cdp_from_s3(path: str):
-    fs = s3fs.S3FileSystem()
-    with fs.open(path, "r") as f:
-        ali = Alignment.from_stream(f)
 
-    return ali
+def cdp_from_s3(path: str):
+    return Alignment.from_string(fetch_text(path))